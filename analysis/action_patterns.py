@@ -0,0 +1,247 @@
+import os
+import zlib
+import logging
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR, save_plot
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, replay_logs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+MAX_N = 4              # Longest contiguous pattern
+MAX_GAP = 2            # Most tokens skipped between the two ends of a gapped pattern
+PROMOTE_COUNT = 5      # Sketch estimate at which a (model, pattern) gets an exact counter in the trie
+MIN_COUNT = 5          # Minimum occurrences for a pattern to be reported for a model
+SKETCH_WIDTH = 2 ** 16
+SKETCH_DEPTH = 4
+TOP_K = 30             # Patterns shown in the lift heatmap
+PATTERN_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "patterns")
+GAP_TOKEN = '*'
+POOLED = ''  # Model key of the counts pooled over all models
+
+
+class CountMinSketch:
+    """
+    Fixed-size approximate counter; estimates never undercount, and overcount by
+    at most about total / width. Updates are conservative: only the cells at the
+    current minimum are raised, which keeps the overcount well below that bound.
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.total = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.rows = np.arange(depth)
+        self.seeds = [zlib.crc32(str(row).encode('utf-8')) for row in range(depth)]
+
+    def _columns(self, key):
+        encoded = key.encode('utf-8')
+        return [zlib.crc32(encoded, seed) % self.width for seed in self.seeds]
+
+    def add(self, key):
+        """Counts one occurrence of key and returns its new estimate."""
+        columns = self._columns(key)
+        estimate = int(self.table[self.rows, columns].min()) + 1
+        self.table[self.rows, columns] = np.maximum(self.table[self.rows, columns], estimate)
+        self.total += 1
+        return estimate
+
+    def noise(self):
+        """Expected overcount of an estimate."""
+        return self.total / self.width
+
+
+class PatternTrie:
+    """
+    Counting trie of action patterns with per-model exact counts.
+
+    Rare (model, pattern) pairs are only counted in a count-min sketch; once the
+    sketch estimate reaches PROMOTE_COUNT the pair moves into the trie, starting
+    from a lower bound of its count (the estimate minus the sketch's expected
+    noise), so collisions cannot lift a rare pattern over MIN_COUNT. Memory is therefore bounded by the sketch size plus one
+    counter per pattern that is frequent for some model, however long the input.
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.sketch = CountMinSketch()
+        self.positions = {}  # (model, length, gapped) -> patterns of that shape seen, for support
+
+    def add(self, model, pattern):
+        """Counts one occurrence of pattern (a tuple of tokens) for model and for the pooled baseline."""
+        counts = self._counts(pattern)
+        for key in (model, POOLED):
+            if counts is not None and key in counts:
+                counts[key] += 1
+                continue
+            estimate = self.sketch.add(key + '\x1f' + ' '.join(pattern))
+            if estimate >= PROMOTE_COUNT:
+                counts = self._insert(pattern)
+                counts[key] = max(1, int(estimate - self.sketch.noise()))
+        position_key = (model, len(pattern), GAP_TOKEN in pattern)
+        self.positions[position_key] = self.positions.get(position_key, 0) + 1
+
+    def _counts(self, pattern):
+        node = self.root
+        for token in pattern[:-1]:
+            if token not in node:
+                return None
+            node = node[token][0]
+        entry = node.get(pattern[-1])
+        return entry[1] if entry is not None else None
+
+    def _insert(self, pattern):
+        node = self.root
+        for token in pattern[:-1]:
+            node = node.setdefault(token, [{}, {}])[0]
+        return node.setdefault(pattern[-1], [{}, {}])[1]
+
+    def items(self, prefix=()):
+        """Yields (pattern, {model: count}) for every pattern with an exact counter."""
+        stack = [(prefix, self.root)]
+        while stack:
+            pattern, node = stack.pop()
+            for token, (children, counts) in node.items():
+                if counts:
+                    yield pattern + (token,), counts
+                stack.append((pattern + (token,), children))
+
+
+class ActionStreamMiner:
+    """
+    Log handler that turns each player's actions, blocks and challenges into a
+    token stream and counts every pattern ending at each new token: contiguous
+    n-grams up to MAX_N tokens, and gapped pairs 'A * B' with up to MAX_GAP
+    tokens skipped. Only the last MAX_N + MAX_GAP tokens of each player are kept.
+    """
+
+    def __init__(self):
+        self.trie = PatternTrie()
+        self.window_size = max(MAX_N, MAX_GAP + 2)
+
+    def start_game(self, game_id, game):
+        self.models = {player: strip_provider(model) for player, model in game['models'].items()}
+        self.windows = {player: deque(maxlen=self.window_size) for player in self.models}
+
+    def _add_token(self, player, token):
+        window = self.windows.get(player)
+        if window is None:
+            return
+        window.append(token)
+        model = self.models[player]
+        tokens = list(window)
+        for n in range(1, min(MAX_N, len(tokens)) + 1):
+            self.trie.add(model, tuple(tokens[-n:]))
+        for gap in range(1, MAX_GAP + 1):
+            if len(tokens) >= gap + 2:
+                self.trie.add(model, (tokens[-gap - 2],) + (GAP_TOKEN,) * gap + (token,))
+
+    def handle(self, event):
+        kind = event['kind']
+        if kind == 'action':
+            self._add_token(event['player'], event['action'])
+        elif kind == 'block':
+            self._add_token(event['player'], f"BLOCK_{event['card'].upper()}")
+        elif kind == 'challenge':
+            self._add_token(event['player'], 'CHALLENGE')
+
+    def end_game(self):
+        pass
+
+
+def pattern_table(trie):
+    """
+    Builds the per-model pattern table. Support is the share of a model's
+    patterns of the same length and kind that match; lift compares it with the
+    support pooled over all models.
+    """
+    rows = [
+        (' '.join(pattern), len(pattern), GAP_TOKEN in pattern, model, count, counts.get(POOLED, count))
+        for pattern, counts in trie.items()
+        for model, count in counts.items()
+        if model != POOLED
+    ]
+    patterns = pd.DataFrame(rows, columns=['pattern', 'length', 'gapped', 'model', 'count', 'pooled_count'])
+
+    positions = pd.Series(trie.positions).rename_axis(['model', 'length', 'gapped']).rename('positions').reset_index()
+    patterns = patterns.merge(positions, on=['model', 'length', 'gapped'])
+    patterns['support'] = patterns['count'] / patterns['positions']
+
+    pooled_positions = positions.groupby(['length', 'gapped'])['positions'].sum().rename('pooled_positions')
+    patterns = patterns.join(pooled_positions, on=['length', 'gapped'])
+    patterns['pooled_support'] = patterns['pooled_count'] / patterns['pooled_positions']
+    patterns['lift'] = patterns['support'] / patterns['pooled_support']
+    return patterns.drop(columns=['positions', 'pooled_positions'])
+
+
+def plot_lift(patterns, plot_path):
+    """Heatmap of log2 lift of the most common multi-token patterns for each model."""
+    multi = patterns[patterns['length'] > 1]
+    top_patterns = multi.groupby('pattern')['count'].sum().nlargest(TOP_K).index
+    lift = multi[multi['pattern'].isin(top_patterns)].pivot(index='pattern', columns='model', values='lift')
+    lift = lift.reindex(top_patterns)
+    models = sorted(lift.columns)
+    lift = lift[models]
+
+    fig, ax = plt.subplots(figsize=(max(10, 1.6 * len(models)), max(8, 0.4 * len(top_patterns))))
+    with np.errstate(divide='ignore'):
+        image = ax.imshow(np.log2(lift.to_numpy(dtype=float)), cmap='RdBu_r', vmin=-2, vmax=2, aspect='auto')
+    ax.set_facecolor('lightgray')  # Patterns below MIN_COUNT for a model
+    ax.set_xticks(range(len(models)))
+    ax.set_xticklabels(models, rotation=45, ha='right')
+    ax.set_yticks(range(len(lift.index)))
+    ax.set_yticklabels(lift.index)
+    ax.set_title(f'Action Pattern Lift by Model (Top {len(top_patterns)} Patterns, log2)')
+    fig.colorbar(image, ax=ax, label='log2(model support / pooled support)')
+    fig.tight_layout()
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def main():
+    """Mines frequent and gapped action patterns from every player's action stream."""
+    logging.info("Starting action pattern mining...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+        logging.info(f"Loaded {len(game_index)} unique game IDs from {RESULTS_FILE}.")
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    miner = ActionStreamMiner()
+    replay_logs(log_files, game_index, [miner])
+
+    patterns = pattern_table(miner.trie)
+    patterns = patterns[(patterns['count'] >= MIN_COUNT) & ~patterns['model'].isin(EXCLUDED_MODELS)]
+    patterns = patterns.sort_values(['model', 'lift'], ascending=[True, False])
+
+    os.makedirs(PATTERN_OUTPUT_DIR, exist_ok=True)
+    patterns.to_csv(os.path.join(PATTERN_OUTPUT_DIR, "action_patterns.csv"), index=False)
+
+    print("--- Most Distinctive Multi-Action Patterns by Model ---")
+    for model, model_patterns in patterns[patterns['length'] > 1].groupby('model'):
+        print(f"\n{model}")
+        print(model_patterns.head(10)[['pattern', 'count', 'support', 'lift']].to_string(index=False))
+
+    plot_lift(patterns, os.path.join(PATTERN_OUTPUT_DIR, "action_pattern_lift.png"))
+    logging.info("Finished action pattern mining.")
+
+
+if __name__ == '__main__':
+    main()
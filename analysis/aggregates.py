@@ -0,0 +1,201 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Partial aggregates let the analysis run on shards of games and be combined later.
+# Every table below holds key columns plus additive columns (counts and sums), so
+# any number of shard states reduce to the same totals as a single-node run.
+# Shards must split results by game_id, so each game lies entirely in one shard.
+
+STATE_VERSION = 1
+GROUP_KEYS = ['model', 'public_discussion']
+MIN_MIXED_MODELS = 3  # Mixed-model games need at least this many unique models
+# Per-player columns of partial_results that a sampling weight scales
+WEIGHTED_COLUMNS = [
+    'wins', 'players', 'effective_elimination_round', 'bluffing_success_rate', 'rated_bluffs', 'num_bluffs',
+    'total_coins_earned', 'coins_lost_to_theft', 'challenges_won', 'challenges_lost', 'attacks_launched',
+    'attacks_received', 'rounds_survived', 'total_play_time',
+]
+
+# Key columns of each partial table, by table name suffix
+TABLE_KEYS = {
+    'by_model': GROUP_KEYS,
+    'causes': GROUP_KEYS + ['cause_of_elimination'],
+    'play_time': ['public_discussion'],
+    'games_by_discussion': ['public_discussion'],
+    'type_counts': ['model', 'type'],
+    'category_counts': ['model', 'category'],
+}
+
+
+def table_keys(name):
+    """Returns the key columns of a partial table, e.g. 'mixed_model/by_model'."""
+    return TABLE_KEYS[name.split('/')[-1]]
+
+
+def split_games(df):
+    """Splits results into self-play games and mixed-model games with at least MIN_MIXED_MODELS unique models."""
+    game_model_counts = df.groupby('game_id')['model'].nunique()
+    self_play_game_ids = game_model_counts[game_model_counts == 1].index
+
+    df_self_play = df[df['game_id'].isin(self_play_game_ids)]
+    df_mixed_model = df[~df['game_id'].isin(self_play_game_ids)]
+
+    game_model_counts_mixed = df_mixed_model.groupby('game_id')['all_models'].first().apply(lambda x: len(x.split(';')))
+    games_with_enough_models = game_model_counts_mixed[game_model_counts_mixed >= MIN_MIXED_MODELS].index
+    df_mixed_model = df_mixed_model[df_mixed_model['game_id'].isin(games_with_enough_models)]
+    return df_self_play, df_mixed_model
+
+
+def partial_results(df):
+    """Computes the additive per-model tables behind every chart in run_analysis."""
+    df = df.copy()
+    game_duration = df.groupby('game_id')['elimination_round'].transform('max')
+    df['effective_elimination_round'] = np.where(df['winner'], game_duration + 1, df['elimination_round'] + 1)
+    df['rounds_survived'] = np.where(df['winner'], game_duration, df['elimination_round'])
+    df['bluffing_success_rate'] = df['successful_bluffs'] / (df['successful_bluffs'] + df['failed_bluffs'])
+    df['wins'] = df['winner'].astype(int)
+    df['players'] = 1
+    df['rated_bluffs'] = df['bluffing_success_rate'].notna().astype(int)
+
+    # Sampled rows (see sampling.py) carry a 'weight'; every additive column becomes a weighted sum
+    weighted = 'weight' in df.columns
+    if weighted:
+        for column in WEIGHTED_COLUMNS:
+            df[column] = df[column] * df['weight']
+
+    by_model = df.groupby(GROUP_KEYS).agg(
+        games_played=('game_id', 'nunique'),
+        wins=('wins', 'sum'),
+        players=('players', 'sum'),
+        elimination_round_sum=('effective_elimination_round', 'sum'),
+        bluffing_success_rate_sum=('bluffing_success_rate', 'sum'),
+        bluffing_success_rate_count=('rated_bluffs', 'sum'),
+        num_bluffs=('num_bluffs', 'sum'),
+        total_coins_earned=('total_coins_earned', 'sum'),
+        coins_lost_to_theft=('coins_lost_to_theft', 'sum'),
+        challenges_won=('challenges_won', 'sum'),
+        challenges_lost=('challenges_lost', 'sum'),
+        attacks_launched=('attacks_launched', 'sum'),
+        attacks_received=('attacks_received', 'sum'),
+        rounds_survived=('rounds_survived', 'sum'),
+    ).reset_index()
+    if weighted:
+        games = df.drop_duplicates(['game_id'] + GROUP_KEYS).groupby(GROUP_KEYS)['weight'].sum()
+        by_model['games_played'] = by_model.set_index(GROUP_KEYS).index.map(games)
+
+    causes = df[df['cause_of_elimination'].notna()].copy()
+    causes['cause_of_elimination'] = causes['cause_of_elimination'].astype(str).str.split(';')
+    causes = causes.explode('cause_of_elimination')
+    # Merge Assassinated and Couped
+    causes['cause_of_elimination'] = causes['cause_of_elimination'].replace(['assassination', 'coup'], 'Assassination or Coup')
+    causes['count'] = causes['weight'] if weighted else 1
+    causes = causes.groupby(TABLE_KEYS['causes'])['count'].sum().reset_index()
+
+    df['timed_players'] = df['players'].where(df['total_play_time'].notna(), 0)
+    play_time = df.groupby('public_discussion').agg(
+        total_play_time=('total_play_time', 'sum'),
+        players=('timed_players', 'sum'),
+    ).reset_index()
+
+    return {'by_model': by_model, 'causes': causes, 'play_time': play_time}
+
+
+def partial_game_counts(df):
+    """Counts distinct games per discussion setting (summing sampling weights for sampled games)."""
+    if 'weight' in df.columns:
+        games = df.drop_duplicates('game_id').groupby('public_discussion')['weight'].sum()
+        return games.reset_index(name='games')
+    return df.groupby('public_discussion')['game_id'].nunique().reset_index(name='games')
+
+
+def partial_category_counts(df, column):
+    """Sums record weights per (model, column) for the qualitative and discussion charts."""
+    weights = df['weight'] if 'weight' in df.columns else pd.Series(1, index=df.index)
+    return weights.groupby([df['model'], df[column]]).sum().reset_index(name='count')
+
+
+def combine_states(states):
+    """Reduces any number of partial states into one by summing their additive columns."""
+    combined = {}
+    names = sorted({name for state in states for name in state})
+    for name in names:
+        tables = [state[name] for state in states if name in state]
+        keys = table_keys(name)
+        combined[name] = pd.concat(tables, ignore_index=True).groupby(keys, as_index=False).sum()
+    return combined
+
+
+def save_state(state, path):
+    """Writes a partial state to a small JSON file."""
+    payload = {
+        'version': STATE_VERSION,
+        'tables': {name: table.to_dict(orient='split', index=False) for name, table in state.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+
+
+def load_state(path):
+    """Reads a partial state written by save_state."""
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    if payload.get('version') != STATE_VERSION:
+        raise ValueError(f"Unsupported partial state version in {path}: {payload.get('version')}")
+    return {
+        name: pd.DataFrame(table['data'], columns=table['columns'])
+        for name, table in payload['tables'].items()
+    }
+
+
+def finalize_results(partial):
+    """Turns the additive tables of partial_results into the metric tables plotted by run_analysis."""
+    by_model = partial['by_model']
+    metrics = {}
+
+    win_rate_stats = by_model[GROUP_KEYS + ['games_played', 'wins']].copy()
+    win_rate_stats['win_rate'] = win_rate_stats['wins'] / win_rate_stats['games_played']
+    metrics['win_rate'] = win_rate_stats
+
+    elimination_stats = by_model[GROUP_KEYS].copy()
+    elimination_stats['average_elimination_round'] = by_model['elimination_round_sum'] / by_model['players']
+    metrics['elimination'] = elimination_stats
+
+    causes = partial['causes'].copy()
+    # Normalize by the number of eliminations per model
+    total_eliminations = causes.groupby(GROUP_KEYS)['count'].transform('sum')
+    causes['percentage'] = (causes['count'] / total_eliminations) * 100
+    metrics['elimination_causes'] = causes
+
+    bluffing_analysis = by_model[GROUP_KEYS].copy()
+    bluffing_analysis['bluffing_success_rate'] = by_model['bluffing_success_rate_sum'] / by_model['bluffing_success_rate_count'].replace(0, np.nan)
+    bluffing_analysis['bluffing_frequency'] = by_model['num_bluffs'] / by_model['players']
+    bluffing_analysis['total_bluffs'] = by_model['num_bluffs']
+    metrics['bluffing'] = bluffing_analysis.fillna(0)
+
+    eco_stats = by_model[GROUP_KEYS].copy()
+    eco_stats['avg_coins_earned'] = by_model['total_coins_earned'] / by_model['players']
+    eco_stats['total_earned'] = by_model['total_coins_earned']
+    eco_stats['coins_lost_to_theft'] = by_model['coins_lost_to_theft']
+    eco_stats['efficiency_ratio'] = np.divide(eco_stats['total_earned'], eco_stats['coins_lost_to_theft'])
+    eco_stats['efficiency_ratio'] = eco_stats['efficiency_ratio'].replace([np.inf, -np.inf], np.nan).fillna(0)
+    metrics['economy'] = eco_stats
+
+    challenge_stats = by_model[GROUP_KEYS + ['challenges_won', 'challenges_lost']].copy()
+    challenge_stats['total_challenges'] = challenge_stats['challenges_won'] + challenge_stats['challenges_lost']
+    challenge_stats['challenge_win_rate'] = np.divide(challenge_stats['challenges_won'], challenge_stats['total_challenges'])
+    challenge_stats['challenge_win_rate'] = challenge_stats['challenge_win_rate'].replace([np.inf, -np.inf], np.nan).fillna(0)
+    metrics['challenges'] = challenge_stats
+
+    aggression_stats = by_model[GROUP_KEYS + ['attacks_launched', 'attacks_received']].copy()
+    aggression_stats['total_rounds'] = by_model['rounds_survived']
+    # Normalize by the number of rounds
+    aggression_stats['attacks_launched_per_round'] = np.divide(aggression_stats['attacks_launched'], aggression_stats['total_rounds'])
+    aggression_stats['attacks_received_per_round'] = np.divide(aggression_stats['attacks_received'], aggression_stats['total_rounds'])
+    metrics['aggression'] = aggression_stats
+
+    game_dynamics = partial['play_time'][['public_discussion']].copy()
+    game_dynamics['avg_play_time'] = partial['play_time']['total_play_time'] / partial['play_time']['players']
+    metrics['game_dynamics'] = game_dynamics
+
+    return metrics
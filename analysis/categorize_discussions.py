@@ -1,9 +1,12 @@
 import os
 import re
 import csv
+import argparse
 import logging
 import pandas as pd
 
+import sampling
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -82,11 +85,21 @@ def process_log_file(filepath):
 
 def main():
     """Main function to process all relevant logs and write to a new CSV."""
+    parser = argparse.ArgumentParser(description="Categorize the public discussion in the game logs.")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="Only process up to N games per (model set, discussion, player count) stratum, "
+                             "writing to a separate *_sample_N_SEED.csv file.")
+    args = parser.parse_args()
+
     logging.info("Starting discussion log processing...")
 
     try:
-        results_df = pd.read_csv(RESULTS_FILE)
-        relevant_game_ids = set(results_df['game_id'].unique())
+        if args.sample:
+            # Streams results.csv, keeping only the sampled games
+            relevant_game_ids = set(sampling.draw_sample(args.sample, results_file=RESULTS_FILE)['game_id'])
+        else:
+            results_df = pd.read_csv(RESULTS_FILE)
+            relevant_game_ids = set(results_df['game_id'].unique())
         logging.info(f"Loaded {len(relevant_game_ids)} unique game IDs from {RESULTS_FILE}.")
     except FileNotFoundError:
         logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
@@ -101,13 +114,15 @@ def main():
     # Filter logs to only include those present in results.csv
     log_files_to_process = [f for f in all_log_files if f.replace('.txt', '') in relevant_game_ids]
 
+    output_file = sampling.sample_path(OUTPUT_FILE, args.sample) if args.sample else OUTPUT_FILE
+
     if not log_files_to_process:
         logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
         return
 
     logging.info(f"Found {len(log_files_to_process)} relevant log files to process...")
 
-    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8') as csvfile:
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
         fieldnames = ['game_id', 'player', 'model', 'message', 'category']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
@@ -121,7 +136,7 @@ def main():
             if file_count % 50 == 0:
                 logging.info(f"Processed {file_count}/{len(log_files_to_process)} files...")
 
-    logging.info(f"Processing complete. Output written to '{OUTPUT_FILE}'.")
+    logging.info(f"Processing complete. Output written to '{output_file}'.")
 
 if __name__ == '__main__':
     main()
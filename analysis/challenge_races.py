@@ -0,0 +1,255 @@
+import os
+import logging
+from collections import Counter
+
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR
+from plotting import get_color_map, save_plot, plot_by_model, model_legend
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, replay_logs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+CHALLENGE_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "challenges")
+CLAIMS_FILE = os.path.join(CHALLENGE_OUTPUT_DIR, "claims.csv")
+CLAIM_CARDS = {'TAX': 'Duke', 'STEAL': 'Captain', 'ASSASSINATE': 'Assassin', 'EXCHANGE': 'Ambassador'}
+# Events between a claim and its outcome that belong to the challenge itself
+CHALLENGE_EVENTS = {'multiple_challengers', 'challenge', 'challenge_resolution', 'has_cards', 'discussion'}
+COUNTERS = [
+    'decisions', 'challenges', 'selected', 'selected_won',
+    'decisions_others_challenged', 'challenges_others_challenged',
+    'decisions_on_bluffs', 'challenges_on_bluffs', 'decisions_on_truths', 'challenges_on_truths',
+]
+
+
+class ChallengeRaceCollector:
+    """
+    Log handler that recovers every would-be challenger of each claim.
+
+    The engine asks all other alive players in parallel whether to challenge a
+    claim (an action needing a character, or a block). Each answer is logged as
+    a 💭 line, and when several want to challenge, 'Multiple challengers' lists
+    them before one is picked at random. A small state machine opens a claim on
+    its action or block line, takes the next 💭 line of each eligible player as
+    that player's decision, and closes the claim at its outcome. Players whose
+    decision was not logged (a failed model call defaults to no challenge) are
+    left out of the denominators. Whether the claim was a bluff comes from the
+    revealed cards when challenged and from the tracked hands otherwise.
+    """
+
+    def __init__(self):
+        self.claims = []
+        self.counts = Counter()  # (model, public_discussion, counter) -> count
+
+    def start_game(self, game_id, game):
+        self.game_id = game_id
+        self.models = {player: strip_provider(model) for player, model in game['models'].items()}
+        self.public_discussion = game['public_discussion']
+        self.alive = set(self.models)
+        self.hands = {}
+        self.claim = None
+
+    def _open(self, event, claimant, kind, card):
+        hand = self.hands.get(claimant)
+        self.claim = {
+            'round': event['round'], 'claimant': claimant, 'kind': kind,
+            'action': event.get('action', 'BLOCK'), 'card': card,
+            'eligible': sorted(self.alive - {claimant}), 'decided': [], 'deciding': True,
+            'challengers': [], 'selected': None,
+            'bluff': None if hand is None else card not in hand, 'challenge_won': None,
+        }
+
+    def _close(self):
+        claim, self.claim = self.claim, None
+        decided = set(claim['decided']) | set(claim['challengers'])
+        challengers = set(claim['challengers'])
+        for player in decided:
+            key = (self.models.get(player), self.public_discussion)
+            challenged = player in challengers
+            others_challenged = bool(challengers - {player})
+            self.counts[key + ('decisions',)] += 1
+            self.counts[key + ('challenges',)] += challenged
+            if others_challenged:
+                self.counts[key + ('decisions_others_challenged',)] += 1
+                self.counts[key + ('challenges_others_challenged',)] += challenged
+            if claim['bluff'] is not None:
+                truth = 'bluffs' if claim['bluff'] else 'truths'
+                self.counts[key + (f'decisions_on_{truth}',)] += 1
+                self.counts[key + (f'challenges_on_{truth}',)] += challenged
+            if player == claim['selected']:
+                self.counts[key + ('selected',)] += 1
+                self.counts[key + ('selected_won',)] += bool(claim['challenge_won'])
+
+        self.claims.append({
+            'game_id': self.game_id,
+            'round': claim['round'],
+            'public_discussion': self.public_discussion,
+            'claimant': claim['claimant'],
+            'claimant_model': self.models.get(claim['claimant']),
+            'kind': claim['kind'],
+            'action': claim['action'],
+            'card': claim['card'],
+            'eligible': len(claim['eligible']),
+            'decisions_logged': len(decided),
+            'challengers': ';'.join(sorted(challengers)),
+            'challenger_models': ';'.join(self.models.get(p, '') for p in sorted(challengers)),
+            'selected': claim['selected'],
+            'bluff': claim['bluff'],
+            'challenge_won': claim['challenge_won'],
+        })
+
+    def handle(self, event):
+        kind = event['kind']
+        if self.claim is not None:
+            if kind == 'reasoning':
+                player = event['player']
+                if self.claim['deciding'] and player in self.claim['eligible'] and player not in self.claim['decided']:
+                    self.claim['decided'].append(player)
+                    self.claim['deciding'] = len(self.claim['decided']) < len(self.claim['eligible'])
+                else:
+                    # A second line from the same player (or the claimant) is the next decision
+                    self.claim['deciding'] = False
+                return
+            if kind in CHALLENGE_EVENTS:
+                self._handle_challenge(event)
+                return
+            if kind == 'reveal':
+                self.claim['bluff'] = not event['has_card']
+                self.claim['challenge_won'] = not event['has_card']
+                self._close()
+            else:
+                if kind == 'bluff' and event['player'] == self.claim['claimant']:
+                    self.claim['bluff'] = True
+                self._close()
+
+        if kind == 'state':
+            self.alive = {player for player, row in event['players'].items() if row['status'] == 'Alive'}
+            self.hands = {player: row['hand'] for player, row in event['players'].items()}
+        elif kind == 'turn':
+            self.hands[event['player']] = event['cards']
+        elif kind == 'elimination':
+            self.alive.discard(event['player'])
+        elif kind == 'action' and event['action'] in CLAIM_CARDS and not event['forced']:
+            self._open(event, event['player'], 'action', CLAIM_CARDS[event['action']])
+        elif kind == 'block':
+            self._open(event, event['player'], 'block', event['card'])
+
+    def _handle_challenge(self, event):
+        kind = event['kind']
+        # Older logs print a 'Challenge!' line for every challenger, newer ones only for the selected one
+        if kind == 'multiple_challengers':
+            self.claim['challengers'] = sorted(set(self.claim['challengers']) | set(event['players']))
+        elif kind == 'challenge':
+            self.claim['selected'] = event['player']
+            if event['player'] not in self.claim['challengers']:
+                self.claim['challengers'].append(event['player'])
+        elif kind == 'challenge_resolution':
+            self.claim['selected'] = event['player']
+        elif kind == 'has_cards':
+            self.hands[event['player']] = event['cards']
+        self.claim['deciding'] = False
+
+    def end_game(self):
+        if self.claim is not None:
+            self._close()
+
+
+def race_summary(counts):
+    """Per-model challenge propensity, herding and counterfactual accuracy from the collector's counters."""
+    rows = {}
+    for (model, public_discussion, counter), value in counts.items():
+        rows.setdefault((model, public_discussion), dict.fromkeys(COUNTERS, 0))[counter] += value
+    summary = pd.DataFrame([{'model': m, 'public_discussion': d, **c} for (m, d), c in rows.items()])
+    summary = summary[~summary['model'].isin(EXCLUDED_MODELS)].sort_values(['model', 'public_discussion'])
+
+    def rate(numerator, denominator):
+        return summary[numerator] / summary[denominator].where(summary[denominator] > 0)
+
+    summary['propensity'] = rate('challenges', 'decisions')
+    # Share of a model's challenges made in a race with other challengers
+    summary['herding_rate'] = rate('challenges_others_challenged', 'challenges')
+    # How much more likely a model is to challenge when someone else does too
+    alone_decisions = summary['decisions'] - summary['decisions_others_challenged']
+    alone_challenges = summary['challenges'] - summary['challenges_others_challenged']
+    summary['herding_lift'] = rate('challenges_others_challenged', 'decisions_others_challenged') / (
+        alone_challenges / alone_decisions.where(alone_decisions > 0))
+    summary['selection_rate'] = rate('selected', 'challenges')
+    summary['selected_accuracy'] = rate('selected_won', 'selected')
+    # Counterfactual accuracy: every would-be challenge, selected or not, against the claim's truth
+    summary['counterfactual_accuracy'] = summary['challenges_on_bluffs'] / (
+        summary['challenges_on_bluffs'] + summary['challenges_on_truths']).where(lambda n: n > 0)
+    summary['bluff_detection_rate'] = rate('challenges_on_bluffs', 'decisions_on_bluffs')
+    summary['false_alarm_rate'] = rate('challenges_on_truths', 'decisions_on_truths')
+    return summary.reset_index(drop=True)
+
+
+def plot_summary(summary, plot_path):
+    """Propensity, herding lift, and selected vs counterfactual accuracy per model and discussion setting."""
+    data = summary.copy()
+    data['group'] = data['public_discussion'].map({True: 'With Discussion', False: 'Without Discussion'})
+    groups = [g for g in ['Without Discussion', 'With Discussion'] if g in set(data['group'])]
+    models = sorted(data['model'].unique())
+    color_map = get_color_map(models)
+
+    panels = [
+        ('propensity', 'Challenge propensity', 'Challenges per logged decision', 'decisions'),
+        ('herding_lift', 'Herding lift', 'P(challenge | others challenge) / P(challenge | alone)', None),
+        ('selected_accuracy', 'Accuracy of selected challenges', 'Share won', 'selected'),
+        ('counterfactual_accuracy', 'Accuracy of all would-be challenges', 'Share against a bluff', 'challenges'),
+    ]
+    fig, axes = plt.subplots(2, 2, figsize=(20, 14))
+    fig.suptitle('Simultaneous Challengers by Model', fontsize=16)
+    needs_legend = False
+    for ax, (column, title, label, count_column) in zip(axes.flat, panels):
+        needs_legend = plot_by_model(ax, data, column, groups, models, color_map, label, count_column)
+        ax.set_title(title)
+    if needs_legend:
+        model_legend(fig, models, color_map, loc='upper right')
+    fig.tight_layout(rect=[0, 0.03, 0.9, 0.95])
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def main():
+    """Recovers every would-be challenger from the logs and summarizes challenge races per model."""
+    logging.info("Starting challenge race extraction...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    collector = ChallengeRaceCollector()
+    replay_logs(log_files, game_index, [collector])
+
+    os.makedirs(CHALLENGE_OUTPUT_DIR, exist_ok=True)
+    claims = pd.DataFrame(collector.claims)
+    claims.to_csv(CLAIMS_FILE, index=False)
+    challenged = claims[claims['challengers'] != '']
+    races = (challenged['challengers'].str.count(';') > 0).sum()
+    logging.info(f"{len(claims)} claims written to '{CLAIMS_FILE}': {len(challenged)} challenged, "
+                 f"{races} by several players at once.")
+
+    summary = race_summary(collector.counts)
+    summary.to_csv(os.path.join(CHALLENGE_OUTPUT_DIR, "challenge_races.csv"), index=False)
+    print("--- Challenge Races by Model ---")
+    print(summary[['model', 'public_discussion', 'decisions', 'challenges', 'selected', 'propensity', 'herding_rate',
+                   'herding_lift', 'selected_accuracy', 'counterfactual_accuracy']].to_string(index=False))
+
+    plot_summary(summary, os.path.join(CHALLENGE_OUTPUT_DIR, "challenge_races.png"))
+    logging.info("Finished challenge race extraction.")
+
+
+if __name__ == '__main__':
+    main()
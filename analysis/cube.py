@@ -0,0 +1,251 @@
+import io
+import os
+import sys
+import pickle
+import hashlib
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+from main import EXCLUDED_MODELS, RESULTS_FILE
+from aggregates import MIN_MIXED_MODELS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+CUBE_FILE = "results_cube.pkl"
+CUBE_VERSION = 2
+DATE_BUCKET_FREQ = 'W'  # pandas period frequency of the date_bucket dimension
+TAIL_CHECK_BYTES = 4096  # Bytes before the last processed offset that must be unchanged for an incremental refresh
+
+DIMENSIONS = ['model', 'public_discussion', 'personalities', 'players', 'game_type', 'date_bucket']
+GAME_DIMENSIONS = DIMENSIONS[1:]  # Constant within a game
+
+# Additive measures summed over each cell. 'games' counts distinct games per model,
+# so it stays additive over every dimension except model; roll-ups without model
+# count distinct games from the per-game table instead.
+MEASURES = [
+    'games', 'player_games', 'wins', 'num_bluffs', 'successful_bluffs', 'failed_bluffs',
+    'challenges_won', 'challenges_lost', 'coups_launched', 'total_coins_earned', 'coins_lost_to_theft',
+    'attacks_launched', 'attacks_received', 'elimination_round_sum', 'rounds_survived', 'total_play_time',
+]
+
+# Ratios derived from the additive measures after a roll-up
+DERIVED_MEASURES = {
+    'win_rate': lambda c: c['wins'] / c['games'],
+    'bluff_success_rate': lambda c: c['successful_bluffs'] / (c['successful_bluffs'] + c['failed_bluffs']),
+    'bluffs_per_game': lambda c: c['num_bluffs'] / c['player_games'],
+    'challenge_win_rate': lambda c: c['challenges_won'] / (c['challenges_won'] + c['challenges_lost']),
+    'avg_coins_earned': lambda c: c['total_coins_earned'] / c['player_games'],
+    'attacks_launched_per_round': lambda c: c['attacks_launched'] / c['rounds_survived'],
+    'attacks_received_per_round': lambda c: c['attacks_received'] / c['rounds_survived'],
+    'avg_elimination_round': lambda c: c['elimination_round_sum'] / c['player_games'],
+    'avg_play_time': lambda c: c['total_play_time'] / c['player_games'],
+}
+
+
+def add_dimensions(df):
+    """Adds the derived dimensions and per-row measures to results rows. Every game must be complete in df."""
+    df = df.copy()
+    games = df.groupby('game_id')
+    unique_models = games['model'].transform('nunique')
+    listed_models = games['all_models'].transform('first').str.split(';').str.len()
+    df['players'] = games['player_id'].transform('size')
+    df['game_type'] = np.select(
+        [unique_models == 1, listed_models >= MIN_MIXED_MODELS],
+        ['self_play', 'mixed'],
+        default='mixed_few_models'
+    )
+    df['date_bucket'] = pd.to_datetime(df['date'], utc=True).dt.tz_localize(None).dt.to_period(DATE_BUCKET_FREQ).astype(str)
+
+    game_duration = games['elimination_round'].transform('max')
+    df['elimination_round_sum'] = np.where(df['winner'], game_duration + 1, df['elimination_round'] + 1)
+    df['rounds_survived'] = np.where(df['winner'], game_duration, df['elimination_round'])
+    df['wins'] = df['winner'].astype(int)
+    return df
+
+
+def build_cells(df):
+    """Aggregates results rows (with add_dimensions applied) into cube cells."""
+    cells = df.groupby(DIMENSIONS).agg(
+        games=('game_id', 'nunique'),
+        player_games=('game_id', 'size'),
+        **{m: (m, 'sum') for m in MEASURES if m not in ('games', 'player_games')}
+    ).reset_index()
+    return cells
+
+
+def build_games(df):
+    """One row per game (with add_dimensions applied): its game-level dimensions and the models that played."""
+    games = df.groupby('game_id', as_index=False).agg(
+        **{d: (d, 'first') for d in GAME_DIMENSIONS},
+        models=('model', lambda models: ';'.join(sorted(set(models)))),
+    )
+    return games
+
+
+def merge_cells(*cell_tables):
+    """Adds cube cells together."""
+    return pd.concat(cell_tables, ignore_index=True).groupby(DIMENSIONS, as_index=False)[MEASURES].sum()
+
+
+def tail_digest(path, offset):
+    """Hashes the bytes just before offset, used to detect a rewritten results file."""
+    with open(path, 'rb') as f:
+        start = max(0, offset - TAIL_CHECK_BYTES)
+        f.seek(start)
+        return hashlib.blake2b(f.read(offset - start), digest_size=16).hexdigest()
+
+
+def load_cube(cube_file=CUBE_FILE):
+    """Loads the cube, or returns None if it is missing or from another version."""
+    if not os.path.exists(cube_file):
+        return None
+    with open(cube_file, 'rb') as f:
+        cube = pickle.load(f)
+    if cube.get('version') != CUBE_VERSION:
+        return None
+    return cube
+
+
+def save_cube(cube, cube_file=CUBE_FILE):
+    """Writes the cube atomically."""
+    tmp_file = cube_file + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(cube, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cube_file)
+
+
+def refresh_cube(results_file=RESULTS_FILE, cube_file=CUBE_FILE):
+    """
+    Brings the cube up to date with results.csv. Games are only ever appended
+    to results.csv, so only the bytes after the last processed offset are read;
+    the cube is rebuilt from scratch if the file was truncated or rewritten.
+    """
+    size = os.path.getsize(results_file)
+    cube = load_cube(cube_file)
+
+    if cube is not None and cube['offset'] <= size and tail_digest(results_file, cube['offset']) == cube['tail_digest']:
+        if cube['offset'] == size:
+            return cube
+        with open(results_file, 'rb') as f:
+            f.seek(cube['offset'])
+            new_bytes = f.read(size - cube['offset'])
+        new_rows = add_dimensions(pd.read_csv(io.BytesIO(cube['header'] + new_bytes)))
+        cube['cells'] = merge_cells(cube['cells'], build_cells(new_rows))
+        cube['games'] = pd.concat([cube['games'], build_games(new_rows)], ignore_index=True)
+        logging.info(f"Added {new_rows['game_id'].nunique()} new games to the cube.")
+    else:
+        with open(results_file, 'rb') as f:
+            header = f.readline()
+        df = add_dimensions(pd.read_csv(results_file))
+        cube = {'version': CUBE_VERSION, 'header': header, 'cells': build_cells(df), 'games': build_games(df)}
+        logging.info(f"Built cube from {df['game_id'].nunique()} games.")
+
+    cube['offset'] = size
+    cube['tail_digest'] = tail_digest(results_file, size)
+    save_cube(cube, cube_file)
+    return cube
+
+
+def parse_filters(where):
+    """Parses 'dimension=value[,value...]' filters."""
+    filters = {}
+    for clause in where or []:
+        dimension, _, values = clause.partition('=')
+        if dimension not in DIMENSIONS or not values:
+            raise ValueError(f"Invalid filter '{clause}'. Use one of {DIMENSIONS} as dimension=value[,value...]")
+        filters[dimension] = [v.strip().lower() for v in values.split(',')]
+    return filters
+
+
+def distinct_games(games, models, by, filters):
+    """Distinct games per 'by' group (game-level dimensions only) in which any of the given models played."""
+    played = games['models'].str.split(';').map(lambda m: not models.isdisjoint(m))
+    games = games[played]
+    for dimension, values in filters.items():
+        if dimension != 'model':
+            games = games[games[dimension].astype(str).str.lower().isin(values)]
+    if by:
+        return games.groupby(list(by)).size().rename('games').reset_index()
+    return pd.DataFrame({'games': [len(games)]})
+
+
+def query(cube, by=(), filters=None, measures=('games', 'wins', 'win_rate'), exclude_models=True):
+    """
+    Filters the cube, rolls it up to the 'by' dimensions and computes the requested
+    measures. Without 'model' in by, 'games' counts each game once, so win_rate is
+    the share of games won by the selected models.
+    """
+    cells = cube['cells']
+    filters = filters or {}
+    if exclude_models and EXCLUDED_MODELS:
+        cells = cells[~cells['model'].isin(EXCLUDED_MODELS)]
+    for dimension, values in filters.items():
+        cells = cells[cells[dimension].astype(str).str.lower().isin(values)]
+
+    if by:
+        rolled = cells.groupby(list(by), as_index=False)[MEASURES].sum()
+    else:
+        rolled = cells.assign(total=0).groupby('total')[MEASURES].sum().reset_index(drop=True)
+    if 'model' not in by:
+        games = distinct_games(cube['games'], set(cells['model']), by, filters)
+        if by:
+            rolled = rolled.drop(columns='games').merge(games, on=list(by), how='left')
+        else:
+            rolled['games'] = games['games'].iloc[0]
+
+    for measure in measures:
+        if measure in DERIVED_MEASURES:
+            rolled[measure] = DERIVED_MEASURES[measure](rolled).replace([np.inf, -np.inf], np.nan)
+        elif measure not in MEASURES:
+            raise ValueError(f"Unknown measure '{measure}'. Use one of {MEASURES + list(DERIVED_MEASURES)}")
+    return rolled[list(by) + list(measures)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slice-and-dice queries over a precomputed cube of game results.")
+    parser.add_argument('--by', default='model',
+                        help=f"Comma-separated dimensions to group by, from {DIMENSIONS}. Empty for a grand total.")
+    parser.add_argument('--where', action='append', metavar='DIM=VALUE[,VALUE...]',
+                        help="Filter on a dimension. Can be used multiple times.")
+    parser.add_argument('--measures', default='games,wins,win_rate',
+                        help=f"Comma-separated measures, from {MEASURES + list(DERIVED_MEASURES)}.")
+    parser.add_argument('--include-excluded', action='store_true', help="Keep the models in EXCLUDED_MODELS.")
+    parser.add_argument('--no-refresh', action='store_true', help="Query the cube as is, without reading new games.")
+    parser.add_argument('--csv', action='store_true', help="Print the result as CSV.")
+    args = parser.parse_args()
+
+    if args.no_refresh:
+        cube = load_cube()
+        if cube is None:
+            logging.error(f"No cube found at {CUBE_FILE}. Run without --no-refresh to build it.")
+            return
+    else:
+        try:
+            cube = refresh_cube()
+        except FileNotFoundError:
+            logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+            return
+
+    by = [d.strip() for d in args.by.split(',') if d.strip()]
+    for dimension in by:
+        if dimension not in DIMENSIONS:
+            parser.error(f"Unknown dimension '{dimension}'. Use one of {DIMENSIONS}")
+    measures = [m.strip() for m in args.measures.split(',') if m.strip()]
+
+    try:
+        result = query(cube, by, parse_filters(args.where), measures, exclude_models=not args.include_excluded)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.csv:
+        result.to_csv(sys.stdout, index=False)
+    else:
+        print(result.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
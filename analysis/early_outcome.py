@@ -0,0 +1,331 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from main import OUTPUT_DIR, RESULTS_FILE, save_plot
+from log_events import LOG_DIR, load_game_index, list_log_files, replay_logs
+from win_model import fit_conditional_logit
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+EARLY_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "early_outcome")
+# Numbers of '--- Game State ---' snapshots seen; the first snapshot is the opening deal
+SNAPSHOT_COUNTS = [1, 2, 4, 7, 13, 19, 25, 37, 49]
+FOLDS = 5
+FOLD_SEED = 42
+CONFIDENT_PROBABILITY = 0.9  # A game counts as decided early when one player's win probability reaches this
+
+CARDS = ['Duke', 'Assassin', 'Captain', 'Ambassador', 'Contessa']
+ACTIONS = ['INCOME', 'FOREIGN_AID', 'TAX', 'STEAL', 'ASSASSINATE', 'EXCHANGE', 'COUP']
+ACTION_CLAIMS = {'TAX': 'Duke', 'STEAL': 'Captain', 'ASSASSINATE': 'Assassin', 'EXCHANGE': 'Ambassador'}
+BLOCK_CARDS = ['Duke', 'Contessa', 'Captain', 'Ambassador']
+FEATURES = (
+    ['alive', 'influence', 'coins', 'seat']
+    + [f'hand[{card}]' for card in CARDS]
+    + [f'start[{card}]' for card in CARDS]
+    + [f'action[{action}]' for action in ACTIONS]
+    + [f'block[{card}]' for card in BLOCK_CARDS]
+    + ['challenges', 'bluff_claims', 'times_targeted']
+)
+FEATURE_INDEX = {feature: i for i, feature in enumerate(FEATURES)}
+
+
+class EarlyStateCollector:
+    """
+    Log handler that records every player's features after each of the first
+    SNAPSHOT_COUNTS state snapshots of a game: the state shown in the snapshot
+    (alive, influence, coins, hand), the opening deal, and the actions, blocks,
+    challenges and claims made up to it. Games that end earlier keep their final
+    state for the remaining counts. Features are small counts, stored as int16.
+    """
+
+    def __init__(self, winners):
+        self.winners = winners  # game_id -> winning player
+        self.features = []  # One (len(SNAPSHOT_COUNTS), players, len(FEATURES)) array per game
+        self.game_ids = []
+        self.winner_rows = []
+        self.decided = []  # One bool per game and snapshot count: at most one player alive
+
+    def start_game(self, game_id, game):
+        self.game_id = game_id
+        self.players = sorted(game['models'], key=lambda player: int(player.split()[-1]))
+        self.index = {player: i for i, player in enumerate(self.players)}
+        self.counts = np.zeros((len(self.players), len(FEATURES)), dtype=np.int16)
+        self.counts[:, FEATURE_INDEX['seat']] = np.arange(len(self.players))
+        self.hands = {}
+        self.snapshots = []
+        self.snapshot_decided = []
+        self.snapshot_count = 0
+
+    def _claim(self, player, card):
+        if card not in self.hands.get(player, [card]):
+            self.counts[self.index[player], FEATURE_INDEX['bluff_claims']] += 1
+
+    def handle(self, event):
+        kind = event['kind']
+        if kind == 'state':
+            self._snapshot(event)
+            return
+        player = event.get('player')
+        if player not in self.index:
+            return
+        row = self.counts[self.index[player]]
+        if kind == 'turn':
+            self.hands[player] = event['cards']
+        elif kind == 'action':
+            if event['action'] in ACTIONS:
+                row[FEATURE_INDEX[f"action[{event['action']}]"]] += 1
+            if event['action'] in ACTION_CLAIMS:
+                self._claim(player, ACTION_CLAIMS[event['action']])
+            if event['target'] in self.index:
+                self.counts[self.index[event['target']], FEATURE_INDEX['times_targeted']] += 1
+        elif kind == 'block' and event['card'] in BLOCK_CARDS:
+            row[FEATURE_INDEX[f"block[{event['card']}]"]] += 1
+            self._claim(player, event['card'])
+        elif kind == 'challenge':
+            row[FEATURE_INDEX['challenges']] += 1
+
+    def _snapshot(self, event):
+        if self.snapshot_count >= SNAPSHOT_COUNTS[-1]:
+            return
+        self.snapshot_count += 1
+        for player, state in event['players'].items():
+            if player not in self.index:
+                continue
+            row = self.counts[self.index[player]]
+            self.hands[player] = state['hand']
+            row[FEATURE_INDEX['alive']] = state['status'] == 'Alive'
+            row[FEATURE_INDEX['influence']] = len(state['hand'])
+            row[FEATURE_INDEX['coins']] = state['coins']
+            for card in CARDS:
+                row[FEATURE_INDEX[f'hand[{card}]']] = state['hand'].count(card)
+                if self.snapshot_count == 1:
+                    row[FEATURE_INDEX[f'start[{card}]']] = state['hand'].count(card)
+        if self.snapshot_count in SNAPSHOT_COUNTS:
+            self.snapshots.append(self.counts.copy())
+            self.snapshot_decided.append(self.counts[:, FEATURE_INDEX['alive']].sum() <= 1)
+
+    def end_game(self):
+        winner = self.winners.get(self.game_id)
+        if winner not in self.index or not self.snapshots or len(self.players) < 2:
+            return
+        # A game that ended early is known by its final state at every later count
+        missing = len(SNAPSHOT_COUNTS) - len(self.snapshots)
+        self.features.append(np.stack(self.snapshots + [self.counts.copy()] * missing))
+        self.decided.append(self.snapshot_decided + [True] * missing)
+        self.winner_rows.append(self.index[winner])
+        self.game_ids.append(self.game_id)
+
+
+def load_winners(results_file=RESULTS_FILE):
+    """Maps each game with exactly one winner to its winning player, e.g. 'Player 3'."""
+    df = pd.read_csv(results_file, usecols=['game_id', 'player_id', 'winner'])
+    df = df[df['winner'].astype(bool)]
+    df = df[~df['game_id'].duplicated(keep=False)]
+    return dict(zip(df['game_id'], 'Player ' + df['player_id'].str.replace('player', '')))
+
+
+def collect_features(collector):
+    """
+    Turns the per-game arrays into one (len(SNAPSHOT_COUNTS), rows, features)
+    tensor with the games' rows contiguous, plus the row starts of each game,
+    a winner mask over rows and a (games, len(SNAPSHOT_COUNTS)) decided mask.
+    """
+    sizes = np.array([game.shape[1] for game in collector.features])
+    group_starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    tensor = np.concatenate(collector.features, axis=1)
+    y = np.zeros(tensor.shape[1], dtype=bool)
+    y[group_starts + np.array(collector.winner_rows)] = True
+    return tensor, group_starts, y, np.array(collector.decided)
+
+
+def standardize(X):
+    """Scales every feature to unit variance so one ridge penalty fits them all; constant features get scale 1."""
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1
+    return X / scale, scale
+
+
+def identifiable_columns(X, group_starts, tolerance=1e-9):
+    """
+    Indexes of the columns of X the conditional logit can tell apart. Only
+    differences within a game matter, so columns that are constant within games,
+    copies of other columns (the hand at the opening deal equals the start
+    columns) or sums of them (the start cards always add up to two) are dropped;
+    ridge would otherwise split their effect between them. Columns are taken
+    from the last, so of two copies the later one is kept and the first card
+    becomes the reference. Works on the features x features Gram matrix of the
+    within-game deviations, so the rows are only read once.
+    """
+    group_sizes = np.diff(np.r_[group_starts, len(X)])
+    X = X.astype(float)
+    means = np.add.reduceat(X, group_starts) / group_sizes[:, None]
+    gram = X.T @ X - means.T @ (means * group_sizes[:, None])
+    scale = max(gram.diagonal().max(), 1.0)
+    kept = []
+    for column in range(X.shape[1] - 1, -1, -1):
+        # Within-game variance of the column left over after regressing it on the kept columns
+        residual = gram[column, column]
+        if kept:
+            cross = gram[kept, column]
+            residual -= cross @ np.linalg.solve(gram[np.ix_(kept, kept)], cross)
+        if residual > tolerance * scale:
+            kept.append(column)
+    return np.array(sorted(kept))
+
+
+def win_probabilities(X, beta, group_starts):
+    """Each row's probability of winning its game under the conditional logit."""
+    group_sizes = np.diff(np.r_[group_starts, len(X)])
+    eta = X @ beta
+    eta = eta - np.repeat(np.maximum.reduceat(eta, group_starts), group_sizes)
+    exp_eta = np.exp(eta)
+    return exp_eta / np.repeat(np.add.reduceat(exp_eta, group_starts), group_sizes)
+
+
+def subset_games(X, y, group_starts, game_mask):
+    """Rows of the games in game_mask, with their new group starts."""
+    group_sizes = np.diff(np.r_[group_starts, len(X)])
+    row_mask = np.repeat(game_mask, group_sizes)
+    kept_sizes = group_sizes[game_mask]
+    return X[row_mask], y[row_mask], np.r_[0, np.cumsum(kept_sizes)[:-1]]
+
+
+def evaluate(X, y, group_starts, beta):
+    """Per-game top-1 hit, log-likelihood of the winner, uniform log-likelihood and top probability."""
+    group_sizes = np.diff(np.r_[group_starts, len(X)])
+    p = win_probabilities(X, beta, group_starts)
+    game_of_row = np.repeat(np.arange(len(group_starts)), group_sizes)
+    # The first row of each game after sorting by descending probability is its predicted winner
+    order = np.lexsort((-p, game_of_row))
+    predicted = order[group_starts]
+    return {
+        'hit': y[predicted],
+        'log_likelihood': np.log(p[y]),
+        'uniform_log_likelihood': -np.log(group_sizes),
+        'top_probability': p[predicted],
+    }
+
+
+def accuracy_by_snapshots(tensor, group_starts, y, decided):
+    """
+    Cross-validates the conditional logit for every snapshot count (folds split
+    by game) and fits it once more on all games for the coefficient table.
+    """
+    n_games = len(group_starts)
+    folds = np.random.default_rng(FOLD_SEED).permutation(n_games) % FOLDS
+    rows, coefficients = [], []
+    full_beta = np.zeros(len(FEATURES))
+    for k, count in enumerate(SNAPSHOT_COUNTS):
+        start = time.perf_counter()
+        columns = identifiable_columns(tensor[k], group_starts)
+        X, scale = standardize(tensor[k][:, columns].astype(float))
+        # Each fit warm-starts from the last one, so most take only a few Newton steps
+        beta, covariance, _ = fit_conditional_logit(X, y, group_starts, full_beta[columns])
+        full_beta[columns] = beta
+        held_out = {}
+        for fold in range(FOLDS):
+            X_train, y_train, starts_train = subset_games(X, y, group_starts, folds != fold)
+            fold_beta, _, _ = fit_conditional_logit(X_train, y_train, starts_train, beta)
+            X_test, y_test, starts_test = subset_games(X, y, group_starts, folds == fold)
+            for name, values in evaluate(X_test, y_test, starts_test, fold_beta).items():
+                held_out.setdefault(name, np.empty(n_games))[folds == fold] = values
+        elapsed = time.perf_counter() - start
+
+        undecided = ~decided[:, k]
+        confident = held_out['top_probability'] >= CONFIDENT_PROBABILITY
+        rows.append({
+            'snapshots': count,
+            'games': n_games,
+            'decided_share': decided[:, k].mean(),
+            'accuracy': held_out['hit'].mean(),
+            'undecided_accuracy': held_out['hit'][undecided].mean() if undecided.any() else np.nan,
+            'uniform_accuracy': np.exp(held_out['uniform_log_likelihood']).mean(),
+            # McFadden's pseudo R^2 against picking a winner uniformly at random
+            'pseudo_r2': 1 - held_out['log_likelihood'].sum() / held_out['uniform_log_likelihood'].sum(),
+            'confident_share': confident.mean(),
+            'confident_accuracy': held_out['hit'][confident].mean() if confident.any() else np.nan,
+            'fit_seconds': elapsed,
+        })
+        # Per-unit log-odds, undoing the standardization
+        coefficients += [
+            {'snapshots': count, 'feature': FEATURES[column], 'log_odds': b / s, 'std_error': np.sqrt(v) / s}
+            for column, b, s, v in zip(columns, beta, scale, np.diag(covariance))
+        ]
+        logging.info(f"{count} snapshots: accuracy {rows[-1]['accuracy']:.3f} ({FOLDS}-fold), fitted in {elapsed:.2f}s.")
+    return pd.DataFrame(rows), pd.DataFrame(coefficients)
+
+
+def plot_accuracy(accuracy, plot_path):
+    """Held-out winner accuracy and pseudo R^2 against the number of snapshots seen."""
+    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    fig.suptitle('Predicting the Winner from the First N Game States', fontsize=16)
+
+    ax = axes[0]
+    ax.plot(accuracy['snapshots'], accuracy['accuracy'], marker='o', label='All games')
+    ax.plot(accuracy['snapshots'], accuracy['undecided_accuracy'], marker='o', label='Games still undecided')
+    ax.plot(accuracy['snapshots'], accuracy['uniform_accuracy'], linestyle='--', color='gray', label='Random guess')
+    ax.plot(accuracy['snapshots'], accuracy['decided_share'], linestyle=':', color='black', label='Share already decided')
+    ax.set_xlabel('State snapshots seen (1 = opening deal)')
+    ax.set_ylabel('Held-out accuracy')
+    ax.set_ylim(0, 1)
+    ax.legend()
+
+    ax = axes[1]
+    ax.plot(accuracy['snapshots'], accuracy['pseudo_r2'], marker='o')
+    ax.set_xlabel('State snapshots seen (1 = opening deal)')
+    ax.set_ylabel("McFadden's pseudo R²")
+    ax.set_title('Share of the outcome uncertainty explained')
+
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def main():
+    """Extracts early-game features in one pass over the logs and reports winner prediction accuracy by snapshot count."""
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+        winners = load_winners(RESULTS_FILE)
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    collector = EarlyStateCollector(winners)
+    replay_logs(log_files, game_index, [collector])
+    if len(collector.features) < FOLDS:
+        logging.warning(f"Only {len(collector.features)} games with a single winner; need at least {FOLDS}.")
+        return
+    tensor, group_starts, y, decided = collect_features(collector)
+    logging.info(f"Extracted {len(FEATURES)} features for {len(group_starts)} games at {len(SNAPSHOT_COUNTS)} snapshot counts.")
+
+    accuracy, coefficients = accuracy_by_snapshots(tensor, group_starts, y, decided)
+
+    os.makedirs(EARLY_OUTPUT_DIR, exist_ok=True)
+    accuracy.to_csv(os.path.join(EARLY_OUTPUT_DIR, "accuracy_by_snapshots.csv"), index=False)
+    coefficients.to_csv(os.path.join(EARLY_OUTPUT_DIR, "coefficients.csv"), index=False)
+    print("--- Held-out Winner Accuracy by Snapshots Seen ---")
+    print(accuracy.to_string(index=False))
+    opening = coefficients[coefficients['snapshots'] == SNAPSHOT_COUNTS[0]]
+    reference = [card for card in CARDS if f'start[{card}]' not in set(opening['feature'])]
+    print(f"\n--- Opening Deal Coefficients (log-odds per unit, relative to {', '.join(reference) or 'no card'}) ---")
+    print(opening.to_string(index=False))
+
+    plot_accuracy(accuracy, os.path.join(EARLY_OUTPUT_DIR, "accuracy_by_snapshots.png"))
+    logging.info("Finished early outcome analysis.")
+
+
+if __name__ == '__main__':
+    main()
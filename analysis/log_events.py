@@ -0,0 +1,228 @@
+import os
+import re
+import logging
+import pandas as pd
+
+# Paths relative to the script's location in 'analysis/'
+LOG_DIR = '../logs/'
+RESULTS_FILE = '../results.csv'
+
+# Line patterns emitted by the game engine
+ROUND_PATTERN = re.compile(r'--- Round (\d+) ---')
+REASONING_PATTERN = re.compile(r'💭 (Player \d+)(?: \((.*?)\))?: (.*)')
+DISCUSSION_PATTERN = re.compile(r'\[DISCUSSION\] (Player \d+) \((.*?)\): (.*)')
+TURN_PATTERN = re.compile(r"(Player \d+) \((.*?)\)'s turn\. Cards: (.*), Coins: (-?\d+)")
+ACTION_PATTERN = re.compile(r'(Player \d+) \((.*?)\) (chooses:|is forced to) (\w+)(?: -> (Player \d+))?')
+MULTIPLE_CHALLENGERS_PATTERN = re.compile(r'Multiple challengers: (.*)\. Randomly selecting one\.')
+CHALLENGE_PATTERN = re.compile(r'Challenge! (Player \d+) \(.*?\) challenges (Player \d+)')
+CHALLENGE_RESOLUTION_PATTERN = re.compile(r'Resolving challenge: (Player \d+) \(.*?\) challenges (Player \d+) \(.*?\) over (\w+)')
+HAS_CARDS_PATTERN = re.compile(r'(Player \d+) \(.*?\) has cards: (.*)')
+REVEAL_PATTERN = re.compile(r'(Player \d+) \(.*?\) (reveals|does not have) (\w+)!')
+BLOCK_PATTERN = re.compile(r'(Player \d+) \(.*?\) blocks with (\w+)')
+BLOCK_RESULT_PATTERN = re.compile(r'player(\d+) (successfully blocked|failed to block) player(\d+) with (\w+)')
+LOSE_CARD_PATTERN = re.compile(r'(Player \d+) \(.*?\) loses a card: (\w+)')
+ELIMINATION_PATTERN = re.compile(r'(Player \d+) \(.*?\) has been eliminated due to (\w+)\.')
+BLUFF_PATTERN = re.compile(r'(Player \d+) \(.*?\) successfully bluffed!')
+GAME_OVER_PATTERN = re.compile(r'Game Over! Winner: (Player \d+)')
+DECK_SIZE_PATTERN = re.compile(r'Deck size: (\d+)')
+STATE_ROW_PATTERN = re.compile(r"│ \d+\s+│ '(Player \d+) \((.*?)\)'\s+│ '(\w+)'\s+│ (-?\d+)\s+│ '(.*?)'\s+│ '(.*?)'\s+│")
+PLAYER_NAME_PATTERN = re.compile(r'Player \d+')
+
+# Any line the engine writes itself. Reasoning and discussion texts can span
+# several lines; everything that is not an engine line is a continuation.
+ENGINE_LINE_PATTERN = re.compile(
+    r"(?:💭 |\[DISCUSSION\] |--- |-{10,}|[┌├└│]|Deck size:|Starting Coup Game!|Game Over!|"
+    r"Challenge! |Resolving challenge: |Multiple challengers: |ERROR: |"
+    r"player\d+ (?:successfully blocked|failed to block) |"
+    r"Player \d+ \(.*?\)(?:'s turn\.| chooses: | is forced to | blocks with | loses a card: | has cards: | reveals | does not have | has been eliminated | successfully bluffed!))"
+)
+
+
+def strip_provider(model):
+    """Removes the provider prefix from a model name, e.g. 'gemini:gemini-2.5-pro' -> 'gemini-2.5-pro'."""
+    return model.split(':')[-1]
+
+
+def load_game_index(results_file=RESULTS_FILE):
+    """Maps each game_id in results.csv to its discussion setting and per-player models."""
+    results_df = pd.read_csv(results_file, usecols=['game_id', 'player_id', 'model', 'public_discussion'])
+    game_index = {}
+    for row in results_df.itertuples(index=False):
+        game = game_index.setdefault(row.game_id, {'public_discussion': bool(row.public_discussion), 'models': {}})
+        player = 'Player ' + row.player_id.replace('player', '')
+        game['models'][player] = row.model
+    return game_index
+
+
+def list_log_files(game_ids, log_dir=LOG_DIR):
+    """Returns the paths of the log files whose game_id appears in game_ids."""
+    return [
+        os.path.join(log_dir, f) for f in sorted(os.listdir(log_dir))
+        if f.endswith('.txt') and f.replace('.txt', '') in game_ids
+    ]
+
+
+def split_cards(cards):
+    """Parses a logged card list such as 'Duke, Captain' ('None' or '' for no cards)."""
+    if cards in ('', 'None'):
+        return []
+    return [card.strip() for card in cards.split(',')]
+
+
+def parse_engine_line(line):
+    """
+    Parses one engine line into an event dict with a 'kind' key, or returns None
+    for lines that carry no game event. Players are named 'Player N'.
+    """
+    match = TURN_PATTERN.match(line)
+    if match:
+        return {'kind': 'turn', 'player': match.group(1), 'cards': split_cards(match.group(3)), 'coins': int(match.group(4))}
+    match = ACTION_PATTERN.match(line)
+    if match:
+        return {'kind': 'action', 'player': match.group(1), 'action': match.group(4),
+                'target': match.group(5), 'forced': match.group(3) == 'is forced to'}
+    match = MULTIPLE_CHALLENGERS_PATTERN.match(line)
+    if match:
+        return {'kind': 'multiple_challengers', 'players': PLAYER_NAME_PATTERN.findall(match.group(1))}
+    match = CHALLENGE_PATTERN.match(line)
+    if match:
+        return {'kind': 'challenge', 'player': match.group(1), 'target': match.group(2)}
+    match = CHALLENGE_RESOLUTION_PATTERN.match(line)
+    if match:
+        return {'kind': 'challenge_resolution', 'player': match.group(1), 'target': match.group(2), 'card': match.group(3)}
+    match = HAS_CARDS_PATTERN.match(line)
+    if match:
+        return {'kind': 'has_cards', 'player': match.group(1), 'cards': split_cards(match.group(2))}
+    match = REVEAL_PATTERN.match(line)
+    if match:
+        # The challenged player either reveals the card (challenge failed) or does not have it
+        return {'kind': 'reveal', 'player': match.group(1), 'card': match.group(3), 'has_card': match.group(2) == 'reveals'}
+    match = BLOCK_PATTERN.match(line)
+    if match:
+        return {'kind': 'block', 'player': match.group(1), 'card': match.group(2)}
+    match = BLOCK_RESULT_PATTERN.match(line)
+    if match:
+        return {'kind': 'block_result', 'player': f'Player {match.group(1)}', 'target': f'Player {match.group(3)}',
+                'card': match.group(4), 'success': match.group(2) == 'successfully blocked'}
+    match = LOSE_CARD_PATTERN.match(line)
+    if match:
+        return {'kind': 'lose_card', 'player': match.group(1), 'card': match.group(2)}
+    match = ELIMINATION_PATTERN.match(line)
+    if match:
+        return {'kind': 'elimination', 'player': match.group(1), 'cause': match.group(2)}
+    match = BLUFF_PATTERN.match(line)
+    if match:
+        return {'kind': 'bluff', 'player': match.group(1)}
+    match = GAME_OVER_PATTERN.match(line)
+    if match:
+        return {'kind': 'game_over', 'player': match.group(1)}
+    return None
+
+
+def iter_events(filepath):
+    """
+    Streams a log file and yields one dict per game event, in log order.
+
+    Every event has a 'kind' and the 'round' it happened in. Besides the engine
+    events of parse_engine_line, 'reasoning' and 'discussion' events carry the
+    player's text (multi-line texts joined back together), and 'state' events
+    carry each '--- Game State ---' snapshot as {'players': {player: {'status',
+    'coins', 'hand', 'lost'}}, 'deck_size'}.
+    """
+    current_round = 0
+    pending = None
+    snapshot = None
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+
+            if not ENGINE_LINE_PATTERN.match(line):
+                if pending is not None and line:
+                    pending['text'] += '\n' + line
+                continue
+
+            if pending is not None:
+                yield pending
+                pending = None
+
+            if snapshot is not None:
+                row = STATE_ROW_PATTERN.match(line)
+                if row:
+                    snapshot['players'][row.group(1)] = {
+                        'status': row.group(3),
+                        'coins': int(row.group(4)),
+                        'hand': split_cards(row.group(5)),
+                        'lost': split_cards(row.group(6)),
+                    }
+                    continue
+                deck_size = DECK_SIZE_PATTERN.match(line)
+                if deck_size:
+                    snapshot['deck_size'] = int(deck_size.group(1))
+                    yield snapshot
+                    snapshot = None
+                continue
+
+            if line.startswith('--- Game State ---'):
+                snapshot = {'kind': 'state', 'round': current_round, 'players': {}, 'deck_size': None}
+                continue
+
+            round_match = ROUND_PATTERN.match(line)
+            if round_match:
+                current_round = int(round_match.group(1))
+                yield {'kind': 'round', 'round': current_round}
+                continue
+
+            match = REASONING_PATTERN.match(line)
+            kind = 'reasoning'
+            if not match:
+                match = DISCUSSION_PATTERN.match(line)
+                kind = 'discussion'
+            if match:
+                pending = {
+                    'kind': kind,
+                    'round': current_round,
+                    'player': match.group(1).strip(),
+                    'model': match.group(2) or 'human',
+                    'text': match.group(3).strip(),
+                }
+                continue
+
+            event = parse_engine_line(line)
+            if event is not None:
+                event['round'] = current_round
+                yield event
+
+    if pending is not None:
+        yield pending
+
+
+def iter_texts(filepath):
+    """
+    Streams a log file and yields one dict per reasoning or discussion text,
+    with multi-line texts joined back together.
+    """
+    for event in iter_events(filepath):
+        if event['kind'] in ('reasoning', 'discussion'):
+            yield event
+
+
+def replay_logs(log_files, game_index, handlers):
+    """
+    Reads every log file once and feeds its events to each handler, so several
+    extractors share a single streaming pass. A handler implements
+    start_game(game_id, game), handle(event) and end_game(); game is the
+    game_index entry of the log's game_id.
+    """
+    for file_count, filepath in enumerate(log_files, start=1):
+        game_id = os.path.basename(filepath).replace('.txt', '')
+        game = game_index[game_id]
+        for handler in handlers:
+            handler.start_game(game_id, game)
+        for event in iter_events(filepath):
+            for handler in handlers:
+                handler.handle(event)
+        for handler in handlers:
+            handler.end_game()
+        if file_count % 50 == 0:
+            logging.info(f"Processed {file_count}/{len(log_files)} files...")
@@ -2,8 +2,15 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import argparse
 import logging
 
+import aggregates
+import metric_cache
+import sampling
+from plotting import (get_color_map, save_plot, plot_by_model, model_legend, annotate_cells, share_heatmap,
+                      MAX_GROUPED_MODELS, HEATMAP_ROW_HEIGHT)
+
 # --- Configuration ---
 EXCLUDED_MODELS = [
     'claude-3-5-haiku-latest',
@@ -11,336 +18,132 @@ EXCLUDED_MODELS = [
     'gpt-4.1-mini-2025-04-14'
 ]
 OUTPUT_DIR = "charts"
+RESULTS_FILE = "../results.csv"
+QUALITATIVE_FILE = "./qualitative_analysis.csv"
+DISCUSSION_FILE = "./discussion_analysis.csv"
+# How near-duplicate reasoning (see near_duplicates.py) counts in the qualitative charts:
+# None counts every decision, 'weight' weights each decision by 1 / cluster size,
+# 'dedup' counts each cluster once per model.
+NEAR_DUPLICATE_MODE = None
+# Per-(model, type) reasoning counts in each mode, written by near_duplicates.py
+NEAR_DUPLICATE_COUNTS_FILE = "./near_duplicate_counts.csv"
+NEAR_DUPLICATE_COLUMNS = {'weight': 'weighted', 'dedup': 'clusters'}
+CHUNK_SIZE = 50000  # Rows read at a time from the qualitative and discussion CSVs
+# Columns read from them; the free-text columns are never loaded
+QUALITATIVE_COLUMNS = ['game_id', 'model', 'type']
+DISCUSSION_COLUMNS = ['model', 'category']
+# Drop the games flagged by verify_logs.py before aggregating
+EXCLUDE_INVALID_GAMES = False
+INVALID_GAMES_FILE = "./invalid_games.csv"
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_color_map(categories):
-    """Creates a color map for a list of categories using distinct, vibrant colors."""
-    # Define a set of distinct, vibrant colors
-    distinct_colors = [
-        '#17becf',  # Cyan
-        '#aec7e8',  # Light Blue
-        '#ffbb78',  # Light Orange
-        '#98df8a',  # Light Green
-        '#ff9896',  # Light Red
-        '#c49c94',  # Light Brown
-        '#f7b6d3',  # Light Pink
-        '#c5b0d5',  # Light Purple
-        '#c7c7c7',  # Light Gray
-        '#dbdb8d',  # Light Olive
-        '#9edae5',  # Light Cyan
-        '#1f77b4',  # Blue
-        '#ff7f0e',  # Orange
-        '#2ca02c',  # Green
-        '#d62728',  # Red
-        '#9467bd',  # Purple
-        '#8c564b',  # Brown
-        '#e377c2',  # Pink
-        '#7f7f7f',  # Gray
-        '#bcbd22',  # Olive
-    ]
-    
-    color_map = {}
-    for i, category in enumerate(categories):
-        color_map[category] = distinct_colors[i % len(distinct_colors)]
-    return color_map
-
-def save_plot(fig, plot_path):
-    """Saves a matplotlib figure."""
-    os.makedirs(os.path.dirname(plot_path), exist_ok=True)
-    fig.savefig(plot_path, bbox_inches='tight')
-    plt.close(fig)
-
-def run_analysis(df, output_dir, analysis_type):
-    """Runs the full analysis suite on a given dataframe and saves the plots."""
-    if EXCLUDED_MODELS:
-        original_count = len(df)
-        df = df[~df['model'].isin(EXCLUDED_MODELS)]
-        logging.info(f"Filtered out {original_count - len(df)} records for excluded models.")
-
+def run_analysis(metrics, output_dir, analysis_type):
+    """Plots the full analysis suite from the metric tables built by aggregates.finalize_results."""
     logging.info(f"--- Starting {analysis_type} Analysis ---")
-    if df.empty:
+    if metrics is None or metrics['win_rate'].empty:
         logging.warning(f"No {analysis_type} games found to analyze. Skipping.")
         return
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # 1. Win Rate
-    logging.info("Calculating Win Rate...")
-    games_per_model = df.groupby(['model', 'public_discussion'])['game_id'].nunique().reset_index(name='games_played')
-    wins_per_model = df[df['winner']].groupby(['model', 'public_discussion']).size().reset_index(name='wins')
-    win_rate_stats = pd.merge(games_per_model, wins_per_model, on=['model', 'public_discussion'], how='left').fillna(0)
-    win_rate_stats['win_rate'] = win_rate_stats['wins'] / win_rate_stats['games_played']
-    
     discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
-    win_rate_stats['discussion'] = win_rate_stats['public_discussion'].map(discussion_map)
+    discussion_types = ['With Discussion', 'Without Discussion']
+
+    # 1. Win Rate
+    logging.info("Plotting Win Rate...")
+    win_rate_stats = metrics['win_rate'].copy()
+    win_rate_stats['group'] = win_rate_stats['public_discussion'].map(discussion_map)
 
     models = sorted(win_rate_stats['model'].unique())
     color_map = get_color_map(models)
-    
-    discussion_types = ['With Discussion', 'Without Discussion']
-    x_tick_labels = discussion_types
 
     fig, ax = plt.subplots(figsize=(12, 8))
-    
-    bar_width = 0.8 / len(models)
-    x_pos = 0
-    x_ticks = []
-
-    for discussion in discussion_types:
-        group_data = win_rate_stats[win_rate_stats['discussion'] == discussion]
-        group_data = group_data.sort_values('win_rate', ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        
-        bars = ax.bar(bar_positions, group_data['win_rate'], width=bar_width, color=[color_map[m] for m in group_data['model']])
-
-        # Add game counts on top of the bars
-        for bar, games in zip(bars, group_data['games_played']):
-            if not np.isnan(games):
-                ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f'n={int(games)}',
-                        ha='center', va='bottom', fontsize=9)
-
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        
-        x_pos += len(models) * bar_width + 0.4
-
-    ax.set_ylabel('Win Rate')
+    # Game counts go on top of the bars
+    if plot_by_model(ax, win_rate_stats, 'win_rate', discussion_types, models, color_map, 'Win Rate',
+                     count_column='games_played'):
+        model_legend(ax, models, color_map, loc='best')
     ax.set_title('Win Rate by Model')
-    ax.set_xticks(x_ticks)
-    ax.set_xticklabels(x_tick_labels, rotation=0, ha="center")
-    
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    ax.legend(legend_handles, models, title='Model', loc='best')
-    
     fig.tight_layout()
-    
+
     plot_path = os.path.join(output_dir, "win_rate_by_model.png")
     save_plot(fig, plot_path)
     logging.info(f"Saved plot to {plot_path}")
 
     # 2. Average Elimination Round
-    logging.info("Calculating Average Elimination Round...")
-    df_with_winner_rounds = df.copy()
-    df_with_winner_rounds['effective_elimination_round'] = np.where(
-        df_with_winner_rounds['winner'],
-        df_with_winner_rounds.groupby('game_id')['elimination_round'].transform('max') + 1,
-        df_with_winner_rounds['elimination_round'] + 1
-    )
-    elimination_stats = df_with_winner_rounds.groupby(['model', 'public_discussion'])['effective_elimination_round'].mean().reset_index(name='average_elimination_round')
-    
-    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
-    elimination_stats['discussion'] = elimination_stats['public_discussion'].map(discussion_map)
+    logging.info("Plotting Average Elimination Round...")
+    elimination_stats = metrics['elimination'].copy()
+    elimination_stats['group'] = elimination_stats['public_discussion'].map(discussion_map)
 
     models = sorted(elimination_stats['model'].unique())
     color_map = get_color_map(models)
-    
-    discussion_types = ['With Discussion', 'Without Discussion']
-    x_tick_labels = discussion_types
 
     fig, ax = plt.subplots(figsize=(12, 8))
-    
-    bar_width = 0.8 / len(models)
-    x_pos = 0
-    x_ticks = []
-
-    for discussion in discussion_types:
-        group_data = elimination_stats[elimination_stats['discussion'] == discussion]
-        group_data = group_data.sort_values('average_elimination_round', ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        
-        ax.bar(bar_positions, group_data['average_elimination_round'], width=bar_width, color=[color_map[m] for m in group_data['model']])
-
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        
-        x_pos += len(models) * bar_width + 0.4
-
-    ax.set_ylabel('Average Elimination Round')
+    if plot_by_model(ax, elimination_stats, 'average_elimination_round', discussion_types, models, color_map,
+                     'Average Elimination Round'):
+        model_legend(ax, models, color_map, loc='best')
     ax.set_title('Average Elimination Round by Model')
-    ax.set_xticks(x_ticks)
-    ax.set_xticklabels(x_tick_labels, rotation=0, ha="center")
-    
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    ax.legend(legend_handles, models, title='Model', loc='best')
-    
     fig.tight_layout()
-    
+
     plot_path = os.path.join(output_dir, "average_elimination_round_by_model.png")
     save_plot(fig, plot_path)
     logging.info(f"Saved plot to {plot_path}")
 
     # 2.5. Cause of Elimination
-    logging.info("Calculating Cause of Elimination...")
-    elimination_causes = df[df['cause_of_elimination'].notna()].copy()
-    elimination_causes['cause_of_elimination'] = elimination_causes['cause_of_elimination'].str.split(';')
-    elimination_causes = elimination_causes.explode('cause_of_elimination')
-    
-    # Merge Assassinated and Couped
-    elimination_causes['cause_of_elimination'] = elimination_causes['cause_of_elimination'].replace(['assassination', 'coup'], 'Assassination or Coup')
-    
-    elimination_causes_stats = elimination_causes.groupby(['model', 'public_discussion', 'cause_of_elimination']).size().reset_index(name='count')
-
-    # Normalize by the number of eliminations per model
-    total_eliminations = elimination_causes_stats.groupby(['model', 'public_discussion'])['count'].transform('sum')
-    elimination_causes_stats['percentage'] = (elimination_causes_stats['count'] / total_eliminations) * 100
-
-    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
-    elimination_causes_stats['discussion'] = elimination_causes_stats['public_discussion'].map(discussion_map)
+    logging.info("Plotting Cause of Elimination...")
+    elimination_causes_stats = metrics['elimination_causes'].copy()
+    elimination_causes_stats['group'] = (elimination_causes_stats['cause_of_elimination'] + "\n("
+                                         + elimination_causes_stats['public_discussion'].map(discussion_map) + ")")
 
     # Get unique models and assign colors
     models = sorted(elimination_causes_stats['model'].unique())
     color_map = get_color_map(models)
 
-    # Get unique causes and discussion types for x-axis
+    # One group per cause and discussion type on the x-axis
     causes = sorted(elimination_causes_stats['cause_of_elimination'].unique())
-    discussion_types = ['With Discussion', 'Without Discussion']
-    
-    x_tick_labels = []
-    for cause in causes:
-        for discussion in discussion_types:
-            x_tick_labels.append(f"{cause}\n({discussion})")
+    groups = [f"{cause}\n({discussion})" for cause in causes for discussion in discussion_types]
 
-    fig, ax = plt.subplots(figsize=(20, 10)) 
-    
-    bar_width = 0.8 / len(models)
-    
-    x_pos = 0
-    x_ticks = []
-
-    for cause in causes:
-        for discussion in discussion_types:
-            # Filter data for the current group
-            group_data = elimination_causes_stats[
-                (elimination_causes_stats['cause_of_elimination'] == cause) &
-                (elimination_causes_stats['discussion'] == discussion)
-            ]
-            
-            # Sort models by value for this group
-            group_data = group_data.sort_values('percentage', ascending=True)
-            
-            # Calculate bar positions for this group
-            bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-            
-            # Plot bars
-            bars = ax.bar(bar_positions, group_data['percentage'], width=bar_width, color=[color_map[m] for m in group_data['model']])
-            
-            # Add counts on top of the bars
-            for bar, count in zip(bars, group_data['count']):
-                if not np.isnan(count):
-                    ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f'n={int(count)}',
-                            ha='center', va='bottom', fontsize=9)
-
-            # Store center of group for x-tick
-            group_center = x_pos + (len(models) - 1) * bar_width / 2
-            x_ticks.append(group_center)
-            
-            # Move to the next group position
-            x_pos += len(models) * bar_width + 0.4 # Add gap between groups
-
-    ax.set_ylabel('Percentage of Eliminations (%)')
+    fig, ax = plt.subplots(figsize=(20, 10))
+    # Elimination counts go on top of the bars
+    if plot_by_model(ax, elimination_causes_stats, 'percentage', groups, models, color_map,
+                     'Percentage of Eliminations (%)', count_column='count', rotation=45):
+        model_legend(ax, models, color_map, loc='best')
     ax.set_title('Normalized Causes of Elimination by Model')
-    ax.set_xticks(x_ticks)
-    ax.set_xticklabels(x_tick_labels, rotation=45, ha="right")
-    
-    # Create custom legend
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    ax.legend(legend_handles, models, title='Model', loc='best')
-    
     fig.tight_layout()
-    
+
     plot_path = os.path.join(output_dir, "elimination_causes_by_model.png")
     save_plot(fig, plot_path)
     logging.info(f"Saved plot to {plot_path}")
 
     # 3. Deception Effectiveness
-    logging.info("Calculating Deception Effectiveness...")
-    df['game_duration'] = df.groupby('game_id')['elimination_round'].transform('max')
-    df['rounds_survived'] = np.where(df['winner'], df['game_duration'], df['elimination_round'])
-    df['bluffing_success_rate'] = df['successful_bluffs'] / (df['successful_bluffs'] + df['failed_bluffs'])
-    bluffing_analysis = df.groupby(['model', 'public_discussion']).agg(
-        bluffing_success_rate=('bluffing_success_rate', 'mean'),
-        bluffing_frequency=('num_bluffs', 'mean'),
-        total_bluffs=('num_bluffs', 'sum')
-    ).reset_index().fillna(0)
-
-    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
+    logging.info("Plotting Deception Effectiveness...")
+    bluffing_analysis = metrics['bluffing'].copy()
     bluffing_analysis['discussion'] = bluffing_analysis['public_discussion'].map(discussion_map)
-    
+    bluffing_analysis['group'] = bluffing_analysis['discussion']
+
     models = sorted(bluffing_analysis['model'].unique())
     color_map = get_color_map(models)
-    discussion_types = ['With Discussion', 'Without Discussion']
 
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(24, 10))
     fig.suptitle('Deception Behavior', fontsize=16)
 
-    # --- Plot 1: Bluffing Success Rate ---
-    metric1 = 'bluffing_success_rate'
+    # --- Plot 1: Bluffing Success Rate, with bluff counts on top of the bars ---
     ax1.set_title('Bluffing Success Rate')
-    ax1.set_ylabel('Success Rate')
-    
-    bar_width = 0.8 / len(models)
-    x_pos = 0
-    x_ticks = []
-    x_tick_labels = []
-
-    for discussion in discussion_types:
-        group_data = bluffing_analysis[bluffing_analysis['discussion'] == discussion]
-        group_data = group_data.sort_values(metric1, ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        bars = ax1.bar(bar_positions, group_data[metric1], width=bar_width, color=[color_map[m] for m in group_data['model']])
-
-        # Add bluff counts on top of the bars
-        for bar, bluffs in zip(bars, group_data['total_bluffs']):
-            if not np.isnan(bluffs):
-                ax1.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f'n={int(bluffs)}',
-                        ha='center', va='bottom', fontsize=9)
-        
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        x_tick_labels.append(discussion)
-        
-        x_pos += len(models) * bar_width + 0.4
-        
-    ax1.set_xticks(x_ticks)
-    ax1.set_xticklabels(x_tick_labels, rotation=0, ha="center")
+    legend = plot_by_model(ax1, bluffing_analysis, 'bluffing_success_rate', discussion_types, models, color_map,
+                           'Success Rate', count_column='total_bluffs')
 
     # --- Plot 2: Bluffing Frequency ---
-    metric2 = 'bluffing_frequency'
     ax2.set_title('Bluffing Frequency')
-    ax2.set_ylabel('Average Bluffs per Game')
-
-    x_pos = 0
-    x_ticks = []
-    x_tick_labels = []
-
-    for discussion in discussion_types:
-        group_data = bluffing_analysis[bluffing_analysis['discussion'] == discussion]
-        group_data = group_data.sort_values(metric2, ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        ax2.bar(bar_positions, group_data[metric2], width=bar_width, color=[color_map[m] for m in group_data['model']])
-        
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        x_tick_labels.append(discussion)
-        
-        x_pos += len(models) * bar_width + 0.4
-
-    ax2.set_xticks(x_ticks)
-    ax2.set_xticklabels(x_tick_labels, rotation=0, ha="center")
+    plot_by_model(ax2, bluffing_analysis, 'bluffing_frequency', discussion_types, models, color_map,
+                  'Average Bluffs per Game')
 
     # --- Legend and Layout ---
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    fig.legend(legend_handles, models, title='Model', loc='upper right', bbox_to_anchor=(0.99, 0.95))
-    
+    if legend:
+        model_legend(fig, models, color_map, loc='upper right', bbox_to_anchor=(0.99, 0.95))
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-    
+
     plot_path = os.path.join(output_dir, "deception_behavior.png")
     save_plot(fig, plot_path)
     logging.info(f"Saved plot to {plot_path}")
@@ -348,182 +151,69 @@ def run_analysis(df, output_dir, analysis_type):
     # --- New Heatmaps for Deception ---
     logging.info("Generating Deception Heatmaps...")
 
-    # Pivot data for heatmaps
-    bluffing_freq_pivot = bluffing_analysis.pivot(index='model', columns='discussion', values='bluffing_frequency').fillna(0)
-    bluffing_success_pivot = bluffing_analysis.pivot(index='model', columns='discussion', values='bluffing_success_rate').fillna(0)
-
-    # Plotting Bluffing Frequency Heatmap: P(bluff_attempt | model)
-    fig, ax = plt.subplots(figsize=(10, 8))
-    im = ax.imshow(bluffing_freq_pivot, cmap="YlGn")
-
-    # Add annotations
-    for i in range(len(bluffing_freq_pivot.index)):
-        for j in range(len(bluffing_freq_pivot.columns)):
-            ax.text(j, i, f"{bluffing_freq_pivot.iloc[i, j]:.2f}",
-                           ha="center", va="center", color="black")
-
-    ax.set_xticks(np.arange(len(bluffing_freq_pivot.columns)))
-    ax.set_yticks(np.arange(len(bluffing_freq_pivot.index)))
-    ax.set_xticklabels(bluffing_freq_pivot.columns)
-    ax.set_yticklabels(bluffing_freq_pivot.index)
-    ax.set_title("Bluffing Frequency (Avg Bluffs per Game)")
-    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
-    fig.tight_layout()
-    
-    plot_path = os.path.join(output_dir, "deception_frequency_heatmap.png")
-    save_plot(fig, plot_path)
-    logging.info(f"Saved plot to {plot_path}")
-
-
-    # Plotting Bluffing Success Rate Heatmap: P(success | model, discussion_mode)
-    fig, ax = plt.subplots(figsize=(10, 8))
-    im = ax.imshow(bluffing_success_pivot, cmap="YlGn")
-
-    # Add annotations
-    for i in range(len(bluffing_success_pivot.index)):
-        for j in range(len(bluffing_success_pivot.columns)):
-            ax.text(j, i, f"{bluffing_success_pivot.iloc[i, j]:.2f}",
-                           ha="center", va="center", color="black")
-
-    ax.set_xticks(np.arange(len(bluffing_success_pivot.columns)))
-    ax.set_yticks(np.arange(len(bluffing_success_pivot.index)))
-    ax.set_xticklabels(bluffing_success_pivot.columns)
-    ax.set_yticklabels(bluffing_success_pivot.index)
-    ax.set_title("Bluffing Success Rate")
-    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
-    fig.tight_layout()
-
-    plot_path = os.path.join(output_dir, "deception_success_heatmap.png")
-    save_plot(fig, plot_path)
-    logging.info(f"Saved plot to {plot_path}")
+    for metric, title, file_name in [
+        ('bluffing_frequency', "Bluffing Frequency (Avg Bluffs per Game)", "deception_frequency_heatmap.png"),  # P(bluff_attempt | model)
+        ('bluffing_success_rate', "Bluffing Success Rate", "deception_success_heatmap.png"),  # P(success | model, discussion_mode)
+    ]:
+        pivot = bluffing_analysis.pivot(index='model', columns='discussion', values=metric).fillna(0)
+
+        fig, ax = plt.subplots(figsize=(10, max(8, HEATMAP_ROW_HEIGHT * len(pivot))))
+        ax.imshow(pivot, cmap="YlGn", aspect='auto' if len(pivot) > MAX_GROUPED_MODELS else None)
+        annotate_cells(ax, pivot)
+
+        ax.set_xticks(np.arange(len(pivot.columns)))
+        ax.set_yticks(np.arange(len(pivot.index)))
+        ax.set_xticklabels(pivot.columns)
+        ax.set_yticklabels(pivot.index)
+        ax.set_title(title)
+        plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
+        fig.tight_layout()
+
+        plot_path = os.path.join(output_dir, file_name)
+        save_plot(fig, plot_path)
+        logging.info(f"Saved plot to {plot_path}")
 
     # 3. Economic Analysis
-    logging.info("Calculating Economic Analysis...")
-    eco_stats = df.groupby(['model', 'public_discussion']).agg(
-        avg_coins_earned=('total_coins_earned', 'mean'),
-        total_earned=('total_coins_earned', 'sum'),
-        coins_lost_to_theft=('coins_lost_to_theft', 'sum')
-    ).reset_index()
-    eco_stats['efficiency_ratio'] = np.divide(eco_stats['total_earned'], eco_stats['coins_lost_to_theft'])
-    eco_stats['efficiency_ratio'] = eco_stats['efficiency_ratio'].replace([np.inf, -np.inf], np.nan).fillna(0)
+    logging.info("Plotting Economic Analysis...")
+    eco_stats = metrics['economy'].copy()
+    eco_stats['group'] = eco_stats['public_discussion'].map(discussion_map)
 
-    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
-    eco_stats['discussion'] = eco_stats['public_discussion'].map(discussion_map)
-    
     models = sorted(eco_stats['model'].unique())
     color_map = get_color_map(models)
-    discussion_types = ['With Discussion', 'Without Discussion']
 
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(24, 10))
     fig.suptitle('Economic Performance', fontsize=16)
 
     # --- Plot 1: Average Coins Earned ---
-    metric1 = 'avg_coins_earned'
     ax1.set_title('Average Coins Earned')
-    ax1.set_ylabel('Average Coins')
-    
-    bar_width = 0.8 / len(models)
-    x_pos = 0
-    x_ticks = []
-    x_tick_labels = []
-
-    for discussion in discussion_types:
-        group_data = eco_stats[eco_stats['discussion'] == discussion]
-        group_data = group_data.sort_values(metric1, ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        ax1.bar(bar_positions, group_data[metric1], width=bar_width, color=[color_map[m] for m in group_data['model']])
-        
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        x_tick_labels.append(discussion)
-        
-        x_pos += len(models) * bar_width + 0.4
-        
-    ax1.set_xticks(x_ticks)
-    ax1.set_xticklabels(x_tick_labels, rotation=0, ha="center")
+    legend = plot_by_model(ax1, eco_stats, 'avg_coins_earned', discussion_types, models, color_map, 'Average Coins')
 
     # --- Plot 2: Economic Efficiency Ratio ---
-    metric2 = 'efficiency_ratio'
     ax2.set_title('Economic Efficiency (Earned/Lost to Theft)')
-    ax2.set_ylabel('Ratio')
-
-    x_pos = 0
-    x_ticks = []
-    x_tick_labels = []
-
-    for discussion in discussion_types:
-        group_data = eco_stats[eco_stats['discussion'] == discussion]
-        group_data = group_data.sort_values(metric2, ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        ax2.bar(bar_positions, group_data[metric2], width=bar_width, color=[color_map[m] for m in group_data['model']])
-        
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        x_tick_labels.append(discussion)
-        
-        x_pos += len(models) * bar_width + 0.4
-
-    ax2.set_xticks(x_ticks)
-    ax2.set_xticklabels(x_tick_labels, rotation=0, ha="center")
+    plot_by_model(ax2, eco_stats, 'efficiency_ratio', discussion_types, models, color_map, 'Ratio')
 
     # --- Legend and Layout ---
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    fig.legend(legend_handles, models, title='Model', loc='upper right', bbox_to_anchor=(0.99, 0.95))
-    
+    if legend:
+        model_legend(fig, models, color_map, loc='upper right', bbox_to_anchor=(0.99, 0.95))
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-    
+
     plot_path = os.path.join(output_dir, "economic_performance.png")
     save_plot(fig, plot_path)
     logging.info(f"Saved plot to {plot_path}")
 
     # 4. Challenge Analysis
-    logging.info("Calculating Challenge Rates...")
-    challenge_stats = df.groupby(['model', 'public_discussion']).agg(
-        challenges_won=('challenges_won', 'sum'),
-        challenges_lost=('challenges_lost', 'sum')
-    ).reset_index()
-    challenge_stats['total_challenges'] = challenge_stats['challenges_won'] + challenge_stats['challenges_lost']
-    challenge_stats['challenge_win_rate'] = np.divide(challenge_stats['challenges_won'], challenge_stats['total_challenges'])
-    challenge_stats['challenge_win_rate'] = challenge_stats['challenge_win_rate'].replace([np.inf, -np.inf], np.nan).fillna(0)
-    
-    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
-    challenge_stats['discussion'] = challenge_stats['public_discussion'].map(discussion_map)
+    logging.info("Plotting Challenge Rates...")
+    challenge_stats = metrics['challenges'].copy()
+    challenge_stats['group'] = challenge_stats['public_discussion'].map(discussion_map)
 
     models = sorted(challenge_stats['model'].unique())
     color_map = get_color_map(models)
-    
-    discussion_types = ['With Discussion', 'Without Discussion']
-    x_tick_labels = discussion_types
 
     fig, ax = plt.subplots(figsize=(12, 8))
-    
-    bar_width = 0.8 / len(models)
-    x_pos = 0
-    x_ticks = []
-
-    for discussion in discussion_types:
-        group_data = challenge_stats[challenge_stats['discussion'] == discussion]
-        group_data = group_data.sort_values('challenge_win_rate', ascending=True)
-        
-        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-        
-        ax.bar(bar_positions, group_data['challenge_win_rate'], width=bar_width, color=[color_map[m] for m in group_data['model']])
-
-        group_center = x_pos + (len(models) - 1) * bar_width / 2
-        x_ticks.append(group_center)
-        
-        x_pos += len(models) * bar_width + 0.4
-
-    ax.set_ylabel('Challenge Win Rate')
+    if plot_by_model(ax, challenge_stats, 'challenge_win_rate', discussion_types, models, color_map,
+                     'Challenge Win Rate'):
+        model_legend(ax, models, color_map, loc='best')
     ax.set_title('Challenge Win Rate by Model')
-    ax.set_xticks(x_ticks)
-    ax.set_xticklabels(x_tick_labels, rotation=0, ha="center")
-    
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    ax.legend(legend_handles, models, title='Model', loc='best')
-    
     fig.tight_layout()
 
     plot_path = os.path.join(output_dir, "challenge_behavior.png")
@@ -531,71 +221,30 @@ def run_analysis(df, output_dir, analysis_type):
     logging.info(f"Saved plot to {plot_path}")
 
     # 5. Aggression Analysis
-    logging.info("Calculating Aggression Metrics...")
-    aggression_stats = df.groupby(['model', 'public_discussion']).agg(
-        attacks_launched=('attacks_launched', 'sum'),
-        attacks_received=('attacks_received', 'sum'),
-        total_rounds=('rounds_survived', 'sum')
-    ).reset_index()
-
-    # Normalize by the number of rounds
-    aggression_stats['attacks_launched_per_round'] = np.divide(aggression_stats['attacks_launched'], aggression_stats['total_rounds'])
-    aggression_stats['attacks_received_per_round'] = np.divide(aggression_stats['attacks_received'], aggression_stats['total_rounds'])
-    
-    metrics = ['attacks_launched_per_round', 'attacks_received_per_round']
-    
+    logging.info("Plotting Aggression Metrics...")
+    aggression_stats = metrics['aggression']
+
+    aggression_metrics = ['attacks_launched_per_round', 'attacks_received_per_round']
+    metric_labels = {
+        'attacks_launched_per_round': 'Attacks Launched',
+        'attacks_received_per_round': 'Attacks Received'
+    }
+
     aggression_stats_melted = aggression_stats.melt(id_vars=['model', 'public_discussion'],
-                                                      value_vars=metrics,
+                                                      value_vars=aggression_metrics,
                                                       var_name='metric', value_name='value').fillna(0)
-
-    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
-    aggression_stats_melted['discussion'] = aggression_stats_melted['public_discussion'].map(discussion_map)
+    aggression_stats_melted['group'] = (aggression_stats_melted['metric'].map(metric_labels) + "\n("
+                                        + aggression_stats_melted['public_discussion'].map(discussion_map) + ")")
 
     models = sorted(aggression_stats_melted['model'].unique())
     color_map = get_color_map(models)
-
-    metric_labels = {
-        'attacks_launched_per_round': 'Attacks Launched', 
-        'attacks_received_per_round': 'Attacks Received'
-    }
-    discussion_types = ['With Discussion', 'Without Discussion']
-    
-    x_tick_labels = []
-    for metric in metrics:
-        for discussion in discussion_types:
-            x_tick_labels.append(f"{metric_labels[metric]}\n({discussion})")
+    groups = [f"{metric_labels[metric]}\n({discussion})" for metric in aggression_metrics for discussion in discussion_types]
 
     fig, ax = plt.subplots(figsize=(20, 10))
-    
-    bar_width = 0.8 / len(models)
-    x_pos = 0
-    x_ticks = []
-
-    for metric in metrics:
-        for discussion in discussion_types:
-            group_data = aggression_stats_melted[
-                (aggression_stats_melted['metric'] == metric) &
-                (aggression_stats_melted['discussion'] == discussion)
-            ]
-            group_data = group_data.sort_values('value', ascending=True)
-            
-            bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
-            
-            ax.bar(bar_positions, group_data['value'], width=bar_width, color=[color_map[m] for m in group_data['model']])
-            
-            group_center = x_pos + (len(models) - 1) * bar_width / 2
-            x_ticks.append(group_center)
-            
-            x_pos += len(models) * bar_width + 0.4
-
-    ax.set_ylabel('Average Quantity Per Round')
+    if plot_by_model(ax, aggression_stats_melted, 'value', groups, models, color_map,
+                     'Average Quantity Per Round', rotation=45):
+        model_legend(ax, models, color_map, loc='best')
     ax.set_title('Normalized Aggression Metrics')
-    ax.set_xticks(x_ticks)
-    ax.set_xticklabels(x_tick_labels, rotation=45, ha="right")
-    
-    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
-    ax.legend(legend_handles, models, title='Model', loc='best')
-    
     fig.tight_layout()
 
     plot_path = os.path.join(output_dir, "aggression_metrics.png")
@@ -603,16 +252,14 @@ def run_analysis(df, output_dir, analysis_type):
     logging.info(f"Saved plot to {plot_path}")
 
     # 6. Game Dynamics
-    logging.info("Analyzing Game Dynamics...")
-    game_dynamics = df.groupby('public_discussion').agg(
-        avg_play_time=('total_play_time', 'mean')
-    ).reset_index()
+    logging.info("Plotting Game Dynamics...")
+    game_dynamics = metrics['game_dynamics'].copy()
     discussion_map = {True: 'with discussion', False: 'without discussion'}
     game_dynamics['public_discussion'] = game_dynamics['public_discussion'].map(discussion_map)
 
     # Re-use the first two colors from the distinct color list for consistency
     colors = ['#17becf', '#aec7e8']
-    
+
     fig, ax = plt.subplots(figsize=(8, 6))
     ax.bar(game_dynamics['public_discussion'], game_dynamics['avg_play_time'], color=colors)
 
@@ -626,48 +273,92 @@ def run_analysis(df, output_dir, analysis_type):
     save_plot(fig, plot_path)
     logging.info(f"Saved plot to {plot_path}")
 
-def analyze_qualitative_data(output_dir):
-    """Analyzes qualitative data and creates pie charts for type distribution by model."""
+def load_near_duplicate_counts(mode, qualitative_file=QUALITATIVE_FILE):
+    """
+    Loads the per-(model, type) reasoning counts of a near-duplicate mode, which
+    near_duplicates.py precomputes from the cluster assignments. Returns None
+    when not needed, missing, or older than the qualitative CSV.
+    """
+    if mode is None:
+        return None
+    if mode not in NEAR_DUPLICATE_COLUMNS:
+        raise ValueError(f"Unknown near-duplicate mode: {mode}")
+    if not os.path.exists(NEAR_DUPLICATE_COUNTS_FILE):
+        logging.warning(f"{NEAR_DUPLICATE_COUNTS_FILE} not found. Counting every decision.")
+        return None
+    if os.path.getmtime(NEAR_DUPLICATE_COUNTS_FILE) < os.path.getmtime(qualitative_file):
+        logging.warning(f"{NEAR_DUPLICATE_COUNTS_FILE} is older than {os.path.basename(qualitative_file)}; "
+                        f"re-run near_duplicates.py. Counting every decision.")
+        return None
+
+    column = NEAR_DUPLICATE_COLUMNS[mode]
+    counts = pd.read_csv(NEAR_DUPLICATE_COUNTS_FILE, usecols=['model', 'type', column])
+    counts['model'] = counts['model'].str.split(':').str[-1]
+    counts = counts[~counts['model'].isin(EXCLUDED_MODELS)]
+    return counts.groupby(['model', 'type'], as_index=False)[column].sum().rename(columns={column: 'count'})
+
+def iter_record_chunks(path, columns, label):
+    """
+    Streams the given columns of a qualitative or discussion CSV in chunks of
+    CHUNK_SIZE rows, stripping provider prefixes and excluded models from each chunk.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    total_count, excluded_count = 0, 0
+    for chunk in pd.read_csv(path, usecols=[c for c in columns if c in header], chunksize=CHUNK_SIZE):
+        total_count += len(chunk)
+        # Preprocess model names - remove provider prefix
+        chunk['model'] = chunk['model'].str.split(':').str[-1]
+        # Filter out excluded models if any
+        if EXCLUDED_MODELS:
+            original_count = len(chunk)
+            chunk = chunk[~chunk['model'].isin(EXCLUDED_MODELS)]
+            excluded_count += original_count - len(chunk)
+        yield chunk
+    logging.info(f"Streamed {total_count} {label} records, filtered out {excluded_count} for excluded models.")
+
+def accumulate_counts(chunks, column):
+    """
+    Sums record weights per (model, column) over a stream of chunks. The running
+    total holds one row per (model, column), so memory does not grow with the file.
+    """
+    keys = ['model', column]
+    totals = None
+    for chunk in chunks:
+        partial = aggregates.partial_category_counts(chunk, column)
+        if totals is not None:
+            partial = pd.concat([totals, partial], ignore_index=True).groupby(keys, as_index=False)['count'].sum()
+        totals = partial
+    return totals
+
+def analyze_qualitative_data(type_counts, output_dir):
+    """Creates pie charts for type distribution by model from per-(model, type) counts."""
     logging.info("Starting Qualitative Analysis...")
     
-    try:
-        qual_df = pd.read_csv("./qualitative_analysis.csv")
-        logging.info(f"Loaded {len(qual_df)} qualitative records.")
-    except FileNotFoundError:
-        logging.warning("qualitative_analysis.csv not found. Skipping qualitative analysis.")
-        return
-    
-    if qual_df.empty:
+    if type_counts is None or type_counts.empty:
         logging.warning("No qualitative data found. Skipping qualitative analysis.")
         return
     
-    # Preprocess model names - remove provider prefix
-    qual_df['model'] = qual_df['model'].str.split(':').str[-1]
-    logging.info("Removed provider prefixes from model names.")
-    
-    # Filter out excluded models if any
-    if EXCLUDED_MODELS:
-        original_count = len(qual_df)
-        qual_df = qual_df[~qual_df['model'].isin(EXCLUDED_MODELS)]
-        logging.info(f"Filtered out {original_count - len(qual_df)} qualitative records for excluded models.")
-    
     qual_output_dir = os.path.join(output_dir, "qualitative")
     if not os.path.exists(qual_output_dir):
         os.makedirs(qual_output_dir)
     
     # Get unique models and types for consistent coloring
-    models = sorted(qual_df['model'].unique())  # Sort for consistency
-    types = sorted(qual_df['type'].unique())    # Sort for consistency
+    models = sorted(type_counts['model'].unique())  # Sort for consistency
+    types = sorted(type_counts['type'].unique())    # Sort for consistency
     color_map = get_color_map(types)
     
-    # Create individual model charts
+    # Create individual model charts, or one heatmap of every model's shares for large rosters
+    if len(models) > MAX_GROUPED_MODELS:
+        share_heatmap(type_counts, 'model', 'type', 'Type Distribution by Model',
+                      os.path.join(qual_output_dir, "type_distribution_heatmap.png"))
+        models = []
     for model in models:
-        model_data = qual_df[qual_df['model'] == model]
-        type_counts = model_data['type'].value_counts()
+        model_data = type_counts[(type_counts['model'] == model) & (type_counts['count'] > 0)]
+        model_type_counts = model_data.set_index('type')['count']
         
         # Ensure consistent ordering and colors
-        ordered_types = [t for t in types if t in type_counts.index]
-        ordered_counts = [type_counts[t] for t in ordered_types]
+        ordered_types = [t for t in types if t in model_type_counts.index]
+        ordered_counts = [model_type_counts[t] for t in ordered_types]
         colors = [color_map[t] for t in ordered_types]
         
         fig, ax = plt.subplots(figsize=(10, 10))
@@ -681,8 +372,7 @@ def analyze_qualitative_data(output_dir):
         logging.info(f"Created type distribution chart for {model}")
     
     # Create an overall summary chart
-    overall_type_counts = qual_df.groupby(['model', 'type']).size().reset_index(name='count')
-    pivot_df = overall_type_counts.pivot(index='model', columns='type', values='count').fillna(0)
+    pivot_df = type_counts.pivot(index='model', columns='type', values='count').fillna(0)
     
     # Ensure consistent column ordering
     pivot_df = pivot_df.reindex(columns=types, fill_value=0)
@@ -703,47 +393,34 @@ def analyze_qualitative_data(output_dir):
     
     logging.info("Finished Qualitative Analysis")
 
-def analyze_discussion_data(output_dir):
-    """Analyzes discussion data and creates pie charts for category distribution by model."""
+def analyze_discussion_data(category_counts, output_dir):
+    """Creates pie charts for discussion category distribution by model from per-(model, category) counts."""
     logging.info("Starting Discussion Analysis...")
     
-    try:
-        disc_df = pd.read_csv("./discussion_analysis.csv")
-        logging.info(f"Loaded {len(disc_df)} discussion records.")
-    except FileNotFoundError:
-        logging.warning("discussion_analysis.csv not found. Skipping discussion analysis.")
-        return
-    
-    if disc_df.empty:
+    if category_counts is None or category_counts.empty:
         logging.warning("No discussion data found. Skipping discussion analysis.")
         return
     
-    # Preprocess model names - remove provider prefix
-    disc_df['model'] = disc_df['model'].str.split(':').str[-1]
-    logging.info("Removed provider prefixes from model names.")
-    
-    # Filter out excluded models if any
-    if EXCLUDED_MODELS:
-        original_count = len(disc_df)
-        disc_df = disc_df[~disc_df['model'].isin(EXCLUDED_MODELS)]
-        logging.info(f"Filtered out {original_count - len(disc_df)} discussion records for excluded models.")
-    
     disc_output_dir = os.path.join(output_dir, "discussion")
     if not os.path.exists(disc_output_dir):
         os.makedirs(disc_output_dir)
     
     # Get unique models and categories for consistent coloring
-    models = disc_df['model'].unique()
-    categories = disc_df['category'].unique()
+    models = sorted(category_counts['model'].unique())
+    categories = sorted(category_counts['category'].unique())
     color_map = get_color_map(categories)
     
+    if len(models) > MAX_GROUPED_MODELS:
+        share_heatmap(category_counts, 'model', 'category', 'Discussion Category Distribution by Model',
+                      os.path.join(disc_output_dir, "category_distribution_heatmap.png"))
+        models = []
     for model in models:
-        model_data = disc_df[disc_df['model'] == model]
-        category_counts = model_data['category'].value_counts()
+        model_data = category_counts[(category_counts['model'] == model) & (category_counts['count'] > 0)]
+        model_category_counts = model_data.set_index('category')['count'].sort_values(ascending=False)
         
         fig, ax = plt.subplots(figsize=(10, 10))
-        colors = [color_map[c] for c in category_counts.index]
-        ax.pie(category_counts, labels=category_counts.index, autopct='%1.1f%%', startangle=90, colors=colors)
+        colors = [color_map[c] for c in model_category_counts.index]
+        ax.pie(model_category_counts, labels=model_category_counts.index, autopct='%1.1f%%', startangle=90, colors=colors)
         ax.axis('equal')
         ax.set_title(f"Discussion Category Distribution for {model}")
         
@@ -753,8 +430,7 @@ def analyze_discussion_data(output_dir):
         logging.info(f"Created discussion category distribution chart for {model}")
         
     # Create an overall summary chart
-    overall_category_counts = disc_df.groupby(['model', 'category']).size().reset_index(name='count')
-    pivot_df = overall_category_counts.pivot(index='model', columns='category', values='count').fillna(0)
+    pivot_df = category_counts.pivot(index='model', columns='category', values='count').fillna(0)
     
     fig, ax = plt.subplots(figsize=(15, 8))
     colors = [color_map[c] for c in pivot_df.columns]
@@ -772,57 +448,163 @@ def analyze_discussion_data(output_dir):
     
     logging.info("Finished Discussion Analysis")
 
-def main():
-    df = pd.read_csv("../results.csv")
-    logging.info(f"Loaded {len(df)} records.")
+def compute_results_state(df):
+    """Computes the mergeable partial aggregates of results.csv for one shard of games."""
+    df_self_play, df_mixed_model = aggregates.split_games(df)
+    logging.info(f"Split {df['game_id'].nunique()} games into {df_self_play['game_id'].nunique()} self-play "
+                 f"and {df_mixed_model['game_id'].nunique()} mixed-model games "
+                 f"(kept games with >= {aggregates.MIN_MIXED_MODELS} unique models)")
+
+    state = {'mixed_model/games_by_discussion': aggregates.partial_game_counts(df_mixed_model)}
+    for prefix, games in [('self_play', df_self_play), ('mixed_model', df_mixed_model)]:
+        if EXCLUDED_MODELS:
+            original_count = len(games)
+            games = games[~games['model'].isin(EXCLUDED_MODELS)]
+            logging.info(f"Filtered out {original_count - len(games)} {prefix} records for excluded models.")
+        for name, table in aggregates.partial_results(games).items():
+            state[f'{prefix}/{name}'] = table
+    return state
+
+def exclude_invalid_games(df):
+    """Drops the games listed in INVALID_GAMES_FILE, if verify_logs.py has written it."""
+    if not os.path.exists(INVALID_GAMES_FILE):
+        logging.warning(f"{os.path.basename(INVALID_GAMES_FILE)} not found. Run verify_logs.py first; keeping every game.")
+        return df
+    invalid = set(pd.read_csv(INVALID_GAMES_FILE, usecols=['game_id'])['game_id'])
+    kept = df[~df['game_id'].isin(invalid)]
+    logging.info(f"Excluded {df['game_id'].nunique() - kept['game_id'].nunique()} games that failed log verification.")
+    return kept
+
+def compute_qualitative_state(path=QUALITATIVE_FILE, sample=None):
+    """
+    Computes the per-(model, type) reasoning counts, streaming the qualitative CSV
+    in chunks, or takes them from near_duplicates.py in a near-duplicate mode.
+    With a sample, only sampled games count, weighted by their sampling weight.
+    """
+    if not os.path.exists(path):
+        logging.warning(f"{os.path.basename(path)} not found. Skipping qualitative analysis.")
+        return {}
+
+    counts = load_near_duplicate_counts(NEAR_DUPLICATE_MODE, path) if sample is None else None
+    if counts is not None:
+        logging.info(f"Using near-duplicate mode '{NEAR_DUPLICATE_MODE}' counts from {NEAR_DUPLICATE_COUNTS_FILE}.")
+        return {'qualitative/type_counts': counts}
+    if sample is not None and NEAR_DUPLICATE_MODE is not None:
+        logging.warning("Near-duplicate counts cover the whole corpus; counting every sampled decision.")
+
+    chunks = iter_record_chunks(path, QUALITATIVE_COLUMNS, 'qualitative')
+    if sample is not None:
+        chunks = (sampling.apply_sample(chunk, sample) for chunk in chunks)
+    type_counts = accumulate_counts(chunks, 'type')
+    if type_counts is None:
+        return {}
+    return {'qualitative/type_counts': type_counts}
+
+def compute_discussion_state(path=DISCUSSION_FILE, sample=None):
+    """
+    Computes the per-(model, category) discussion counts, streaming the discussion
+    CSV in chunks. With a sample, only sampled games count, weighted by their sampling weight.
+    """
+    if not os.path.exists(path):
+        logging.warning(f"{os.path.basename(path)} not found. Skipping discussion analysis.")
+        return {}
+
+    if sample is None:
+        chunks = iter_record_chunks(path, DISCUSSION_COLUMNS, 'discussion')
+    else:
+        chunks = (sampling.apply_sample(chunk, sample)
+                  for chunk in iter_record_chunks(path, DISCUSSION_COLUMNS + ['game_id'], 'discussion'))
+    category_counts = accumulate_counts(chunks, 'category')
+    if category_counts is None:
+        return {}
+    return {'discussion/category_counts': category_counts}
+
+def compute_partial_state(use_cache=True, sample_size=None):
+    """
+    Computes the partial state of this shard. Each part is memoized on disk,
+    keyed by its input files, filter parameters and code. With sample_size,
+    only a stratified sample of up to that many games per stratum is analyzed,
+    with every count weighted so that it estimates the full-corpus count.
+    """
+    sample = sampling.draw_sample(sample_size) if sample_size else None
+    qualitative_file, discussion_file = QUALITATIVE_FILE, DISCUSSION_FILE
+    if sample is not None:
+        # Prefer the outputs of process_logs.py / categorize_discussions.py --sample when they exist
+        qualitative_file, discussion_file = [
+            sampling.sample_path(path, sample_size) if os.path.exists(sampling.sample_path(path, sample_size)) else path
+            for path in (QUALITATIVE_FILE, DISCUSSION_FILE)
+        ]
+
+    def load_results_state():
+        df = pd.read_csv(RESULTS_FILE)
+        logging.info(f"Loaded {len(df)} records.")
+        if EXCLUDE_INVALID_GAMES:
+            df = exclude_invalid_games(df)
+        if sample is not None:
+            df = sampling.apply_sample(df, sample)
+            logging.info(f"Kept {len(df)} records of sampled games.")
+        return compute_results_state(df)
+
+    sample_params = {'sample_size': sample_size, 'sample_seed': sampling.SAMPLE_SEED if sample_size else None}
+    parts = [
+        ('results', load_results_state, [RESULTS_FILE] + ([INVALID_GAMES_FILE] if EXCLUDE_INVALID_GAMES else []),
+         {'excluded_models': EXCLUDED_MODELS, 'min_mixed_models': aggregates.MIN_MIXED_MODELS,
+          'exclude_invalid_games': EXCLUDE_INVALID_GAMES, **sample_params},
+         [aggregates, compute_results_state, exclude_invalid_games, sampling]),
+        ('qualitative', lambda: compute_qualitative_state(qualitative_file, sample), [qualitative_file, NEAR_DUPLICATE_COUNTS_FILE],
+         {'excluded_models': EXCLUDED_MODELS, 'near_duplicate_mode': NEAR_DUPLICATE_MODE, **sample_params},
+         [aggregates, compute_qualitative_state, load_near_duplicate_counts, iter_record_chunks, accumulate_counts, sampling]),
+        ('discussion', lambda: compute_discussion_state(discussion_file, sample), [discussion_file],
+         {'excluded_models': EXCLUDED_MODELS, **sample_params},
+         [aggregates, compute_discussion_state, iter_record_chunks, accumulate_counts, sampling]),
+    ]
 
-    # Identify self-play games
-    game_model_counts = df.groupby('game_id')['model'].nunique()
-    self_play_game_ids = game_model_counts[game_model_counts == 1].index
-    
-    # Create dataframes for each analysis type
-    df_self_play = df[df['game_id'].isin(self_play_game_ids)]
-    df_mixed_model = df[~df['game_id'].isin(self_play_game_ids)]
-
-    # Filter mixed-model games to only include those with at least 3 unique models
-    game_model_counts_mixed = df_mixed_model.groupby('game_id')['all_models'].first().apply(lambda x: len(x.split(';')))
-    games_with_enough_models = game_model_counts_mixed[game_model_counts_mixed >= 3].index
-    original_mixed_games = len(df_mixed_model['game_id'].unique())
-    df_mixed_model = df_mixed_model[df_mixed_model['game_id'].isin(games_with_enough_models)]
-    filtered_mixed_games = len(df_mixed_model['game_id'].unique())
-    logging.info(f"Filtered mixed-model games: {original_mixed_games} -> {filtered_mixed_games} (kept games with >= 3 unique models)")
-
-    # --- Basic Statistics ---
-    mixed_games_discussion_counts = df_mixed_model.groupby('public_discussion')['game_id'].nunique()
-    games_with_discussion = mixed_games_discussion_counts.get(True, 0)
-    games_without_discussion = mixed_games_discussion_counts.get(False, 0)
-
-    df_mixed_model_filtered_for_stats = df_mixed_model[~df_mixed_model['model'].isin(EXCLUDED_MODELS)]
-    
-    games_per_model = df_mixed_model_filtered_for_stats.groupby(['model', 'public_discussion'])['game_id'].nunique().reset_index(name='games_played')
-    wins_per_model = df_mixed_model_filtered_for_stats[df_mixed_model_filtered_for_stats['winner']].groupby(['model', 'public_discussion']).size().reset_index(name='wins')
-    win_rate_stats = pd.merge(games_per_model, wins_per_model, on=['model', 'public_discussion'], how='left').fillna(0)
+    state = {}
+    for name, compute, inputs, params, code in parts:
+        if use_cache:
+            state.update(metric_cache.cached(name, compute, inputs=inputs, params=params, code=code))
+        else:
+            state.update(compute())
+    return state
+
+def basic_statistics(state):
+    """Mixed-model game counts and average bluff success rates, with and without discussion."""
+    mixed_games_discussion_counts = state['mixed_model/games_by_discussion'].set_index('public_discussion')['games']
+    bluffing_sums = state['mixed_model/by_model'].groupby('public_discussion')[['bluffing_success_rate_sum', 'bluffing_success_rate_count']].sum()
+    bluffing_success_by_discussion = bluffing_sums['bluffing_success_rate_sum'] / bluffing_sums['bluffing_success_rate_count']
+    return {
+        'games_with_discussion': mixed_games_discussion_counts.get(True, 0),
+        'games_without_discussion': mixed_games_discussion_counts.get(False, 0),
+        'bluff_success_with_discussion': bluffing_success_by_discussion.get(True, 0),
+        'bluff_success_without_discussion': bluffing_success_by_discussion.get(False, 0),
+    }
+
+def print_basic_statistics(state, weighted=False):
+    """
+    Prints the mixed-model game counts, win rates and bluffing statistics.
+    Weighted (sampled) counts are estimates, so they are shown to one decimal.
+    """
+    stats = basic_statistics(state)
+    count_format = '{:.1f}' if weighted else '{:.0f}'
+    games_with_discussion = count_format.format(stats['games_with_discussion'])
+    games_without_discussion = count_format.format(stats['games_without_discussion'])
+
+    by_model = state['mixed_model/by_model']
+    win_rate_stats = by_model[['model', 'public_discussion', 'games_played', 'wins']].copy()
     win_rate_stats['win_rate'] = win_rate_stats['wins'] / win_rate_stats['games_played']
 
     print("--- Basic Statistics for Mixed-Model Games ---")
     print(f"Number of games with discussion: {games_with_discussion}")
     print(f"Number of games without discussion: {games_without_discussion}")
     print("\n--- Win Rates for Mixed-Model Games ---")
-    win_rate_stats['wins'] = win_rate_stats['wins'].astype(int)
+    for column in ['games_played', 'wins']:
+        win_rate_stats[column] = win_rate_stats[column].round(1) if weighted else win_rate_stats[column].round().astype(int)
     print(win_rate_stats[['model', 'public_discussion', 'win_rate', 'games_played', 'wins']].to_string())
     print("\n")
 
     # --- Bluffing Success Difference ---
-    df_mixed_model_filtered_for_bluffing = df_mixed_model[~df_mixed_model['model'].isin(EXCLUDED_MODELS)].copy()
-    df_mixed_model_filtered_for_bluffing['bluffing_success_rate'] = (
-        df_mixed_model_filtered_for_bluffing['successful_bluffs'] / 
-        (df_mixed_model_filtered_for_bluffing['successful_bluffs'] + df_mixed_model_filtered_for_bluffing['failed_bluffs'])
-    )
-
-    bluffing_success_by_discussion = df_mixed_model_filtered_for_bluffing.groupby('public_discussion')['bluffing_success_rate'].mean()
-
-    success_with_discussion = bluffing_success_by_discussion.get(True, 0)
-    success_without_discussion = bluffing_success_by_discussion.get(False, 0)
+    success_with_discussion = stats['bluff_success_with_discussion']
+    success_without_discussion = stats['bluff_success_without_discussion']
     
     difference = success_with_discussion - success_without_discussion
 
@@ -831,14 +613,50 @@ def main():
     print(f"Avg. Bluff Success Rate without discussion: {success_without_discussion:.2%}")
     print(f"Difference (with - without): {difference:.2%}")
     print("\n")
-    # --- End of Basic Statistics ---
+
+def render(state, output_dir=OUTPUT_DIR, weighted=False):
+    """Prints the basic statistics and renders every chart from a (possibly combined) partial state."""
+    print_basic_statistics(state, weighted)
 
     # Run analyses
-    run_analysis(df_self_play, os.path.join(OUTPUT_DIR, "self_play"), "Self-Play")
-    run_analysis(df_mixed_model, os.path.join(OUTPUT_DIR, "mixed_model"), "Mixed-Model")
-    analyze_qualitative_data(OUTPUT_DIR)
-    analyze_discussion_data(OUTPUT_DIR)
+    for prefix, analysis_type in [('self_play', 'Self-Play'), ('mixed_model', 'Mixed-Model')]:
+        partial = {name.split('/')[-1]: table for name, table in state.items() if name.startswith(prefix + '/')}
+        metrics = aggregates.finalize_results(partial)
+        run_analysis(metrics, os.path.join(output_dir, prefix), analysis_type)
+    analyze_qualitative_data(state.get('qualitative/type_counts'), output_dir)
+    analyze_discussion_data(state.get('discussion/category_counts'), output_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate analysis of Coup game results.")
+    parser.add_argument('--emit-partial', metavar='PATH',
+                        help="Write this shard's partial aggregates to PATH instead of rendering charts.")
+    parser.add_argument('--combine', nargs='+', metavar='PATH',
+                        help="Render charts from the combined partial aggregates of several shards.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every metric table instead of reusing the on-disk cache.")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="Analyze up to N games per (model set, discussion, player count) stratum, "
+                             "with weighted estimates, and write charts to a separate directory.")
+    args = parser.parse_args()
+
+    if args.combine:
+        state = aggregates.combine_states([aggregates.load_state(path) for path in args.combine])
+        logging.info(f"Combined {len(args.combine)} partial states.")
+        render(state)
+        return
+
+    state = compute_partial_state(use_cache=not args.no_cache, sample_size=args.sample)
+
+    if args.emit_partial:
+        aggregates.save_state(state, args.emit_partial)
+        logging.info(f"Partial aggregates written to {args.emit_partial}")
+        return
+
+    if args.sample:
+        render(state, sampling.sample_path(OUTPUT_DIR, args.sample), weighted=True)
+    else:
+        render(state)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,95 @@
+import os
+import json
+import pickle
+import hashlib
+import inspect
+import logging
+
+# On-disk memoization of intermediate metric frames.
+# Entries are keyed by the content of their input files, the filter parameters
+# and the source of the code that computes them, so any change to one of these
+# produces a new key and stale entries simply age out of the LRU.
+
+CACHE_DIR = ".metric_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_SUFFIX = ".pkl"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """Returns a content hash of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_digest(objects):
+    """Returns a hash of the source code of the given modules and functions."""
+    digest = hashlib.blake2b(digest_size=16)
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_key(name, inputs, params, code):
+    """Builds the cache key of an entry from its inputs, parameters and code."""
+    key_data = {
+        'name': name,
+        'inputs': {path: file_digest(path) for path in inputs},
+        'params': params,
+        'code': code_digest(code),
+    }
+    encoded = json.dumps(key_data, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Deletes least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for filename in os.listdir(cache_dir):
+        if filename.endswith(CACHE_SUFFIX):
+            path = os.path.join(cache_dir, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        os.remove(path)
+        total_size -= size
+        logging.info(f"Evicted cache entry {os.path.basename(path)}")
+
+
+def cached(name, compute, inputs=(), params=None, code=(), cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    Returns compute() for the given inputs, loading it from disk when an entry
+    with the same key exists and storing it otherwise.
+    """
+    key = cache_key(name, inputs, params, code)
+    path = os.path.join(cache_dir, f"{name}-{key}{CACHE_SUFFIX}")
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # Mark as recently used
+            logging.info(f"Loaded '{name}' from cache.")
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logging.warning(f"Ignoring unreadable cache entry {path}: {e}")
+
+    value = compute()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_bytes)
+    logging.info(f"Stored '{name}' in cache.")
+    return value
@@ -0,0 +1,233 @@
+import os
+import re
+import csv
+import zlib
+import logging
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from main import (EXCLUDED_MODELS, OUTPUT_DIR, QUALITATIVE_FILE, NEAR_DUPLICATE_COUNTS_FILE, CHUNK_SIZE,
+                  get_color_map, save_plot)
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, iter_texts
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+NUM_PERM = 128         # MinHash signature length
+NUM_BANDS = 32         # LSH bands; 4 rows per band puts the Jaccard threshold near (1/32)^(1/4) ~ 0.42
+JACCARD_THRESHOLD = 0.5  # Estimated Jaccard similarity to a cluster's representative needed to join it
+SHINGLE_SIZE = 3       # Words per shingle
+SEED = 42
+OUTPUT_FILE = 'text_clusters.csv'  # Output in the same directory as the script
+QUAL_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "qualitative")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """
+    Streaming near-duplicate clustering with MinHash signatures and banded LSH.
+
+    Each cluster is represented by its first text, and only representatives are
+    kept in the band buckets. A new text is compared against the representatives
+    sharing one of its buckets, estimating their Jaccard similarity as the share
+    of signature slots that agree, and joins the most similar one at or above
+    the threshold; otherwise it starts a new cluster. Texts are never chained
+    through intermediate texts, and clustering stays linear in the number of
+    texts rather than pairwise.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, num_bands=NUM_BANDS, seed=SEED, threshold=JACCARD_THRESHOLD):
+        if num_perm % num_bands:
+            raise ValueError("num_perm must be divisible by num_bands")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(num_bands)]  # band key -> representatives
+        self.representatives = {}  # representative -> signature
+        self.cluster_of = []
+
+    def signature(self, text):
+        """Returns the MinHash signature of a text's word shingles."""
+        tokens = TOKEN_PATTERN.findall(text.lower().replace("\u2019", "'"))
+        if len(tokens) <= SHINGLE_SIZE:
+            shingles = {' '.join(tokens)}
+        else:
+            shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) % MERSENNE_PRIME for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return ((self.a * hashes + self.b) % MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes()
+                for band in range(self.num_bands)]
+
+    def add(self, text):
+        """Indexes a text, adding it to the most similar verified cluster or starting a new one."""
+        doc = len(self.cluster_of)
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        candidates = {rep for buckets, key in zip(self.buckets, keys) for rep in buckets.get(key, ())}
+
+        best, best_similarity = None, 0.0
+        for representative in sorted(candidates):
+            similarity = np.mean(self.representatives[representative] == signature)
+            if similarity > best_similarity:
+                best, best_similarity = representative, similarity
+        if best is not None and best_similarity >= self.threshold:
+            self.cluster_of.append(best)
+            return doc
+
+        self.cluster_of.append(doc)
+        self.representatives[doc] = signature
+        for buckets, key in zip(self.buckets, keys):
+            buckets.setdefault(key, []).append(doc)
+        return doc
+
+    def clusters(self):
+        """Returns the cluster id of every indexed text (the id of its representative, the earliest member)."""
+        return np.array(self.cluster_of, dtype=np.int64)
+
+
+def near_duplicate_counts(clusters_df, qualitative_file=QUALITATIVE_FILE):
+    """
+    Per-(model, type) reasoning counts for each NEAR_DUPLICATE_MODE of main.py:
+    'decisions' counts every decision, 'weighted' weights each by 1 / the size of
+    its cluster within the model, and 'clusters' counts each cluster once.
+    Decisions without a cluster count as their own cluster.
+    """
+    reasoning = clusters_df[clusters_df['kind'] == 'reasoning'][['game_id', 'decision_id', 'model', 'cluster_id']].copy()
+    reasoning['cluster_size'] = reasoning.groupby(['model', 'cluster_id'])['cluster_id'].transform('size')
+    reasoning = reasoning.drop(columns='model')
+
+    keys = ['model', 'type']
+    totals, distinct = None, None
+    offset = 0
+    for chunk in pd.read_csv(qualitative_file, usecols=['game_id', 'decision_id', 'model', 'type'], chunksize=CHUNK_SIZE):
+        chunk['model'] = chunk['model'].map(strip_provider)
+        chunk = chunk.merge(reasoning, on=['game_id', 'decision_id'], how='left')
+        missing = chunk['cluster_id'].isna().to_numpy()
+        chunk.loc[missing, 'cluster_id'] = -1 - offset - np.flatnonzero(missing)
+        offset += len(chunk)
+        chunk['weight'] = 1.0 / chunk['cluster_size'].fillna(1)
+
+        partial = chunk.groupby(keys, as_index=False).agg(decisions=('weight', 'size'), weighted=('weight', 'sum'))
+        totals = partial if totals is None else pd.concat([totals, partial]).groupby(keys, as_index=False).sum()
+        seen = chunk[keys + ['cluster_id']].drop_duplicates()
+        distinct = seen if distinct is None else pd.concat([distinct, seen]).drop_duplicates()
+
+    if totals is None:
+        return pd.DataFrame(columns=keys + ['decisions', 'weighted', 'clusters'])
+    clusters = distinct.groupby(keys).size().reset_index(name='clusters')
+    return totals.merge(clusters, on=keys)
+
+
+def plot_diversity(diversity, plot_path):
+    """Plots unique clusters per 100 texts for each model, split by text kind."""
+    models = sorted(diversity['model'].unique())
+    color_map = get_color_map(models)
+    kinds = ['reasoning', 'discussion']
+
+    fig, axes = plt.subplots(1, len(kinds), figsize=(24, 10))
+    fig.suptitle('Text Diversity (Unique Near-Duplicate Clusters per 100 Texts)', fontsize=16)
+
+    for ax, kind in zip(axes, kinds):
+        kind_data = diversity[diversity['kind'] == kind].sort_values('clusters_per_100', ascending=True)
+        bars = ax.bar(range(len(kind_data)), kind_data['clusters_per_100'], color=[color_map[m] for m in kind_data['model']])
+        for bar, texts in zip(bars, kind_data['texts']):
+            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height(), f'n={int(texts)}',
+                    ha='center', va='bottom', fontsize=9)
+        ax.set_title(kind.capitalize())
+        ax.set_ylabel('Unique Clusters per 100 Texts')
+        ax.set_xticks([])
+
+    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
+    fig.legend(legend_handles, models, title='Model', loc='upper right', bbox_to_anchor=(0.99, 0.95))
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    save_plot(fig, plot_path)
+
+
+def main():
+    """Clusters near-duplicate reasoning and discussion texts and reports per-model diversity."""
+    logging.info("Starting near-duplicate detection...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+        logging.info(f"Loaded {len(game_index)} unique game IDs from {RESULTS_FILE}.")
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    # Reasoning and discussion are clustered separately
+    indexes = {'reasoning': MinHashLSH(), 'discussion': MinHashLSH()}
+    records = []
+    for file_count, filepath in enumerate(log_files, start=1):
+        game_id = os.path.basename(filepath).replace('.txt', '')
+        game = game_index[game_id]
+        # decision_id numbers each kind of text within a game, matching process_logs.py
+        next_id = {'reasoning': 0, 'discussion': 0}
+        for event in iter_texts(filepath):
+            kind = event['kind']
+            records.append((
+                game_id, next_id[kind], kind, event['player'],
+                strip_provider(game['models'].get(event['player'], event['model'])),
+                game['public_discussion'], indexes[kind].add(event['text'])
+            ))
+            next_id[kind] += 1
+        if file_count % 50 == 0:
+            logging.info(f"Processed {file_count}/{len(log_files)} files...")
+
+    clusters = {kind: index.clusters() for kind, index in indexes.items()}
+    sizes = {kind: np.bincount(c, minlength=len(c)) for kind, c in clusters.items()}
+
+    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['game_id', 'decision_id', 'kind', 'player', 'model', 'public_discussion', 'cluster_id', 'cluster_size'])
+        for game_id, decision_id, kind, player, model, public_discussion, doc in records:
+            cluster_id = clusters[kind][doc]
+            writer.writerow([game_id, decision_id, kind, player, model, public_discussion, cluster_id, sizes[kind][cluster_id]])
+    logging.info(f"Cluster assignments written to '{OUTPUT_FILE}'.")
+
+    clusters_df = pd.read_csv(OUTPUT_FILE)
+    if not os.path.exists(QUALITATIVE_FILE):
+        logging.warning(f"{QUALITATIVE_FILE} not found. Run process_logs.py first to use NEAR_DUPLICATE_MODE in main.py.")
+    elif 'decision_id' not in pd.read_csv(QUALITATIVE_FILE, nrows=0).columns:
+        logging.warning(f"No decision ids in {QUALITATIVE_FILE}. Re-run process_logs.py to use NEAR_DUPLICATE_MODE in main.py.")
+    else:
+        near_duplicate_counts(clusters_df, QUALITATIVE_FILE).to_csv(NEAR_DUPLICATE_COUNTS_FILE, index=False)
+        logging.info(f"Per-model reasoning counts for each near-duplicate mode written to '{NEAR_DUPLICATE_COUNTS_FILE}'.")
+
+    clusters_df = clusters_df[~clusters_df['model'].isin(EXCLUDED_MODELS)]
+    diversity = clusters_df.groupby(['model', 'kind']).agg(
+        texts=('cluster_id', 'size'),
+        unique_clusters=('cluster_id', 'nunique')
+    ).reset_index()
+    diversity['clusters_per_100'] = diversity['unique_clusters'] / diversity['texts'] * 100
+
+    print("--- Text Diversity (Unique Clusters per 100 Texts) ---")
+    print(diversity.to_string())
+
+    os.makedirs(QUAL_OUTPUT_DIR, exist_ok=True)
+    diversity.to_csv(os.path.join(QUAL_OUTPUT_DIR, "text_diversity.csv"), index=False)
+    plot_diversity(diversity, os.path.join(QUAL_OUTPUT_DIR, "text_diversity.png"))
+
+    logging.info("Finished near-duplicate detection.")
+
+
+if __name__ == '__main__':
+    main()
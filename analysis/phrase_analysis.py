@@ -0,0 +1,255 @@
+import os
+import re
+import zlib
+import logging
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy import sparse
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR, get_color_map, save_plot
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, iter_texts
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+N_FEATURES = 2 ** 20     # Size of the hashed vocabulary
+NGRAM_RANGE = (1, 3)     # Word n-gram lengths to count
+BATCH_SIZE = 100         # Log files per partial fit
+MIN_COUNT = 5            # Ignore phrases a group used fewer times than this
+TOP_K = 25               # Phrases exported per group
+PRIOR_STRENGTH = 1000.0  # Total pseudo-count of the informative Dirichlet prior
+RANKING_COLUMNS = ['rank', 'phrase', 'count', 'log_odds_z', 'tfidf']  # Per-phrase columns of a ranking
+QUAL_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "qualitative")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+# N-grams made only of these words carry no signature and are skipped
+STOP_WORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'if', 'so', 'to', 'of', 'in', 'on', 'at', 'for', 'with', 'by',
+    'from', 'as', 'is', 'am', 'are', 'was', 'were', 'be', 'been', 'it', 'its', "it's", 'this', 'that',
+    'i', "i'm", 'me', 'my', 'we', 'you', 'your', 'they', 'them', 'their', 'he', 'she', 'his', 'her',
+    'not', 'no', 'do', 'does', 'have', 'has', 'will', 'would', 'can', 'could', 'should', 'than', 'then',
+    'there', 'which', 'what', 'who', 'all', 'any', 'more', 'most', 'also', 'just', 'player',
+}
+
+
+def extract_phrases(text):
+    """Returns the word n-grams of a text, skipping n-grams made only of stop words."""
+    tokens = TOKEN_PATTERN.findall(text.lower().replace("\u2019", "'"))
+    phrases = []
+    for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = tokens[i:i + n]
+            if all(token in STOP_WORDS or token.isdigit() for token in gram):
+                continue
+            phrases.append(' '.join(gram))
+    return phrases
+
+
+class PhraseCounter:
+    """
+    Accumulates hashed n-gram counts per (model, public_discussion) group.
+
+    Memory is bounded by the hash space: the count matrix has one row per group
+    and N_FEATURES columns, and at most one example phrase is kept per hash bucket.
+    """
+
+    def __init__(self, n_features=N_FEATURES):
+        self.n_features = n_features
+        self.groups = []
+        self.group_index = {}
+        self.counts = sparse.csr_matrix((0, n_features), dtype=np.int64)
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.phrases = {}
+
+    def _hash(self, phrase):
+        return zlib.crc32(phrase.encode('utf-8')) % self.n_features
+
+    def partial_fit(self, documents):
+        """Adds a batch of (group, text) documents to the running counts."""
+        rows, cols, doc_groups = [], [], []
+        for doc_id, (group, text) in enumerate(documents):
+            if group not in self.group_index:
+                self.group_index[group] = len(self.groups)
+                self.groups.append(group)
+            doc_groups.append(self.group_index[group])
+            for phrase in extract_phrases(text):
+                feature = self._hash(phrase)
+                self.phrases.setdefault(feature, phrase)
+                rows.append(doc_id)
+                cols.append(feature)
+
+        if not doc_groups:
+            return
+
+        n_docs = len(doc_groups)
+        doc_term = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+            shape=(n_docs, self.n_features)
+        )
+        doc_term.sum_duplicates()
+
+        # Document frequency counts each phrase at most once per text
+        self.doc_freq += np.bincount(doc_term.indices, minlength=self.n_features)
+        self.n_docs += n_docs
+
+        # Collapse documents into their groups with a sparse indicator product
+        membership = sparse.csr_matrix(
+            (np.ones(n_docs, dtype=np.int64), (doc_groups, np.arange(n_docs))),
+            shape=(len(self.groups), n_docs)
+        )
+        self.counts.resize((len(self.groups), self.n_features))
+        self.counts = self.counts + membership @ doc_term
+
+    def rank(self, group_rows):
+        """
+        Ranks the phrases of each combined group against all other groups.
+
+        group_rows maps an output key to the list of count-matrix rows it covers.
+        Distinctiveness is the z-scored log-odds ratio with an informative
+        Dirichlet prior (Monroe et al., 2008); TF-IDF is reported alongside.
+        """
+        keys = list(group_rows)
+        combine = sparse.csr_matrix(
+            (np.ones(sum(len(r) for r in group_rows.values())),
+             ([i for i, k in enumerate(keys) for _ in group_rows[k]],
+              [r for k in keys for r in group_rows[k]])),
+            shape=(len(keys), len(self.groups))
+        )
+        combined = (combine @ self.counts).tocsr()
+
+        totals = np.asarray(combined.sum(axis=0)).ravel().astype(float)
+        group_totals = np.asarray(combined.sum(axis=1)).ravel().astype(float)
+        grand_total = totals.sum()
+        prior = PRIOR_STRENGTH * totals / grand_total
+        idf = np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1
+
+        rankings = []
+        for i, key in enumerate(keys):
+            row = combined.getrow(i)
+            features, counts = row.indices, row.data.astype(float)
+            keep = counts >= MIN_COUNT
+            features, counts = features[keep], counts[keep]
+            if len(features) == 0:
+                continue
+
+            n_group = group_totals[i]
+            n_rest = grand_total - n_group
+            rest_counts = totals[features] - counts
+            alpha = prior[features]
+
+            log_odds_group = np.log((counts + alpha) / (n_group + PRIOR_STRENGTH - counts - alpha))
+            log_odds_rest = np.log((rest_counts + alpha) / (n_rest + PRIOR_STRENGTH - rest_counts - alpha))
+            variance = 1 / (counts + alpha) + 1 / (rest_counts + alpha)
+            z_scores = (log_odds_group - log_odds_rest) / np.sqrt(variance)
+            tfidf = counts / n_group * idf[features]
+
+            top = np.argsort(-z_scores)[:TOP_K]
+            for rank, j in enumerate(top, start=1):
+                rankings.append({
+                    'key': key,
+                    'rank': rank,
+                    'phrase': self.phrases[features[j]],
+                    'count': int(counts[j]),
+                    'log_odds_z': z_scores[j],
+                    'tfidf': tfidf[j],
+                })
+        return rankings
+
+
+def collect_documents(filepath, game):
+    """Yields (group, text) documents for a single log file."""
+    for event in iter_texts(filepath):
+        player = event['player']
+        model = strip_provider(game['models'].get(player, event['model']))
+        if model in EXCLUDED_MODELS:
+            continue
+        yield (model, game['public_discussion']), event['text']
+
+
+def plot_top_phrases(by_model, plot_path, top_n=10):
+    """Plots the most distinctive phrases of each model as horizontal bars."""
+    models = sorted(by_model['model'].unique())
+    color_map = get_color_map(models)
+
+    n_cols = min(3, len(models))
+    n_rows = int(np.ceil(len(models) / n_cols))
+    fig, axes = plt.subplots(n_rows, n_cols, figsize=(8 * n_cols, 6 * n_rows), squeeze=False)
+
+    for ax, model in zip(axes.flat, models):
+        model_data = by_model[by_model['model'] == model].nsmallest(top_n, 'rank').iloc[::-1]
+        ax.barh(model_data['phrase'], model_data['log_odds_z'], color=color_map[model])
+        ax.set_title(model)
+        ax.set_xlabel('Log-Odds z-score')
+    for ax in list(axes.flat)[len(models):]:
+        ax.axis('off')
+
+    fig.suptitle('Most Distinctive Phrases by Model', fontsize=16)
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    save_plot(fig, plot_path)
+
+
+def main():
+    """Counts n-grams over all reasoning and discussion texts and exports distinctive phrases."""
+    logging.info("Starting distinctive phrase analysis...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+        logging.info(f"Loaded {len(game_index)} unique game IDs from {RESULTS_FILE}.")
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    counter = PhraseCounter()
+    for start in range(0, len(log_files), BATCH_SIZE):
+        batch = []
+        for filepath in log_files[start:start + BATCH_SIZE]:
+            game_id = os.path.basename(filepath).replace('.txt', '')
+            batch.extend(collect_documents(filepath, game_index[game_id]))
+        counter.partial_fit(batch)
+        logging.info(f"Processed {min(start + BATCH_SIZE, len(log_files))}/{len(log_files)} files...")
+
+    if not counter.groups:
+        logging.warning("No reasoning or discussion text found. Skipping phrase analysis.")
+        return
+
+    os.makedirs(QUAL_OUTPUT_DIR, exist_ok=True)
+
+    # Per model, pooling both discussion settings
+    model_rows = {}
+    for row, (model, _) in enumerate(counter.groups):
+        model_rows.setdefault(model, []).append(row)
+    by_model = pd.DataFrame(counter.rank(model_rows), columns=['key'] + RANKING_COLUMNS)
+    by_model = by_model.rename(columns={'key': 'model'})
+    by_model.to_csv(os.path.join(QUAL_OUTPUT_DIR, "distinctive_phrases_by_model.csv"), index=False)
+
+    # Per (model, discussion setting)
+    group_rows = {group: [row] for row, group in enumerate(counter.groups)}
+    by_group = pd.DataFrame(counter.rank(group_rows), columns=['key'] + RANKING_COLUMNS)
+    keys = by_group.pop('key')
+    by_group.insert(0, 'model', keys.str[0])
+    by_group.insert(1, 'public_discussion', keys.str[1])
+    by_group.to_csv(os.path.join(QUAL_OUTPUT_DIR, "distinctive_phrases_by_model_discussion.csv"), index=False)
+
+    if by_model.empty:
+        logging.warning(f"No phrase occurs at least {MIN_COUNT} times for any model; wrote empty rankings and no plot.")
+        return
+    plot_top_phrases(by_model, os.path.join(QUAL_OUTPUT_DIR, "distinctive_phrases_by_model.png"))
+
+    logging.info(f"Distinctive phrases written to '{QUAL_OUTPUT_DIR}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import hsv_to_rgb, to_hex
+
+# Charts with more models than this are drawn as model × group heatmaps instead of grouped bars
+MAX_GROUPED_MODELS = 12
+# Heatmaps with more cells than this are not annotated with their values
+MAX_ANNOTATED_CELLS = 120
+HEATMAP_ROW_HEIGHT = 0.3  # Inches per model row
+
+# The first colours, in order; further categories get generated colours
+BASE_COLORS = [
+    '#17becf',  # Cyan
+    '#aec7e8',  # Light Blue
+    '#ffbb78',  # Light Orange
+    '#98df8a',  # Light Green
+    '#ff9896',  # Light Red
+    '#c49c94',  # Light Brown
+    '#f7b6d3',  # Light Pink
+    '#c5b0d5',  # Light Purple
+    '#c7c7c7',  # Light Gray
+    '#dbdb8d',  # Light Olive
+    '#9edae5',  # Light Cyan
+    '#1f77b4',  # Blue
+    '#ff7f0e',  # Orange
+    '#2ca02c',  # Green
+    '#d62728',  # Red
+    '#9467bd',  # Purple
+    '#8c564b',  # Brown
+    '#e377c2',  # Pink
+    '#7f7f7f',  # Gray
+    '#bcbd22',  # Olive
+]
+GOLDEN_RATIO = (1 + 5 ** 0.5) / 2
+
+
+def generated_colors(n):
+    """n distinct colours: hues spaced by the golden ratio, cycling through a few saturation and brightness levels."""
+    index = np.arange(n)
+    hsv = np.column_stack([
+        (index / GOLDEN_RATIO) % 1,
+        np.array([0.85, 0.55, 0.7])[index % 3],
+        np.array([0.9, 0.7, 0.55, 0.8])[index // 3 % 4],
+    ])
+    return [to_hex(rgb) for rgb in hsv_to_rgb(hsv)]
+
+
+def get_color_map(categories):
+    """Creates a color map for a list of categories; colours never repeat, however many categories there are."""
+    categories = list(categories)
+    colors = BASE_COLORS[:len(categories)] + generated_colors(max(0, len(categories) - len(BASE_COLORS)))
+    return dict(zip(categories, colors))
+
+
+def save_plot(fig, plot_path):
+    """Saves a matplotlib figure."""
+    os.makedirs(os.path.dirname(plot_path), exist_ok=True)
+    fig.savefig(plot_path, bbox_inches='tight')
+    plt.close(fig)
+
+
+def grouped_bars(ax, data, value_column, groups, models, color_map, count_column=None, rotation=0):
+    """
+    Draws one bar per row of data (one row per model and group) with a single
+    ax.bar call. Groups are laid out left to right in the given order, and the
+    models within each group are sorted by value.
+    """
+    data = data[data['group'].isin(groups)].copy()
+    data['group_index'] = data['group'].map({group: i for i, group in enumerate(groups)})
+    data = data.sort_values(['group_index', value_column], kind='stable')
+
+    bar_width = 0.8 / len(models)
+    group_width = len(models) * bar_width + 0.4
+    rank = data.groupby('group_index').cumcount().to_numpy()
+    positions = data['group_index'].to_numpy() * group_width + rank * bar_width
+    bars = ax.bar(positions, data[value_column], width=bar_width, color=data['model'].map(color_map).tolist())
+
+    if count_column is not None:
+        labels = ['' if np.isnan(count) else f'n={int(count)}' for count in data[count_column]]
+        ax.bar_label(bars, labels=labels, fontsize=9)
+
+    ax.set_xticks(np.arange(len(groups)) * group_width + (len(models) - 1) * bar_width / 2)
+    ax.set_xticklabels(groups, rotation=rotation, ha='right' if rotation else 'center')
+
+
+def annotate_cells(ax, table, fmt='{:.2f}'):
+    """Writes each value of a small table onto its heatmap cell."""
+    values = table.to_numpy(dtype=float)
+    if values.size > MAX_ANNOTATED_CELLS:
+        return
+    rows, columns = np.nonzero(~np.isnan(values))
+    for i, j in zip(rows, columns):
+        ax.text(j, i, fmt.format(values[i, j]), ha='center', va='center', color='black')
+
+
+def model_heatmap(ax, data, value_column, groups, models, label, cmap='YlGn'):
+    """Draws data (one row per model and group) as a model × group heatmap, growing the figure with the model count."""
+    table = data.pivot_table(index='model', columns='group', values=value_column, aggfunc='first')
+    table = table.reindex(index=models, columns=groups)
+
+    fig = ax.figure
+    width, height = fig.get_size_inches()
+    fig.set_size_inches(width, max(height, HEATMAP_ROW_HEIGHT * len(models)))
+    image = ax.imshow(table.to_numpy(dtype=float), cmap=cmap, aspect='auto')
+    ax.set_facecolor('lightgray')  # No data for this model and group
+    annotate_cells(ax, table)
+    ax.set_xticks(np.arange(len(groups)))
+    ax.set_xticklabels(groups, rotation=45, ha='right')
+    ax.set_yticks(np.arange(len(models)))
+    ax.set_yticklabels(models)
+    fig.colorbar(image, ax=ax, label=label)
+
+
+def plot_by_model(ax, data, value_column, groups, models, color_map, label, count_column=None, rotation=0):
+    """
+    Plots a per-model metric for each group: grouped bars for up to
+    MAX_GROUPED_MODELS models, a heatmap above that. Returns whether the chart
+    needs a model legend.
+    """
+    if len(models) > MAX_GROUPED_MODELS:
+        model_heatmap(ax, data, value_column, groups, models, label)
+        return False
+    grouped_bars(ax, data, value_column, groups, models, color_map, count_column, rotation)
+    ax.set_ylabel(label)
+    return True
+
+
+def model_legend(target, models, color_map, **kwargs):
+    """Adds a legend with one colour patch per model to an axis or figure."""
+    handles = [plt.Rectangle((0, 0), 1, 1, color=color_map[model]) for model in models]
+    target.legend(handles, models, title='Model', **kwargs)
+
+
+def share_heatmap(counts, index, columns, title, plot_path):
+    """Heatmap of each model's share of every category, used instead of one pie chart per model for large rosters."""
+    table = counts.pivot_table(index=index, columns=columns, values='count', aggfunc='sum', fill_value=0)
+    shares = table.div(table.sum(axis=1), axis=0) * 100
+    fig, ax = plt.subplots(figsize=(max(10, 1.2 * len(shares.columns)), max(8, HEATMAP_ROW_HEIGHT * len(shares))))
+    image = ax.imshow(shares.to_numpy(dtype=float), cmap='YlGn', aspect='auto')
+    annotate_cells(ax, shares, '{:.1f}')
+    ax.set_xticks(np.arange(len(shares.columns)))
+    ax.set_xticklabels(shares.columns, rotation=45, ha='right')
+    ax.set_yticks(np.arange(len(shares.index)))
+    ax.set_yticklabels(shares.index)
+    ax.set_title(title)
+    fig.colorbar(image, ax=ax, label='Share (%)')
+    fig.tight_layout()
+    save_plot(fig, plot_path)
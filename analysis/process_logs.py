@@ -1,9 +1,12 @@
 import os
 import re
 import csv
+import argparse
 import logging
 import pandas as pd
 
+import sampling
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -38,6 +41,7 @@ def process_log_file(filepath):
     """Processes a single log file and yields rows of structured data."""
     game_id = os.path.basename(filepath).replace('.txt', '')
     current_round = 0
+    decision_id = 0
     
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -62,24 +66,36 @@ def process_log_file(filepath):
                         for reasoning_type in types:
                             yield {
                                 'game_id': game_id,
+                                'decision_id': decision_id,
                                 'round': current_round,
                                 'player': player,
                                 'model': model,
                                 'type': reasoning_type,
                                 'reasoning_text': reasoning_text
                             }
+                        decision_id += 1
     except Exception as e:
         logging.error(f"Error processing file {filepath}: {e}")
 
 
 def main():
     """Main function to process all logs and write to CSV."""
+    parser = argparse.ArgumentParser(description="Categorize the reasoning in the game logs.")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="Only process up to N games per (model set, discussion, player count) stratum, "
+                             "writing to a separate *_sample_N_SEED.csv file.")
+    args = parser.parse_args()
+
     logging.info("Starting log processing...")
 
     # --- New Pre-processing Step ---
     try:
-        results_df = pd.read_csv(RESULTS_FILE)
-        relevant_game_ids = set(results_df['game_id'].unique())
+        if args.sample:
+            # Streams results.csv, keeping only the sampled games
+            relevant_game_ids = set(sampling.draw_sample(args.sample, results_file=RESULTS_FILE)['game_id'])
+        else:
+            results_df = pd.read_csv(RESULTS_FILE)
+            relevant_game_ids = set(results_df['game_id'].unique())
         logging.info(f"Loaded {len(relevant_game_ids)} unique game IDs from {RESULTS_FILE}.")
     except FileNotFoundError:
         logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
@@ -95,14 +111,16 @@ def main():
     # Filter logs to only include those in results.csv
     log_files_to_process = [f for f in all_log_files if f.replace('.txt', '') in relevant_game_ids]
 
+    output_file = sampling.sample_path(OUTPUT_FILE, args.sample) if args.sample else OUTPUT_FILE
+
     if not log_files_to_process:
         logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
         return
 
     logging.info(f"Found {len(log_files_to_process)} relevant log files to process...")
 
-    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['game_id', 'round', 'player', 'model', 'type', 'reasoning_text']
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        fieldnames = ['game_id', 'decision_id', 'round', 'player', 'model', 'type', 'reasoning_text']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
@@ -115,7 +133,7 @@ def main():
             if file_count % 20 == 0:
                 logging.info(f"Processed {file_count}/{len(log_files_to_process)} files...")
 
-    logging.info(f"Processing complete. Output written to '{OUTPUT_FILE}'.")
+    logging.info(f"Processing complete. Output written to '{output_file}'.")
 
 
 if __name__ == '__main__':
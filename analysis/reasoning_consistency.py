@@ -0,0 +1,493 @@
+import os
+import re
+import logging
+from collections import Counter
+
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR
+from plotting import get_color_map, save_plot, plot_by_model, model_legend
+from challenge_races import CLAIM_CARDS
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, replay_logs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+CONSISTENCY_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "qualitative")  # Next to the reasoning category charts
+CONTRADICTIONS_FILE = os.path.join(CONSISTENCY_OUTPUT_DIR, "reasoning_contradictions.csv")
+DECISIONS = ['action', 'challenge', 'block', 'card_loss', 'exchange']
+# Actions the target (or, for foreign aid, anyone) may block
+BLOCKABLE_ACTIONS = {'FOREIGN_AID', 'STEAL', 'ASSASSINATE'}
+# Engine events that belong to an open challenge window
+CHALLENGE_EVENTS = {'multiple_challengers', 'challenge', 'challenge_resolution', 'has_cards', 'reveal'}
+
+# --- Intent matcher ---
+# Each decision has one compiled pattern whose alternatives are named groups.
+# 'cond' swallows conditional and hypothetical clauses ("if I challenge and
+# am wrong, ...") up to the next punctuation mark, so intents inside them are
+# skipped; the remaining matches are the stated intents.
+CARD = r"(?:duke|assassin|captain|ambassador|contessa)(?:s|'s)?\b"
+# Conditional, hypothetical and reported clauses ("hoping I won't challenge")
+CONDITIONAL = (r"\b(?:if|unless|whether|instead of|rather than|than|before|once|when|while|although|though|could|might|would|may"
+               r"|hoping|assuming|expecting|thinking|betting|counting on|in case)\b[^.;:!?,\n]*")
+DECIDE = (r"(?:\b(?:i|we)(?: will|'ll| am going to|'m going to| are going to|'re going to| am choosing to|'m choosing to| choose to"
+          r"| chose to| have decided to|'ve decided to| decide to| should| must|'d rather| would rather| am|'m| are|'re"
+          r"| can legitimately| can safely| can truthfully)"
+          r"|\blet me|\blet's|\b(?:the|my|our) (?:best|safest|strongest|optimal|smartest|right) (?:move|option|action|choice|play)"
+          r"(?: here| now)? (?:is|would be)(?: to)?)")
+# Stating a need commits to a challenge or block, but for actions it is usually about a later turn
+COMMIT = rf"(?:{DECIDE}|\b(?:i|we)(?: need to| have to))"
+# Only first-person refusals: a bare "not challenging would..." weighs an option rather than stating an intent
+NEGATION = (r"(?:\b(?:i|we)(?: will not| won't|'ll not| should not| shouldn't| must not| do not| don't| am not|'m not| are not|'re not"
+            r"| decide not to| choose not to| have decided not to|'ve decided not to| would not| wouldn't| cannot| can't)"
+            r"|\bnot to|(?<!compared )(?<!opposed )(?<!relative )\bto not|\bno need to|\bbetter not to|\bbest not to|\brefrain(?:ing)? from|\bdecline to|\bpass(?:ing)? on)")
+FILLER = (r"(?:\s+(?:just|simply|now|also|definitely|probably|safely|still|instead|therefore|thus|so|actually|going to|to|take|taking|use|using|claim|claiming"
+          r"|perform|performing|do|doing|go for|going for|collect|collecting|attempt|attempting|try|trying|launch|launching"
+          r"|make|making|initiate|initiating|stick to|stick with|go with|opt for|settle for|basic|standard|simple|safe"
+          r"|with|an?|the|my|our|this|that|their|his|her|it))*\s+")
+CARD_FILLER = r"(?:\s+(?:my|the|a|an|one|this|that|of|both|our|only|remaining|last|current|other|real|actual|existing))*\s+"
+PLAYER = r"player\s?\d+"
+# An option weighed later in its clause ("claiming Duke to block would be a bluff") is not the intent
+NOT_HYPOTHETICAL = (r"(?![^.,;:!?\n]*\b(?:would|could|might)\b)"
+                    r"(?!\s+(?:is|seems)\s+(?:weak|worse|less|not|pointless|useless|redundant)\b)")
+SENTENCE_START = r"(?:^|[.!?:;\n]\s*)"
+# Intents about a later turn ("... so I can coup next turn") are not this decision's intent
+NOT_FUTURE = r"(?![^.!?;\n]*\b(?:next turn|next round|later|future|eventually|following turn|subsequent turn)\b)"
+
+ACTION = (r"(?:income|foreign[ _-]aid|tax(?:ing|es)?|steal(?:ing|s)?|assassinat\w*|assassin|coup(?:ing|ed)?|exchang\w*"
+          r"|duke|captain|ambassador)\b")
+ACTION_TARGET = rf"(?:\s+(?:on|from|against|targeting|to)?\s*(?:{PLAYER}|them|him|her))?"
+# "Income is safest", "Stealing from player2 is the best move"
+ACTION_VERDICT = (r"\s+(?:is|seems|remains)\s+(?:(?:the|my|our)\s+)?(?:safest|best|strongest|optimal|ideal|right|correct|smartest|most \w+"
+                  r"|(?:a |the )?(?:safe|good|strong|solid|legitimate|efficient|reasonable)(?: \w+)? (?:move|play|option|choice|way|action))")
+CHALLENGE = rf"(?:challeng\w*|call(?:ing)?(?: out)?(?: the| their| his| her| this| that| {PLAYER}'s)? bluff)"
+# "It's better to let it go", "too risky to challenge", "blocking is too risky"
+BETTER_NOT = (r"\b(?:better|safer|wiser|best|prudent|smarter)(?: bet| option| choice| move)?(?: for me| for us)? (?:to|off)"
+              r" (?:not|let|allow|decline|avoid|pass|refrain|hold off)\b")
+TOO_RISKY = (r"\btoo (?:risky|high|great|dangerous|costly)(?: for me| for us)?(?: right now| now| here| at this point)?"
+             r" to(?: (?:justify|warrant))?(?: a| the)?")
+RISKY_VERDICT = r"\s+(?:is|seems)\s+(?:far |much )?(?:too|not)\b"
+LET_IT_STAND = (rf"(?:{COMMIT}\s+(?:just\s+|simply\s+)?|{SENTENCE_START})(?:let|allow|accept) (?:the|this|that|it|them|their|his|her|{PLAYER})"
+                r"(?:'s)?(?:\s+\w+){0,2}?\s+(?:stand|go|pass|through|proceed|happen|slide|succeed)\b")
+# Not "reveal": models also use it for showing a card they keep
+LOSE_VERB = (r"\b(?:lose|losing|discard|discarding|give up|giving up|sacrifice|sacrificing|drop|dropping"
+             r"|let go of|letting go of|part with|parting with|get rid of|getting rid of)")
+KEEP_VERB = (r"\b(?:keep|keeping|retain|retaining|preserve|preserving|hold onto|holding onto|hold on to|holding on to"
+             r"|save|saving|maintain|maintaining|protect|protecting|stick with|sticking with)")
+EXCHANGE_KEEP_VERB = (r"\b(?:keep|keeping|retain|retaining|choose|choosing|select|selecting|hold onto|holding onto"
+                      r"|stick with|sticking with|go with|going with|take|taking|end up with)")
+CARD_LIST = rf"{CARD}(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+|\s*&\s*|\s+plus\s+)(?:(?:my|the|a|an|one|both)\s+)?{CARD})*"
+
+INTENT_PATTERNS = {
+    'action': re.compile(
+        rf"(?P<cond>{CONDITIONAL})"
+        rf"|(?P<intent>(?:(?:{DECIDE}{FILLER}|\bby (?:taking|claiming|using|going for)\s+(?:(?:the|a|an|my)\s+)?)"
+        rf"{ACTION}{ACTION_TARGET}{NOT_HYPOTHETICAL}"
+        rf"|{SENTENCE_START}(?:(?:taking|claiming|using)\s+(?:(?:the|a|an|my)\s+)?)?{ACTION}{ACTION_TARGET}{ACTION_VERDICT}){NOT_FUTURE})"),
+    'challenge': re.compile(
+        rf"(?P<cond>{CONDITIONAL})"
+        rf"|(?P<no>{NEGATION}{FILLER}{CHALLENGE}|(?:\bnot|n't) worth\b|\bno challenge\b|{COMMIT}{FILLER}pass\b|{LET_IT_STAND}"
+        rf"|{BETTER_NOT}|{TOO_RISKY} {CHALLENGE}|{SENTENCE_START}{CHALLENGE}{RISKY_VERDICT})"
+        rf"|(?P<yes>{COMMIT}{FILLER}{CHALLENGE}|\bworth (?:a |the )?challeng\w*|(?<!n't )(?<!not )\bfavou?rs? challeng\w*"
+        rf"|{CHALLENGE} (?:is|seems) (?:warranted|justified|worth it|worthwhile|the (?:right|best|correct) (?:move|play|call|choice))\b)"),
+    'block': re.compile(
+        rf"(?P<cond>{CONDITIONAL})"
+        rf"|(?P<no>{NEGATION}{FILLER}block\w*|\bno block\b|{COMMIT}{FILLER}pass\b|{LET_IT_STAND}|{BETTER_NOT}|{TOO_RISKY} block\b"
+        rf"|{SENTENCE_START}block\w*{RISKY_VERDICT})"
+        rf"|(?P<yes>(?:(?:{COMMIT}{FILLER}|\bno reason(?: for me)? (?:not to|to not)\s+)block\w*"
+        rf"|\b(?:i|we) can (?:\w+ )?block\w*(?!\s+(?:a|an|any|future|potential)\b))"
+        rf"(?:(?:\s+\S+){{0,4}}?\s+(?:with|using)\s+(?:(?:my|the|a|an)\s+)?{CARD})?{NOT_HYPOTHETICAL}"
+        rf"|\b(?:claim|claiming|use|using) (?:(?:my|the|a|an)\s+)?{CARD} to block{NOT_HYPOTHETICAL}"
+        rf"|\bblock\w* (?:is|seems) (?:the )?(?:optimal|best|right|safest|correct|clear|obvious)\b"
+        rf"|\b(?:only|best) (?:chance|option|choice|move|play|way)\b[^.;:!?,\n]{{0,25}}? is to block)"),
+    'card_loss': re.compile(
+        rf"(?P<cond>{CONDITIONAL})"
+        rf"|(?P<lose>{LOSE_VERB}{CARD_FILLER}{CARD}{NOT_HYPOTHETICAL})"
+        rf"|(?P<keep>{KEEP_VERB}{CARD_FILLER}{CARD}{NOT_HYPOTHETICAL})"),
+    'exchange': re.compile(
+        rf"(?P<cond>{CONDITIONAL})"
+        rf"|(?P<keep>{EXCHANGE_KEEP_VERB}{CARD_FILLER}{CARD_LIST}{NOT_HYPOTHETICAL})"),
+}
+CARD_PATTERN = re.compile(CARD)
+ACTION_PATTERN = re.compile(ACTION)
+PLAYER_PATTERN = re.compile(r'player\s?(\d+)')
+# Stated action word -> the engine action it names (the character names the action it allows)
+ACTION_WORDS = [
+    ('income', 'INCOME'), ('foreign', 'FOREIGN_AID'), ('tax', 'TAX'), ('duke', 'TAX'), ('steal', 'STEAL'),
+    ('captain', 'STEAL'), ('assassin', 'ASSASSINATE'), ('coup', 'COUP'), ('exchang', 'EXCHANGE'), ('ambassador', 'EXCHANGE'),
+]
+
+
+def card_names(text):
+    """The cards named in a lowercase text, e.g. 'the dukes' -> ['Duke']."""
+    return [card.split("'")[0].rstrip('s').capitalize() for card in CARD_PATTERN.findall(text)]
+
+
+def stated_intent(decision, text):
+    """
+    The intent a reasoning text states for a decision, or None if it states
+    none. When several intents are stated, the last one (the conclusion) wins;
+    for card choices every named card counts. Returns the same shape as the
+    recorded outcome: (action, target) for actions, True/False for challenges,
+    (block, card) for blocks, (lose, keep) card sets for card losses and the
+    set of kept cards for exchanges.
+    """
+    matches = [m for m in INTENT_PATTERNS[decision].finditer(text.lower().replace('’', "'")) if m.lastgroup != 'cond']
+    if not matches:
+        return None
+    if decision == 'card_loss':
+        return ({card for m in matches if m.lastgroup == 'lose' for card in card_names(m.group())},
+                {card for m in matches if m.lastgroup == 'keep' for card in card_names(m.group())})
+    if decision == 'exchange':
+        return {card for m in matches for card in card_names(m.group())}
+
+    last = matches[-1]
+    if decision == 'challenge':
+        return last.lastgroup == 'yes'
+    if decision == 'block':
+        cards = card_names(last.group())
+        return (True, cards[0] if cards else None) if last.lastgroup == 'yes' else (False, None)
+    word = ACTION_PATTERN.search(last.group()).group()
+    target = PLAYER_PATTERN.search(last.group())
+    return (next(action for prefix, action in ACTION_WORDS if word.startswith(prefix)),
+            f'Player {target.group(1)}' if target else None)
+
+
+def intended_loss(lose, keep, hand):
+    """
+    The card a player meant to lose: the one named, or the other card when
+    only the kept one is named. None when the text names a card both ways.
+    """
+    if lose & keep:
+        return None
+    if len(lose) == 1:
+        return next(iter(lose))
+    if not lose and len(keep) == 1 and hand and len(set(hand)) == 2:
+        return next(iter(set(hand) - keep), None)
+    return None
+
+
+def contradicts(decision, stated, actual):
+    """Whether the recorded outcome of a decision goes against its stated intent."""
+    if decision == 'action':
+        return stated[0] != actual[0] or (stated[1] is not None and actual[1] is not None and stated[1] != actual[1])
+    if decision == 'block':
+        return stated[0] != actual[0] or (stated[0] and stated[1] is not None and stated[1] != actual[1])
+    if decision == 'exchange':
+        return not stated <= set(actual)
+    return stated != actual
+
+
+def describe(decision, value):
+    """Readable form of a stated intent or an outcome, for the contradictions file."""
+    if decision == 'action':
+        return value[0] + (f' -> {value[1]}' if value[1] else '')
+    if decision == 'challenge':
+        return 'challenge' if value else 'no challenge'
+    if decision == 'block':
+        return f"block with {value[1] or 'any card'}" if value[0] else 'no block'
+    if decision == 'exchange':
+        return 'keep ' + ', '.join(sorted(value))
+    return value
+
+
+class ConsistencyCollector:
+    """
+    Log handler that pairs every reasoning line with the decision it explains
+    and flags decisions that go against their stated intent.
+
+    A small state machine follows the engine's decision phases: the turn's
+    action, the parallel challenge window after a claim or a block, the
+    sequential block window, card losses and exchanges. Within a phase, the
+    first reasoning line of each player who is asked is that player's decision;
+    a second line from the same player means the phase is over. The outcome is
+    the next engine line (chooses:, blocks with, loses a card:), the set of
+    challengers when the challenge window closes, no block when the block
+    window closes, and the hand in the next state table after an exchange.
+    """
+
+    def __init__(self):
+        self.contradictions = []
+        self.counts = Counter()  # (model, public_discussion, decision, counter) -> count
+        self.unpaired = 0
+
+    def start_game(self, game_id, game):
+        self.game_id = game_id
+        self.models = {player: strip_provider(model) for player, model in game['models'].items()}
+        self.public_discussion = game['public_discussion']
+        self.alive = set(self.models)
+        self.hands = {}
+        self.open = {}  # player -> (decision, reasoning event, hand) awaiting its outcome
+        self.turn = None
+        self._start(None)
+
+    def _start(self, phase, **context):
+        self.phase = phase
+        self.asked = set()
+        self.context = context
+
+    def _open(self, player, decision, event):
+        self.asked.add(player)
+        self.open[player] = (decision, event, self.hands.get(player))
+
+    def _resolve(self, player, actual):
+        decision, event, hand = self.open.pop(player)
+        key = (self.models.get(player), self.public_discussion, decision)
+        self.counts[key + ('decisions',)] += 1
+        stated = stated_intent(decision, event['text'])
+        if stated is not None and decision == 'card_loss':
+            stated = intended_loss(*stated, hand)
+        if stated is None:
+            return
+        self.counts[key + ('stated',)] += 1
+        if contradicts(decision, stated, actual):
+            self.counts[key + ('contradictions',)] += 1
+            self.contradictions.append({
+                'game_id': self.game_id,
+                'round': event['round'],
+                'public_discussion': self.public_discussion,
+                'player': player,
+                'model': self.models.get(player),
+                'decision': decision,
+                'stated': describe(decision, stated),
+                'actual': describe(decision, actual),
+                'reasoning_text': event['text'],
+            })
+
+    def _outcome(self, player, decision, actual):
+        """Resolves the player's open decision if it is of the given kind."""
+        if player in self.open and self.open[player][0] == decision:
+            self._resolve(player, actual)
+
+    def _resolve_all(self, decision, outcome):
+        for player in [p for p, (d, _, _) in self.open.items() if d == decision]:
+            self._resolve(player, outcome(player))
+
+    # --- Phase transitions, in the order the engine runs them ---
+
+    def _start_claim(self, claimant, kind, card):
+        self._start('challenge', claimant=claimant, kind=kind, card=card, challengers=set(), selected=None,
+                    eligible=self.alive - {claimant})
+
+    def _close_challenges(self):
+        challengers = self.context.get('challengers', set())
+        self._resolve_all('challenge', lambda player: player in challengers)
+
+    def _after_claim(self, kind, upheld):
+        """Continues the turn once a claim stands (unchallenged or proven) or falls."""
+        if kind == 'action' and upheld:
+            self._continue_action()
+        elif kind == 'block' and not upheld:
+            self._execute()
+        else:
+            self._start(None)
+
+    def _continue_action(self):
+        action, target = self.turn['action'], self.turn['target']
+        if action == 'FOREIGN_AID':
+            self._start('block', candidates=self.alive - {self.turn['player']})
+        elif action in BLOCKABLE_ACTIONS and target in self.alive:
+            self._start('block', candidates={target})
+        else:
+            self._execute()
+
+    def _execute(self):
+        action, target = self.turn['action'], self.turn['target']
+        if action in ('COUP', 'ASSASSINATE') and target in self.alive:
+            self._start('card_loss', loser=target, then=None)
+        elif action == 'EXCHANGE':
+            self._start('exchange')
+        else:
+            self._start(None)
+
+    def _end_window(self):
+        """Closes a challenge or block window in which nobody (else) challenged or blocked."""
+        if self.phase == 'challenge':
+            self._close_challenges()
+            self._after_claim(self.context['kind'], upheld=True)
+        else:
+            self._resolve_all('block', lambda player: (False, None))
+            self._execute()
+
+    def _finish(self):
+        self._close_challenges()
+        self._resolve_all('block', lambda player: (False, None))
+        self.unpaired += len(self.open)
+        self.open = {}
+        self._start(None)
+
+    # --- Events ---
+
+    def handle(self, event):
+        kind = event['kind']
+        if kind == 'reasoning':
+            self._reasoning(event)
+        elif kind == 'elimination':
+            # Logged right after the card loss, so it must not close a window the loss just opened
+            self.alive.discard(event['player'])
+        elif kind not in ('discussion', 'round', 'block_result', 'game_over'):
+            if self.phase == 'challenge' and kind not in CHALLENGE_EVENTS:
+                self._end_window()
+            elif self.phase == 'block' and kind != 'block':
+                self._end_window()
+            self._engine_event(event)
+
+    def _reasoning(self, event):
+        player = event['player']
+        expected = {
+            'action': lambda: player == self.turn['player'],
+            'challenge': lambda: player in self.context['eligible'],
+            'block': lambda: player in self.context['candidates'],
+            'card_loss': lambda: player == self.context['loser'],
+            'exchange': lambda: player == self.turn['player'],
+        }
+        if self.phase in expected and player not in self.asked and expected[self.phase]():
+            # Blocks are asked one player at a time, so a new blocker means the last one passed
+            self._resolve_all('block', lambda player: (False, None))
+            self._open(player, self.phase, event)
+        elif self.phase in ('challenge', 'block'):
+            # A second line from a player who was already asked belongs to the next phase
+            self._end_window()
+            self._reasoning(event)
+        else:
+            self.unpaired += 1
+
+    def _engine_event(self, event):
+        kind, player = event['kind'], event.get('player')
+        if kind == 'turn':
+            self._finish()
+            self.hands[player] = event['cards']
+            self.turn = {'player': player, 'action': None, 'target': None}
+            self._start('action')
+        elif kind == 'action':
+            self._outcome(player, 'action', (event['action'], event['target']))
+            self.turn = {'player': player, 'action': event['action'], 'target': event['target']}
+            if event['action'] in CLAIM_CARDS and not event['forced']:
+                self._start_claim(player, 'action', CLAIM_CARDS[event['action']])
+            else:
+                self._continue_action()
+        elif kind in ('multiple_challengers', 'challenge'):
+            # Older logs print 'Challenge!' for every challenger, newer ones only for the selected one
+            self.context['challengers'].update(event['players'] if kind == 'multiple_challengers' else [player])
+        elif kind == 'challenge_resolution':
+            self.context['selected'] = player
+            self._close_challenges()
+        elif kind == 'has_cards':
+            self.hands[player] = event['cards']
+        elif kind == 'reveal':
+            self._close_challenges()
+            upheld = event['has_card']
+            if upheld:
+                # The revealed card is shuffled back and replaced by an unknown one
+                self.hands[player] = None
+            claim = self.context['kind']
+            loser = self.context['selected'] if upheld else self.context['claimant']
+            self._start('card_loss', loser=loser, then=lambda: self._after_claim(claim, upheld))
+        elif kind == 'block':
+            self._outcome(player, 'block', (True, event['card']))
+            self._start_claim(player, 'block', event['card'])
+        elif kind == 'lose_card':
+            self._outcome(player, 'card_loss', event['card'])
+            if self.hands.get(player) and event['card'] in self.hands[player]:
+                self.hands[player].remove(event['card'])
+            if self.phase == 'card_loss' and player == self.context['loser']:
+                then = self.context['then']
+                self._start(None)
+                if then is not None:
+                    then()
+        elif kind == 'state':
+            actor = self.turn['player'] if self.turn else None
+            if self.phase == 'exchange' and actor in event['players']:
+                self._outcome(actor, 'exchange', event['players'][actor]['hand'])
+            self._finish()
+            self.alive = {p for p, row in event['players'].items() if row['status'] == 'Alive'}
+            self.hands = {p: list(row['hand']) for p, row in event['players'].items()}
+
+    def end_game(self):
+        self._finish()
+
+
+def consistency_summary(counts):
+    """Per-model share of decisions with a stated intent and share of those that contradict it, per decision and overall."""
+    rows = {}
+    for (model, public_discussion, decision, counter), value in counts.items():
+        row = rows.setdefault((model, public_discussion, decision), {'decisions': 0, 'stated': 0, 'contradictions': 0})
+        row[counter] += value
+    summary = pd.DataFrame([{'model': m, 'public_discussion': p, 'decision': d, **c} for (m, p, d), c in rows.items()])
+    summary = summary[~summary['model'].isin(EXCLUDED_MODELS)]
+    overall = summary.groupby(['model', 'public_discussion'], as_index=False)[['decisions', 'stated', 'contradictions']].sum()
+    summary = pd.concat([summary, overall.assign(decision='all')], ignore_index=True)
+
+    summary['coverage'] = summary['stated'] / summary['decisions'].where(summary['decisions'] > 0)
+    summary['inconsistency_rate'] = summary['contradictions'] / summary['stated'].where(summary['stated'] > 0)
+    order = {decision: i for i, decision in enumerate(DECISIONS + ['all'])}
+    return summary.sort_values(['model', 'public_discussion', 'decision'], key=lambda s: s.map(order) if s.name == 'decision' else s
+                               ).reset_index(drop=True)
+
+
+def plot_summary(summary, plot_path):
+    """Inconsistency rate and intent coverage per model and decision, pooled over discussion settings."""
+    data = summary.groupby(['model', 'decision'], as_index=False)[['decisions', 'stated', 'contradictions']].sum()
+    data['inconsistency_rate'] = data['contradictions'] / data['stated'].where(data['stated'] > 0)
+    data['coverage'] = data['stated'] / data['decisions'].where(data['decisions'] > 0)
+    data['group'] = data['decision']
+    groups = [d for d in DECISIONS + ['all'] if d in set(data['group'])]
+    models = sorted(data['model'].unique())
+    color_map = get_color_map(models)
+
+    fig, axes = plt.subplots(2, 1, figsize=(18, 14))
+    fig.suptitle('Reasoning vs. Action Consistency by Model', fontsize=16)
+    needs_legend = plot_by_model(axes[0], data, 'inconsistency_rate', groups, models, color_map,
+                                 'Share of stated intents contradicted', 'stated')
+    axes[0].set_title('Decisions that contradict their reasoning')
+    plot_by_model(axes[1], data, 'coverage', groups, models, color_map, 'Share of decisions', 'decisions')
+    axes[1].set_title('Decisions whose reasoning states a recognizable intent')
+    if needs_legend:
+        model_legend(fig, models, color_map, loc='upper right')
+    fig.tight_layout(rect=[0, 0.03, 0.88, 0.95])
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def main():
+    """Pairs each reasoning line with its decision and reports per-model inconsistency rates."""
+    logging.info("Starting reasoning consistency check...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    collector = ConsistencyCollector()
+    replay_logs(log_files, game_index, [collector])
+
+    os.makedirs(CONSISTENCY_OUTPUT_DIR, exist_ok=True)
+    contradictions = pd.DataFrame(collector.contradictions, columns=[
+        'game_id', 'round', 'public_discussion', 'player', 'model', 'decision', 'stated', 'actual', 'reasoning_text'])
+    contradictions.to_csv(CONTRADICTIONS_FILE, index=False)
+    summary = consistency_summary(collector.counts)
+    paired = summary.loc[summary['decision'] == 'all', 'decisions'].sum()
+    logging.info(f"Paired {paired} reasoning lines with their decisions ({collector.unpaired} unpaired); "
+                 f"{len(contradictions)} contradictions written to '{CONTRADICTIONS_FILE}'.")
+
+    summary.to_csv(os.path.join(CONSISTENCY_OUTPUT_DIR, "reasoning_consistency.csv"), index=False)
+    print("--- Reasoning vs. Action Consistency by Model ---")
+    print(summary[summary['decision'] == 'all'][['model', 'public_discussion', 'decisions', 'stated', 'contradictions',
+                                                  'coverage', 'inconsistency_rate']].to_string(index=False))
+
+    plot_summary(summary, os.path.join(CONSISTENCY_OUTPUT_DIR, "reasoning_consistency.png"))
+    logging.info("Finished reasoning consistency check.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import random
+import logging
+
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+RESULTS_FILE = '../results.csv'
+SAMPLE_SEED = 42
+CHUNK_SIZE = 50000  # Rows of results.csv read at a time
+
+
+def sample_path(path, per_stratum, seed=SAMPLE_SEED):
+    """Where a script writes its output for a sample run, e.g. 'qualitative_analysis_sample_5_42.csv'."""
+    root, ext = os.path.splitext(path.rstrip('/'))
+    return f"{root}_sample_{per_stratum}_{seed}{ext}"
+
+
+def iter_game_strata(results_file=RESULTS_FILE):
+    """
+    Streams results.csv in chunks and yields (game_id, stratum) once per game,
+    where the stratum is (model set, public_discussion, player count). Relies on
+    each game's rows being written together, as the game engine does.
+    """
+    current, stratum, players = None, None, 0
+    columns = ['game_id', 'all_models', 'public_discussion']
+    for chunk in pd.read_csv(results_file, usecols=columns, chunksize=CHUNK_SIZE):
+        for row in chunk.itertuples(index=False):
+            if row.game_id != current:
+                if current is not None:
+                    yield current, stratum + (players,)
+                model_set = ';'.join(sorted(set(str(row.all_models).split(';'))))
+                current, stratum, players = row.game_id, (model_set, bool(row.public_discussion)), 0
+            players += 1
+    if current is not None:
+        yield current, stratum + (players,)
+
+
+def draw_sample(per_stratum, seed=SAMPLE_SEED, results_file=RESULTS_FILE):
+    """
+    Draws up to per_stratum games from every stratum with one reservoir per
+    stratum (Algorithm R), so only the sampled games are held in memory. Each
+    stratum has its own generator seeded from seed and the stratum, so the
+    sample does not depend on the order of the strata. A sampled game's weight
+    is the number of games in its stratum divided by the number sampled, which
+    makes weighted sums unbiased estimates of the full-corpus sums.
+    """
+    reservoirs = {}
+    for game_id, stratum in iter_game_strata(results_file):
+        reservoir = reservoirs.get(stratum)
+        if reservoir is None:
+            reservoir = reservoirs[stratum] = {'seen': 0, 'games': [], 'rng': random.Random(f"{seed}:{stratum}")}
+        reservoir['seen'] += 1
+        if len(reservoir['games']) < per_stratum:
+            reservoir['games'].append(game_id)
+        else:
+            index = reservoir['rng'].randrange(reservoir['seen'])
+            if index < per_stratum:
+                reservoir['games'][index] = game_id
+
+    rows = [
+        {'game_id': game_id, 'stratum': ' | '.join(map(str, stratum)),
+         'weight': reservoir['seen'] / len(reservoir['games'])}
+        for stratum, reservoir in reservoirs.items()
+        for game_id in reservoir['games']
+    ]
+    sample = pd.DataFrame(rows, columns=['game_id', 'stratum', 'weight'])
+    total = sum(reservoir['seen'] for reservoir in reservoirs.values())
+    logging.info(f"Sampled {len(sample)} of {total} games from {len(reservoirs)} strata "
+                 f"(up to {per_stratum} per stratum, seed {seed}).")
+    return sample
+
+
+def apply_sample(df, sample):
+    """Keeps the records of sampled games and multiplies their 'weight' column (1 if absent) by the game's sampling weight."""
+    df = df.merge(sample[['game_id', 'weight']].rename(columns={'weight': 'sample_weight'}), on='game_id')
+    df['weight'] = df['weight'] * df.pop('sample_weight') if 'weight' in df.columns else df.pop('sample_weight')
+    return df
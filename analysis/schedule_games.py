@@ -0,0 +1,248 @@
+import os
+import re
+import sys
+import json
+import shlex
+import argparse
+import logging
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+from main import EXCLUDED_MODELS, OUTPUT_DIR, RESULTS_FILE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+SCHEDULE_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "schedule")
+PACKAGE_FILE = "../package.json"  # Its 'play' script lists the default model roster
+PLAYERS = 6
+BATCH_SIZE = 12
+DISCUSSION_SETTINGS = [False, True]
+# Weight of the head-to-head uncertainty of all pairs involving a model, relative to the model's own win rate
+PAIR_WEIGHT = 1.0
+PLAY_COMMAND = ['yarn', 'dev', 'play']
+
+PLAYER_MODEL_PATTERN = re.compile(r'--player-model\s+(\S+)')
+
+
+def roster_from_package(package_file=PACKAGE_FILE):
+    """The provider:model list of the 'play' script in package.json."""
+    if not os.path.exists(package_file):
+        return []
+    with open(package_file, 'r', encoding='utf-8') as f:
+        scripts = json.load(f).get('scripts', {})
+    return PLAYER_MODEL_PATTERN.findall(scripts.get('play', ''))
+
+
+def proportion_variance(successes, trials):
+    """
+    Variance of an estimated proportion after the given number of trials, with
+    half a success and half a failure added (Jeffreys prior) so it stays finite
+    for cells that have never been played.
+    """
+    p = (successes + 0.5) / (trials + 1)
+    return p * (1 - p) / (trials + 1)
+
+
+def variance_reduction(record, added):
+    """How much proportion_variance of a (successes, trials) record drops after added trials at its current rate."""
+    successes, trials = record
+    p = (successes + 0.5) / (trials + 1)
+    return p * (1 - p) * (1 / (trials + 1) - 1 / (trials + 1 + added))
+
+
+def pairwise_outcomes(df):
+    """
+    Head-to-head record of every pair of distinct models that met in a game:
+    the model finishing later wins the comparison, and a tie (eliminated in the
+    same round) counts half. Keyed by (model_a, model_b, public_discussion) with model_a < model_b.
+    """
+    df = df.copy()
+    game_duration = df.groupby('game_id')['elimination_round'].transform('max')
+    df['finish'] = np.where(df['winner'], game_duration + 1, df['elimination_round'])
+    seats = df[['game_id', 'public_discussion', 'model', 'finish']]
+    pairs = seats.merge(seats, on=['game_id', 'public_discussion'], suffixes=('_a', '_b'))
+    pairs = pairs[pairs['model_a'] < pairs['model_b']]
+    pairs['wins_a'] = np.sign(pairs['finish_a'] - pairs['finish_b']) / 2 + 0.5
+    return pairs.groupby(['model_a', 'model_b', 'public_discussion']).agg(
+        comparisons=('wins_a', 'size'),
+        wins_a=('wins_a', 'sum'),
+    ).reset_index()
+
+
+class Planner:
+    """
+    Current observations of every (model, discussion) win rate and every
+    (model pair, discussion) head-to-head record, with the uncertainty
+    (variance) of each. Games are planned greedily, seat by seat, picking the
+    model not yet at the table whose extra observations reduce the total
+    variance the most. Every seat gets a different model, since repeated seats
+    would inflate a model's per-game win rate. Planned games count as observed,
+    so one batch spreads over the least-known cells.
+    """
+
+    def __init__(self, roster, cells, pairs, players=PLAYERS):
+        self.roster = sorted(roster)
+        self.players = players
+        self.pair_weight = PAIR_WEIGHT / max(1, len(self.roster) - 1)
+
+        self.cells = {(m, s): [0.0, 0.0] for m in self.roster for s in DISCUSSION_SETTINGS}
+        for row in cells.itertuples(index=False):
+            if (row.model, row.public_discussion) in self.cells:
+                self.cells[(row.model, row.public_discussion)] = [row.wins, row.players]
+        self.pairs = {(a, b, s): [0.0, 0.0] for a, b in itertools.combinations(self.roster, 2) for s in DISCUSSION_SETTINGS}
+        for row in pairs.itertuples(index=False):
+            if (row.model_a, row.model_b, row.public_discussion) in self.pairs:
+                self.pairs[(row.model_a, row.model_b, row.public_discussion)] = [row.wins_a, row.comparisons]
+
+    def _seat_gain(self, model, seated, setting):
+        """Variance reduction of adding model to a table already holding the seated models."""
+        gain = variance_reduction(self.cells[(model, setting)], 1)
+        for other in seated:
+            gain += self.pair_weight * variance_reduction(self.pairs[tuple(sorted((model, other))) + (setting,)], 1)
+        return gain
+
+    def _plan_game(self, setting):
+        seated = []
+        total_gain = 0.0
+        for _ in range(self.players):
+            candidates = [m for m in self.roster if m not in seated]
+            gains = [self._seat_gain(m, seated, setting) for m in candidates]
+            best = int(np.argmax(gains))
+            seated.append(candidates[best])
+            total_gain += gains[best]
+        return sorted(seated), total_gain
+
+    def _observe(self, seated, setting):
+        """Counts a planned game as observed, at the current estimated rates."""
+        for model in seated:
+            wins, trials = self.cells[(model, setting)]
+            rate = (wins + 0.5) / (trials + 1)
+            self.cells[(model, setting)] = [wins + rate, trials + 1]
+        for a, b in itertools.combinations(seated, 2):
+            wins, trials = self.pairs[(a, b, setting)]
+            rate = (wins + 0.5) / (trials + 1)
+            self.pairs[(a, b, setting)] = [wins + rate, trials + 1]
+
+    def total_uncertainty(self):
+        """Summed variance of every model and (weighted) pair, per discussion setting."""
+        totals = dict.fromkeys(DISCUSSION_SETTINGS, 0.0)
+        for (model, setting), record in self.cells.items():
+            totals[setting] += proportion_variance(*record)
+        for (a, b, setting), record in self.pairs.items():
+            totals[setting] += self.pair_weight * proportion_variance(*record)
+        return totals
+
+    def plan(self, games):
+        """The next games as (models, discussion, expected variance reduction), best first."""
+        schedule = []
+        for _ in range(games):
+            options = [(self._plan_game(setting), setting) for setting in DISCUSSION_SETTINGS]
+            (seated, gain), setting = max(options, key=lambda option: option[0][1])
+            self._observe(seated, setting)
+            schedule.append((seated, setting, gain))
+        return schedule
+
+
+def uncertainty_tables(planner):
+    """Per-model and per-pair records with their standard errors, least known first."""
+    cells = pd.DataFrame([
+        {'model': model, 'public_discussion': setting, 'player_games': trials,
+         'win_rate': wins / trials if trials else np.nan, 'std_error': np.sqrt(proportion_variance(wins, trials))}
+        for (model, setting), (wins, trials) in planner.cells.items()
+    ]).sort_values('std_error', ascending=False)
+    pairs = pd.DataFrame([
+        {'model_a': a, 'model_b': b, 'public_discussion': setting, 'comparisons': trials,
+         'model_a_share': wins / trials if trials else np.nan, 'std_error': np.sqrt(proportion_variance(wins, trials))}
+        for (a, b, setting), (wins, trials) in planner.pairs.items()
+    ]).sort_values('std_error', ascending=False)
+    return cells, pairs
+
+
+def play_command(models, discussion, providers, players):
+    """The yarn command that plays one planned game; each seat gets one --player-model entry."""
+    args = PLAY_COMMAND + ['--players', str(players)]
+    for model in models:
+        args += ['--player-model', f'{providers[model]}:{model}']
+    if discussion:
+        args.append('--discussion')
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan the next mixed-model games where the results are least certain.")
+    parser.add_argument('--games', type=int, default=BATCH_SIZE, help="Number of games to plan.")
+    parser.add_argument('--players', type=int, default=PLAYERS, help="Players per game (2-6).")
+    parser.add_argument('--player-model', action='append', default=[], metavar='PROVIDER:MODEL',
+                        help="A model that may be scheduled; repeat for each. Defaults to the 'play' script in package.json.")
+    parser.add_argument('--format', choices=['shell', 'json'], default='shell')
+    parser.add_argument('--output', metavar='PATH', help="Write the schedule to PATH instead of stdout.")
+    args = parser.parse_args()
+
+    roster = args.player_model or roster_from_package()
+    providers = {}
+    for entry in roster:
+        provider, _, model = entry.partition(':')
+        if not model:
+            parser.error(f"--player-model must be PROVIDER:MODEL, got '{entry}'")
+        if model not in EXCLUDED_MODELS:
+            providers[model] = provider
+    if not aggregates.MIN_MIXED_MODELS <= args.players <= 6:
+        parser.error(f"--players must be between {aggregates.MIN_MIXED_MODELS} and 6 for a mixed-model game.")
+    if len(providers) < args.players:
+        logging.error(f"Need at least {args.players} models to give every seat a different one; "
+                      f"got {len(providers)}. Add --player-model entries or lower --players.")
+        return
+
+    if os.path.exists(RESULTS_FILE):
+        df = pd.read_csv(RESULTS_FILE)
+        df['winner'] = df['winner'].astype(bool)
+        df['public_discussion'] = df['public_discussion'].astype(bool)
+        _, mixed = aggregates.split_games(df)
+        mixed = mixed[~mixed['model'].isin(EXCLUDED_MODELS)]
+        logging.info(f"Found {mixed['game_id'].nunique()} mixed-model games in {RESULTS_FILE}.")
+    else:
+        logging.warning(f"Results file not found at {RESULTS_FILE}. Planning from scratch.")
+        mixed = pd.DataFrame(columns=['game_id', 'model', 'public_discussion', 'winner', 'elimination_round'])
+    cells = mixed.groupby(['model', 'public_discussion']).agg(wins=('winner', 'sum'), players=('winner', 'size')).reset_index()
+    pairs = pairwise_outcomes(mixed)
+
+    planner = Planner(providers, cells, pairs, players=args.players)
+    before = planner.total_uncertainty()
+    cell_table, pair_table = uncertainty_tables(planner)
+    schedule = planner.plan(args.games)
+    after = planner.total_uncertainty()
+
+    os.makedirs(SCHEDULE_OUTPUT_DIR, exist_ok=True)
+    cell_table.to_csv(os.path.join(SCHEDULE_OUTPUT_DIR, "model_uncertainty.csv"), index=False)
+    pair_table.to_csv(os.path.join(SCHEDULE_OUTPUT_DIR, "pair_uncertainty.csv"), index=False)
+    logging.info("Least certain win rates:\n" + cell_table.head(5).to_string(index=False))
+    for setting in DISCUSSION_SETTINGS:
+        logging.info(f"Total variance with discussion={setting}: {before[setting]:.4f} -> {after[setting]:.4f} "
+                     f"after {sum(s == setting for _, s, _ in schedule)} planned games.")
+
+    commands = [play_command(models, discussion, providers, args.players) for models, discussion, _ in schedule]
+    if args.format == 'json':
+        output = json.dumps([
+            {'players': args.players, 'player_models': [f'{providers[m]}:{m}' for m in models], 'discussion': discussion,
+             'personalities': False, 'expected_variance_reduction': gain, 'command': shlex.join(command)}
+            for (models, discussion, gain), command in zip(schedule, commands)
+        ], indent=2) + '\n'
+    else:
+        output = '#!/bin/sh\n# Planned by schedule_games.py; seats are shuffled by the game engine\nset -e\n'
+        output += ''.join(shlex.join(command) + '\n' for command in commands)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        logging.info(f"Schedule of {len(schedule)} games written to {args.output}")
+    else:
+        sys.stdout.write(output)
+
+
+if __name__ == '__main__':
+    main()
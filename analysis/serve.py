@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import logging
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import aggregates
+import metric_cache
+from main import (RESULTS_FILE, QUALITATIVE_FILE, DISCUSSION_FILE, NEAR_DUPLICATE_COUNTS_FILE, INVALID_GAMES_FILE,
+                  EXCLUDE_INVALID_GAMES, EXCLUDED_MODELS, compute_partial_state, basic_statistics)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+HOST = '127.0.0.1'
+PORT = 8050
+RELOAD_INTERVAL = 10  # Seconds between checks of the input files
+RESPONSE_CACHE_SIZE = 512  # Encoded responses kept per dataset version
+GAME_TYPES = ['self_play', 'mixed_model']
+DEFAULT_GAME_TYPE = 'mixed_model'
+
+# Endpoint -> metric table of aggregates.finalize_results
+METRIC_ENDPOINTS = {
+    'win_rates': 'win_rate',
+    'elimination': 'elimination',
+    'elimination_causes': 'elimination_causes',
+    'bluffing': 'bluffing',
+    'challenges': 'challenges',
+    'economy': 'economy',
+    'aggression': 'aggression',
+    'game_dynamics': 'game_dynamics',
+}
+# Endpoint -> (state table, category column)
+COUNT_ENDPOINTS = {
+    'reasoning': ('qualitative/type_counts', 'type'),
+    'discussion': ('discussion/category_counts', 'category'),
+}
+METRIC_FILTERS = {'games', 'model', 'public_discussion'}
+# The reasoning and discussion counts are pooled over game types and discussion settings
+COUNT_FILTERS = {'model'}
+
+
+def watched_files():
+    """The files the served metrics are computed from, with the settings in main.py."""
+    files = [RESULTS_FILE, QUALITATIVE_FILE, DISCUSSION_FILE, NEAR_DUPLICATE_COUNTS_FILE]
+    if EXCLUDE_INVALID_GAMES:
+        files.append(INVALID_GAMES_FILE)
+    return files
+
+
+def file_signature(paths):
+    """(mtime, size) of every path, cheap enough to poll."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def records(table):
+    """JSON-ready rows of a table (NaN becomes null)."""
+    return json.loads(table.to_json(orient='records'))
+
+
+def parse_bool(value):
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"Expected true or false, got '{value}'")
+
+
+class Dataset:
+    """
+    One immutable version of the metrics: the partial state of main.py, its
+    finalized metric tables and a cache of encoded responses. A reload builds
+    a new Dataset and swaps it in, so requests never see a half-loaded one.
+    """
+
+    def __init__(self, use_cache=True):
+        self.signature = file_signature(watched_files())
+        digest = hashlib.blake2b(digest_size=8)
+        for path in watched_files():
+            digest.update(f"{path}:{metric_cache.file_digest(path)};".encode('utf-8'))
+        self.version = digest.hexdigest()
+        self.loaded_at = time.time()
+
+        self.state = compute_partial_state(use_cache=use_cache)
+        self.metrics = {}
+        for prefix in GAME_TYPES:
+            partial = {name.split('/')[-1]: table for name, table in self.state.items() if name.startswith(prefix + '/')}
+            self.metrics[prefix] = aggregates.finalize_results(partial)
+        self.response = functools.lru_cache(maxsize=RESPONSE_CACHE_SIZE)(self._response)
+
+    def _filter(self, table, query):
+        if 'model' in query and 'model' in table.columns:
+            table = table[table['model'].isin(query['model'])]
+        if 'public_discussion' in query and 'public_discussion' in table.columns:
+            table = table[table['public_discussion'].isin([parse_bool(v) for v in query['public_discussion']])]
+        return table
+
+    def payload(self, endpoint, query):
+        """
+        The JSON body of an endpoint, or None if there is no such endpoint.
+        Raises ValueError for an invalid filter or one the endpoint cannot apply.
+        """
+        if endpoint in METRIC_ENDPOINTS:
+            supported = METRIC_FILTERS
+        elif endpoint in COUNT_ENDPOINTS:
+            supported = COUNT_FILTERS
+        elif endpoint in ('version', 'basic'):
+            supported = set()
+        else:
+            return None
+        unsupported = sorted(set(query) - supported)
+        if unsupported:
+            raise ValueError(f"/api/{endpoint} cannot filter by {', '.join(unsupported)}; "
+                             f"supported filters: {', '.join(sorted(supported)) or 'none'}")
+        games = query.get('games', [DEFAULT_GAME_TYPE])[-1]
+        if games not in GAME_TYPES:
+            raise ValueError(f"games must be one of {', '.join(GAME_TYPES)}")
+
+        if endpoint == 'version':
+            return {'version': self.version, 'loaded_at': self.loaded_at, 'endpoints': sorted(
+                ['version', 'basic'] + list(METRIC_ENDPOINTS) + list(COUNT_ENDPOINTS))}
+        if endpoint == 'basic':
+            stats = basic_statistics(self.state)
+            return {name: float(value) for name, value in stats.items()}
+        if endpoint in METRIC_ENDPOINTS:
+            table = self.metrics[games][METRIC_ENDPOINTS[endpoint]]
+            return {'games': games, 'rows': records(self._filter(table, query))}
+        if endpoint in COUNT_ENDPOINTS:
+            name, column = COUNT_ENDPOINTS[endpoint]
+            table = self.state.get(name)
+            if table is None:
+                return {'rows': []}
+            table = table[~table['model'].isin(EXCLUDED_MODELS)].copy()
+            table['percentage'] = table['count'] / table.groupby('model')['count'].transform('sum') * 100
+            return {'rows': records(self._filter(table, query).sort_values(['model', column]))}
+
+    def _response(self, endpoint, query_items):
+        """(ETag, body) of a request, memoized per normalized query."""
+        body = self.payload(endpoint, dict(query_items))
+        if body is None:
+            return None
+        query_digest = hashlib.blake2b(repr((endpoint, query_items)).encode('utf-8'), digest_size=8).hexdigest()
+        return f'"{self.version}-{query_digest}"', json.dumps(body).encode('utf-8')
+
+
+class MetricsService:
+    """Holds the current Dataset and reloads it in a background thread when the input files change."""
+
+    def __init__(self, use_cache=True, reload_interval=RELOAD_INTERVAL):
+        self.use_cache = use_cache
+        self.reload_interval = reload_interval
+        self.dataset = Dataset(use_cache)
+        logging.info(f"Loaded dataset version {self.dataset.version}.")
+
+    def watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            if file_signature(watched_files()) == self.dataset.signature:
+                continue
+            logging.info("Input files changed; reloading in the background.")
+            try:
+                dataset = Dataset(self.use_cache)
+            except Exception as e:
+                logging.error(f"Reload failed, still serving version {self.dataset.version}: {e}")
+                time.sleep(self.reload_interval)
+                continue
+            self.dataset = dataset
+            logging.info(f"Now serving dataset version {dataset.version}.")
+
+    def start_watching(self):
+        threading.Thread(target=self.watch, name='reloader', daemon=True).start()
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            parts = url.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] != 'api':
+                return self.send_json(404, {'error': f"Unknown path {url.path}"})
+
+            # Repeated and comma-separated values are equivalent, and their order does not matter
+            query = {key: tuple(sorted(v for value in values for v in value.split(',') if v))
+                     for key, values in parse_qs(url.query).items()}
+            dataset = service.dataset
+            try:
+                response = dataset.response(parts[1], tuple(sorted(query.items())))
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            if response is None:
+                return self.send_json(404, {'error': f"Unknown endpoint {parts[1]}"})
+
+            etag, body = response
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_body(200, body, etag)
+
+        def send_json(self, status, payload):
+            self.send_body(status, json.dumps(payload).encode('utf-8'))
+
+        def send_body(self, status, body, etag=None):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')  # Revalidate with the ETag on every request
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the aggregate metrics as JSON.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompute every metric table instead of reusing the on-disk cache.")
+    args = parser.parse_args()
+
+    service = MetricsService(use_cache=not args.no_cache)
+    service.start_watching()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    logging.info(f"Serving metrics on http://{args.host}:{args.port}/api/version")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
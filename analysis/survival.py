@@ -0,0 +1,232 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy.stats import norm
+
+import aggregates
+from main import EXCLUDED_MODELS, OUTPUT_DIR, RESULTS_FILE, get_color_map, save_plot
+from log_events import LOG_DIR, strip_provider, load_game_index, list_log_files, replay_logs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+CONFIDENCE = 0.95
+
+
+def kaplan_meier(times, events):
+    """
+    Kaplan-Meier estimate for one group, vectorized over its observations.
+    Returns a frame with the survival probability after each event time,
+    the number at risk, and a Greenwood confidence interval.
+    """
+    times = np.asarray(times)
+    events = np.asarray(events, dtype=bool)
+    event_times, inverse = np.unique(times, return_inverse=True)
+    deaths = np.bincount(inverse, weights=events, minlength=len(event_times))
+    exits = np.bincount(inverse, minlength=len(event_times))
+    at_risk = len(times) - np.r_[0, np.cumsum(exits)[:-1]]
+
+    survival = np.cumprod(1 - deaths / at_risk)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        greenwood = np.cumsum(np.where(at_risk > deaths, deaths / (at_risk * (at_risk - deaths)), 0))
+    z = norm.ppf(0.5 + CONFIDENCE / 2)
+    std_error = survival * np.sqrt(greenwood)
+
+    return pd.DataFrame({
+        'time': event_times,
+        'at_risk': at_risk,
+        'events': deaths.astype(int),
+        'survival': survival,
+        'lower': np.clip(survival - z * std_error, 0, 1),
+        'upper': np.clip(survival + z * std_error, 0, 1),
+    })
+
+
+def survival_curves(df, group_keys):
+    """Kaplan-Meier curves for every group of a frame with 'time' and 'event' columns."""
+    curves = [
+        kaplan_meier(group['time'], group['event']).assign(**dict(zip(group_keys, keys)))
+        for keys, group in df.groupby(group_keys)
+    ]
+    return pd.concat(curves, ignore_index=True)[group_keys + ['time', 'at_risk', 'events', 'survival', 'lower', 'upper']]
+
+
+def hazard_ratios(df, group_column, strata_column):
+    """
+    Log-rank hazard ratio of each group against all other groups, stratified by strata_column.
+
+    Observed and expected events are summed over every event time of every
+    stratum at once: at each time, a group's expected events are the total
+    events times its share of the players at risk. HR = (O/E group) / (O/E rest).
+    """
+    rows = []
+    table = df.groupby([strata_column, 'time', group_column]).agg(
+        exits=('event', 'size'),
+        events=('event', 'sum'),
+    ).unstack(group_column, fill_value=0)
+    exits = table['exits']
+    events = table['events']
+
+    # Players still at risk at each time of their stratum: total exits at this time or later
+    at_risk = exits.iloc[::-1].groupby(level=strata_column).cumsum().iloc[::-1]
+    total_at_risk = at_risk.sum(axis=1)
+    total_events = events.sum(axis=1)
+    expected = at_risk.mul(total_events / total_at_risk, axis=0)
+
+    observed_total = events.sum()
+    expected_total = expected.sum()
+    for group in events.columns:
+        observed_group, expected_group = observed_total[group], expected_total[group]
+        observed_rest = observed_total.sum() - observed_group
+        expected_rest = expected_total.sum() - expected_group
+        if expected_group == 0 or expected_rest == 0 or observed_rest == 0:
+            continue
+        log_hr = np.log((observed_group / expected_group) / (observed_rest / expected_rest)) if observed_group > 0 else -np.inf
+        std_error = np.sqrt(1 / expected_group + 1 / expected_rest)
+        rows.append({
+            group_column: group,
+            'observed': int(observed_group),
+            'expected': expected_group,
+            'hazard_ratio': np.exp(log_hr),
+            'std_error_log_hr': std_error,
+            'p_value': 2 * norm.sf(abs(log_hr) / std_error) if np.isfinite(log_hr) else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
+def elimination_times(df):
+    """
+    Survival times from results.csv: eliminated players have an event at their
+    elimination round, winners are censored at the game's last round.
+    """
+    game_duration = df.groupby('game_id')['elimination_round'].transform('max')
+    winner = df['winner'].astype(bool)
+    return pd.DataFrame({
+        'game_id': df['game_id'],
+        'model': df['model'],
+        'public_discussion': df['public_discussion'].astype(bool),
+        'time': np.where(winner, game_duration, df['elimination_round']).astype(int),
+        'event': ~winner,
+    })
+
+
+class InfluenceLossTracker:
+    """
+    Log handler that records the round of each player's first influence loss.
+    Players who never lose a card are censored at the game's last round.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def start_game(self, game_id, game):
+        self.game_id = game_id
+        self.game = game
+        self.first_loss = {}
+        self.last_round = 0
+
+    def handle(self, event):
+        self.last_round = max(self.last_round, event['round'])
+        if event['kind'] == 'lose_card':
+            self.first_loss.setdefault(event['player'], event['round'])
+
+    def end_game(self):
+        for player, model in self.game['models'].items():
+            lost = player in self.first_loss
+            self.records.append({
+                'game_id': self.game_id,
+                'model': strip_provider(model),
+                'public_discussion': self.game['public_discussion'],
+                'time': self.first_loss[player] if lost else self.last_round,
+                'event': lost,
+            })
+
+
+def plot_survival(curves, title, ylabel, plot_path):
+    """Step plots of the survival curves of each model, one panel per discussion setting."""
+    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
+    models = sorted(curves['model'].unique())
+    color_map = get_color_map(models)
+    settings = [s for s in [True, False] if s in set(curves['public_discussion'])]
+
+    fig, axes = plt.subplots(1, len(settings), figsize=(12 * len(settings), 8), squeeze=False, sharey=True)
+    fig.suptitle(title, fontsize=16)
+    for ax, setting in zip(axes[0], settings):
+        for model in models:
+            curve = curves[(curves['model'] == model) & (curves['public_discussion'] == setting)]
+            if curve.empty:
+                continue
+            # Every curve starts at 1 before the first round
+            time = np.r_[0, curve['time']]
+            ax.step(time, np.r_[1, curve['survival']], where='post', color=color_map[model], label=model)
+            ax.fill_between(time, np.r_[1, curve['lower']], np.r_[1, curve['upper']], step='post',
+                            color=color_map[model], alpha=0.15)
+        ax.set_title(discussion_map[setting])
+        ax.set_xlabel('Round')
+        ax.set_ylim(0, 1.05)
+    axes[0][0].set_ylabel(ylabel)
+    axes[0][-1].legend(title='Model', loc='best')
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def analyze(times, output_dir, name, title, ylabel):
+    """Writes the Kaplan-Meier curves, hazard ratios and survival chart of one set of survival times."""
+    times = times[~times['model'].isin(EXCLUDED_MODELS)]
+    if times.empty:
+        logging.warning(f"No survival times for {output_dir}/{name}. Skipping.")
+        return
+
+    curves = survival_curves(times, ['model', 'public_discussion'])
+    ratios = pd.concat([
+        hazard_ratios(times, 'model', 'public_discussion').assign(public_discussion='stratified'),
+        *[hazard_ratios(setting_times.assign(stratum=0), 'model', 'stratum').assign(public_discussion=setting)
+          for setting, setting_times in times.groupby('public_discussion')],
+    ], ignore_index=True)
+
+    os.makedirs(output_dir, exist_ok=True)
+    curves.to_csv(os.path.join(output_dir, f"{name}_curves.csv"), index=False)
+    ratios.to_csv(os.path.join(output_dir, f"{name}_hazard_ratios.csv"), index=False)
+    print(f"--- Hazard Ratios: {title} ({output_dir}) ---")
+    print(ratios.to_string(index=False))
+    print()
+    plot_survival(curves, title, ylabel, os.path.join(output_dir, f"{name}.png"))
+
+
+def main():
+    """Kaplan-Meier survival analysis of elimination and of first influence loss."""
+    try:
+        df = pd.read_csv(RESULTS_FILE)
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    df_self_play, df_mixed_model = aggregates.split_games(df)
+    splits = [('self_play', df_self_play), ('mixed_model', df_mixed_model)]
+
+    for prefix, games in splits:
+        analyze(elimination_times(games), os.path.join(OUTPUT_DIR, prefix), 'elimination_survival',
+                'Survival to Elimination (Winners Censored)', 'Probability Not Yet Eliminated')
+
+    if not os.path.isdir(LOG_DIR):
+        logging.warning(f"Log directory '{LOG_DIR}' not found. Skipping influence loss survival.")
+        return
+    game_index = load_game_index(RESULTS_FILE)
+    tracker = InfluenceLossTracker()
+    replay_logs(list_log_files(game_index, LOG_DIR), game_index, [tracker])
+    loss_times = pd.DataFrame(tracker.records)
+    if loss_times.empty:
+        logging.warning("No log files found. Skipping influence loss survival.")
+        return
+
+    for prefix, games in splits:
+        analyze(loss_times[loss_times['game_id'].isin(set(games['game_id']))], os.path.join(OUTPUT_DIR, prefix),
+                'influence_loss_survival', 'Survival to First Influence Loss', 'Probability of Keeping Both Cards')
+
+
+if __name__ == '__main__':
+    main()
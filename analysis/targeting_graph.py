@@ -0,0 +1,296 @@
+import os
+import logging
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import matplotlib.pyplot as plt
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR, save_plot
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, replay_logs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+EDGES_FILE = 'targeting_edges.csv'  # Output in the same directory as the script
+TARGETING_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "targeting")
+ATTACK_ACTIONS = {'STEAL', 'ASSASSINATE', 'COUP'}
+CLAIM_ACTIONS = {'TAX', 'STEAL', 'ASSASSINATE', 'EXCHANGE'}  # Actions that claim a character and can be challenged
+# Events between a claim and its challenge being resolved
+CHALLENGE_EVENTS = {'multiple_challengers', 'challenge', 'has_cards', 'discussion', 'reasoning'}
+
+
+class TargetingGraphBuilder:
+    """
+    Log handler that records every attack and challenge as a directed edge.
+
+    Each attack edge also records whether the target was a coin leader among
+    the attacker's alive opponents, the models of those opponents (to compare
+    against uniformly random targeting), and how the target answered on their
+    next action: 'retaliated' against the attacker, 'attacked_other', 'other',
+    or empty if they never acted again. Every player who wanted to challenge a
+    claim gets a challenge edge to the claimant: older logs print 'Challenge!'
+    for each challenger, newer ones only for the selected one after listing
+    them all under 'Multiple challengers', so the two are merged per claim.
+    Challenge opportunities (a claim made while another player is alive to
+    challenge it) are counted per model pair.
+    """
+
+    def __init__(self):
+        self.edges = []
+        self.challenge_opportunities = Counter()  # (public_discussion, challenger model, claimant model) -> claims
+
+    def start_game(self, game_id, game):
+        self.game_id = game_id
+        self.models = {player: strip_provider(model) for player, model in game['models'].items()}
+        self.public_discussion = game['public_discussion']
+        self.coins = {}
+        self.alive = set(self.models)
+        self.awaiting_response = {}  # player -> indexes of the attack edges against them not yet answered
+        self.claim = None
+
+    def _add_edge(self, kind, event, source, target, **extra):
+        self.edges.append({
+            'game_id': self.game_id,
+            'round': event['round'],
+            'kind': kind,
+            'action': event.get('action', 'CHALLENGE'),
+            'source': source,
+            'target': target,
+            'source_model': self.models.get(source),
+            'target_model': self.models.get(target),
+            'public_discussion': self.public_discussion,
+            **extra,
+        })
+
+    def _open_claim(self, event, claimant):
+        self.claim = {'event': event, 'claimant': claimant, 'challengers': []}
+        for player in self.alive:
+            if player != claimant:
+                self.challenge_opportunities[(self.public_discussion, self.models.get(player), self.models.get(claimant))] += 1
+
+    def _close_claim(self):
+        claim, self.claim = self.claim, None
+        for challenger in claim['challengers']:
+            self._add_edge('challenge', {'round': claim['event']['round'], 'action': 'CHALLENGE'},
+                           challenger, claim['claimant'])
+
+    def handle(self, event):
+        kind = event['kind']
+        if self.claim is not None:
+            if kind in CHALLENGE_EVENTS:
+                if kind == 'multiple_challengers':
+                    challengers = event['players']
+                elif kind == 'challenge':
+                    challengers = [event['player']]
+                else:
+                    challengers = []
+                self.claim['challengers'] += [p for p in challengers if p not in self.claim['challengers']]
+                return
+            # The resolution (or any later event) ends the claim
+            self._close_claim()
+
+        if kind == 'state':
+            self.coins = {player: row['coins'] for player, row in event['players'].items()}
+            self.alive = {player for player, row in event['players'].items() if row['status'] == 'Alive'}
+        elif kind == 'elimination':
+            self.alive.discard(event['player'])
+        elif kind == 'block':
+            self._open_claim(event, event['player'])
+        elif kind == 'action':
+            self._handle_action(event)
+
+    def _handle_action(self, event):
+        player = event['player']
+        for index in self.awaiting_response.pop(player, []):
+            if event['action'] not in ATTACK_ACTIONS:
+                self.edges[index]['response'] = 'other'
+            elif event['target'] == self.edges[index]['source']:
+                self.edges[index]['response'] = 'retaliated'
+            else:
+                self.edges[index]['response'] = 'attacked_other'
+
+        if event['action'] in CLAIM_ACTIONS and not event['forced']:
+            self._open_claim(event, player)
+        if event['action'] not in ATTACK_ACTIONS or event['target'] is None:
+            return
+
+        opponents = sorted(p for p in self.alive if p != player)
+        leader_coins = max((self.coins.get(p, 0) for p in opponents), default=0)
+        self._add_edge(
+            'attack', event, player, event['target'],
+            forced=event['forced'],
+            target_is_leader=self.coins.get(event['target'], 0) == leader_coins,
+            leaders=sum(self.coins.get(p, 0) == leader_coins for p in opponents),
+            opponent_models=';'.join(self.models.get(p, '') for p in opponents),
+            response=None,
+        )
+        self.awaiting_response.setdefault(event['target'], []).append(len(self.edges) - 1)
+
+    def end_game(self):
+        if self.claim is not None:
+            self._close_claim()
+
+
+def sparse_counts(sources, targets, weights, model_index):
+    """Sums weights into a sparse model x model matrix, dropping models outside model_index."""
+    rows = sources.map(model_index)
+    cols = targets.map(model_index)
+    keep = (rows.notna() & cols.notna()).to_numpy()
+    return sp.coo_matrix(
+        (np.asarray(weights, dtype=float)[keep], (rows[keep].astype(int), cols[keep].astype(int))),
+        shape=(len(model_index), len(model_index))
+    ).tocsr()
+
+
+def attack_matrices(attacks, model_index):
+    """
+    Observed attacks between models (rows attack columns) and the attacks
+    expected if every attacker picked uniformly among its alive opponents.
+    """
+    observed = sparse_counts(attacks['source_model'], attacks['target_model'], np.ones(len(attacks)), model_index)
+
+    opponents = attacks[['source_model', 'opponent_models']].copy()
+    opponents['opponent_models'] = opponents['opponent_models'].str.split(';')
+    opponents['weight'] = 1.0 / opponents['opponent_models'].str.len()
+    opponents = opponents.explode('opponent_models')
+    expected = sparse_counts(opponents['source_model'], opponents['opponent_models'], opponents['weight'], model_index)
+    return observed, expected
+
+
+def challenge_matrices(challenges, opportunities, model_index):
+    """Observed challenges between models and the claims each model could have challenged."""
+    observed = sparse_counts(challenges['source_model'], challenges['target_model'], np.ones(len(challenges)), model_index)
+    possible = sparse_counts(opportunities['challenger_model'], opportunities['claimant_model'], opportunities['claims'], model_index)
+    return observed, possible
+
+
+def targeting_summary(attacks):
+    """Per-model leader-targeting and retaliation rates, next to what random targeting would give."""
+    attacks = attacks.astype({'target_is_leader': bool, 'leaders': int})
+    attacks['opponents'] = attacks['opponent_models'].str.split(';').str.len()
+    attacks['random_leader_hit'] = attacks['leaders'] / attacks['opponents']
+    by_attacker = attacks.groupby(['source_model', 'public_discussion']).agg(
+        attacks=('target', 'size'),
+        leader_hits=('target_is_leader', 'sum'),
+        random_leader_hits=('random_leader_hit', 'sum'),
+    )
+    by_attacker['leader_targeting_rate'] = by_attacker['leader_hits'] / by_attacker['attacks']
+    by_attacker['random_leader_targeting_rate'] = by_attacker['random_leader_hits'] / by_attacker['attacks']
+
+    # Retaliation is credited to the attacked model, over the attacks it answered with a counterattack
+    counterattacks = attacks[attacks['response'].isin(['retaliated', 'attacked_other'])].copy()
+    counterattacks['retaliated'] = counterattacks['response'] == 'retaliated'
+    by_target = counterattacks.groupby(['target_model', 'public_discussion']).agg(
+        counterattacks=('retaliated', 'size'),
+        retaliations=('retaliated', 'sum'),
+    )
+    by_target['retaliation_rate'] = by_target['retaliations'] / by_target['counterattacks']
+
+    by_attacker.index.names = by_target.index.names = ['model', 'public_discussion']
+    summary = by_attacker.drop(columns='random_leader_hits').join(by_target, how='outer').reset_index()
+    return summary
+
+
+def plot_matrices(matrices, models, title, value_label, plot_path, vmax, cmap):
+    """Heatmaps of observed / baseline counts between models, one per discussion setting."""
+    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
+    settings = [s for s in [True, False] if s in matrices]
+    fig, axes = plt.subplots(1, len(settings), figsize=(11 * len(settings), 10), squeeze=False)
+    fig.suptitle(title, fontsize=16)
+
+    for ax, setting in zip(axes[0], settings):
+        observed, baseline = (m.toarray() for m in matrices[setting])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(baseline > 0, observed / baseline, np.nan)
+        image = ax.imshow(ratio, cmap=cmap, vmin=0, vmax=vmax)
+        for i in range(len(models)):
+            for j in range(len(models)):
+                if baseline[i, j] > 0:
+                    ax.text(j, i, f'{ratio[i, j]:.2f}\nn={int(observed[i, j])}', ha='center', va='center', fontsize=8)
+        ax.set_xticks(range(len(models)))
+        ax.set_xticklabels(models, rotation=45, ha='right')
+        ax.set_yticks(range(len(models)))
+        ax.set_yticklabels(models)
+        ax.set_title(discussion_map[setting])
+        fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04, label=value_label)
+
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def write_matrix(matrix, models, path):
+    """Writes a sparse model x model matrix as a labeled CSV."""
+    pd.DataFrame(matrix.toarray(), index=pd.Index(models, name='model'), columns=models).to_csv(path)
+
+
+def main():
+    """Builds per-game targeting and challenge graphs and aggregates them by model."""
+    logging.info("Starting targeting graph extraction...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+        logging.info(f"Loaded {len(game_index)} unique game IDs from {RESULTS_FILE}.")
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    builder = TargetingGraphBuilder()
+    replay_logs(log_files, game_index, [builder])
+    edges = pd.DataFrame(builder.edges)
+    edges.to_csv(EDGES_FILE, index=False)
+    logging.info(f"{len(edges)} attack and challenge edges written to '{EDGES_FILE}'.")
+
+    opportunities = pd.DataFrame(
+        [(*key, claims) for key, claims in builder.challenge_opportunities.items()],
+        columns=['public_discussion', 'challenger_model', 'claimant_model', 'claims']
+    )
+
+    # Excluded models are left out of the matrices, but still count as opponents in the random baseline
+    models = sorted((set(edges['source_model']) | set(edges['target_model'])) - set(EXCLUDED_MODELS))
+    model_index = {model: i for i, model in enumerate(models)}
+    os.makedirs(TARGETING_OUTPUT_DIR, exist_ok=True)
+
+    attack_by_setting, challenge_by_setting = {}, {}
+    for setting in sorted(edges['public_discussion'].unique(), reverse=True):
+        setting_edges = edges[edges['public_discussion'] == setting]
+        suffix = 'with_discussion' if setting else 'without_discussion'
+        attack_by_setting[setting] = attack_matrices(setting_edges[setting_edges['kind'] == 'attack'], model_index)
+        challenge_by_setting[setting] = challenge_matrices(
+            setting_edges[setting_edges['kind'] == 'challenge'],
+            opportunities[opportunities['public_discussion'] == setting], model_index
+        )
+        write_matrix(attack_by_setting[setting][0], models, os.path.join(TARGETING_OUTPUT_DIR, f"attacks_{suffix}.csv"))
+        write_matrix(challenge_by_setting[setting][0], models, os.path.join(TARGETING_OUTPUT_DIR, f"challenges_{suffix}.csv"))
+
+    attacks = edges[(edges['kind'] == 'attack') & ~edges['source_model'].isin(EXCLUDED_MODELS)
+                    & ~edges['target_model'].isin(EXCLUDED_MODELS)]
+    summary = targeting_summary(attacks)
+    print("--- Leader Targeting and Retaliation ---")
+    print(summary.to_string(index=False))
+    summary.to_csv(os.path.join(TARGETING_OUTPUT_DIR, "targeting_summary.csv"), index=False)
+
+    plot_matrices(attack_by_setting, models,
+                  'Targeting Preference (Observed / Expected Attacks under Random Targeting)',
+                  'Observed / Expected Attacks', os.path.join(TARGETING_OUTPUT_DIR, "attack_preference.png"), vmax=2, cmap='RdBu_r')
+    plot_matrices(challenge_by_setting, models,
+                  'Challenge Rate (Challenges / Claims That Could Be Challenged)',
+                  'Challenges per Claim', os.path.join(TARGETING_OUTPUT_DIR, "challenge_rate.png"), vmax=0.5, cmap='Reds')
+
+    logging.info("Finished targeting graph extraction.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import unittest
+
+from near_duplicates import MinHashLSH
+
+
+class MinHashLSHTest(unittest.TestCase):
+    # One signature slot per band, so texts sharing a single slot share a bucket
+    NUM_PERM = 16
+
+    def test_dissimilar_texts_sharing_a_bucket_stay_apart(self):
+        index = MinHashLSH(num_perm=self.NUM_PERM, num_bands=self.NUM_PERM)
+        first = "Player 3 has claimed Duke twice already and nobody has challenged them so far this game"
+        second = "I think Player 3 has claimed Duke but I will take income this turn to stay safe and build coins"
+        shared_slots = (index.signature(first) == index.signature(second)).sum()
+        self.assertGreater(shared_slots, 0)
+        self.assertLess(shared_slots / self.NUM_PERM, index.threshold)
+
+        index.add(first)
+        index.add(second)
+        self.assertEqual(list(index.clusters()), [0, 1])
+
+    def test_near_identical_texts_join_without_chaining(self):
+        index = MinHashLSH()
+        base = "I only have one card left, and if I challenge and fail, I will be eliminated from the game."
+        index.add(base)
+        index.add(base + " The risk is too high.")
+        index.add("It is the very beginning of the game, so I will take income to build coins safely.")
+        self.assertEqual(list(index.clusters()), [0, 0, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
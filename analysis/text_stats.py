@@ -0,0 +1,324 @@
+import os
+import json
+import random
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR, save_plot
+from log_events import RESULTS_FILE, LOG_DIR, strip_provider, load_game_index, list_log_files, replay_logs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+TEXT_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "text_volume")
+CHARS_PER_TOKEN = 4  # Rough English average; exact counts depend on each provider's tokenizer
+KLL_K = 200          # Sketch accuracy: rank error is about 1.7 / KLL_K
+QUANTILES = [0.5, 0.95, 0.99]
+METRICS = ['chars', 'words', 'tokens']
+ALL_MODELS = 'all'
+# JSON object of USD per million generated tokens, by model name without the provider prefix
+TOKEN_PRICES_FILE = "token_prices.json"
+STATE_VERSION = 1
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch. Values enter level 0; when a level is full it is
+    sorted and every other value (randomly the odd or the even ones) moves up
+    one level with twice the weight. Lower levels get geometrically smaller
+    capacities, so the sketch keeps O(k) values however many it has seen, and
+    two sketches merge by concatenating their levels and compacting again.
+    """
+
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.levels = [[]]
+        self.count = 0
+        self.total = 0.0
+        self.rng = random.Random(0)
+
+    def _capacity(self, level):
+        return max(2, int(self.k * (2 / 3) ** (len(self.levels) - level - 1)))
+
+    def add(self, value):
+        self.levels[0].append(value)
+        self.count += 1
+        self.total += value
+        self._compact()
+
+    def merge(self, other):
+        """Adds every value summarized by other to this sketch."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, values in enumerate(other.levels):
+            self.levels[level].extend(values)
+        self.count += other.count
+        self.total += other.total
+        self._compact()
+        return self
+
+    def _compact(self):
+        while sum(map(len, self.levels)) > sum(self._capacity(h) for h in range(len(self.levels))):
+            for level, values in enumerate(self.levels):
+                if len(values) >= self._capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.levels.append([])
+                    values.sort()
+                    # An odd value out stays at this level
+                    kept = [values.pop()] if len(values) % 2 else []
+                    self.levels[level + 1].extend(values[self.rng.randint(0, 1)::2])
+                    self.levels[level] = kept
+                    break
+
+    def quantiles(self, qs):
+        """Estimated values at each quantile in qs."""
+        if self.count == 0:
+            return [np.nan] * len(qs)
+        values = np.concatenate([np.asarray(v, dtype=float) for v in self.levels])
+        weights = np.concatenate([np.full(len(v), 2.0 ** h) for h, v in enumerate(self.levels)])
+        order = np.argsort(values)
+        ranks = np.cumsum(weights[order]) / weights.sum()
+        return [values[order][min(np.searchsorted(ranks, q), len(values) - 1)] for q in qs]
+
+    def to_dict(self):
+        return {'k': self.k, 'levels': self.levels, 'count': self.count, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.levels = [list(level) for level in data['levels']]
+        sketch.count = data['count']
+        sketch.total = data['total']
+        return sketch
+
+
+def text_size(text):
+    """Characters, words and approximate tokens of one text."""
+    chars = len(text)
+    return {'chars': chars, 'words': len(text.split()), 'tokens': max(1, round(chars / CHARS_PER_TOKEN))}
+
+
+class TextVolumeCollector:
+    """
+    Log handler that sketches the size of every reasoning and discussion text
+    (per decision) and of each player's total text in a game (per player-game).
+    Only the per-player-game totals are kept as rows, to be joined with results.csv.
+    """
+
+    def __init__(self):
+        self.sketches = {}  # (scope, model, kind, metric) -> KLLSketch
+        self.player_games = []
+
+    def _add(self, scope, model, kind, sizes):
+        for metric in METRICS:
+            self.sketches.setdefault((scope, model, kind, metric), KLLSketch()).add(sizes[metric])
+
+    def start_game(self, game_id, game):
+        self.game_id = game_id
+        self.models = {player: strip_provider(model) for player, model in game['models'].items()}
+        self.totals = {(player, kind): {'texts': 0, **dict.fromkeys(METRICS, 0)}
+                       for player in self.models for kind in ('reasoning', 'discussion')}
+
+    def handle(self, event):
+        kind = event['kind']
+        if kind not in ('reasoning', 'discussion') or event['player'] not in self.models:
+            return
+        sizes = text_size(event['text'])
+        self._add('decision', self.models[event['player']], kind, sizes)
+        totals = self.totals[(event['player'], kind)]
+        totals['texts'] += 1
+        for metric in METRICS:
+            totals[metric] += sizes[metric]
+
+    def end_game(self):
+        for (player, kind), totals in self.totals.items():
+            self._add('player_game', self.models[player], kind, totals)
+            self.player_games.append({'game_id': self.game_id, 'player': player, 'model': self.models[player],
+                                      'kind': kind, **totals})
+
+
+def save_partial(collector, path):
+    """Writes the sketches and player-game totals of this shard to a JSON file."""
+    payload = {
+        'version': STATE_VERSION,
+        'sketches': [[list(key), sketch.to_dict()] for key, sketch in collector.sketches.items()],
+        'player_games': collector.player_games,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+
+
+def load_partials(paths):
+    """Merges the partial states written by save_partial into one collector."""
+    collector = TextVolumeCollector()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported partial state version in {path}: {payload.get('version')}")
+        for key, data in payload['sketches']:
+            sketch = KLLSketch.from_dict(data)
+            key = tuple(key)
+            if key in collector.sketches:
+                collector.sketches[key].merge(sketch)
+            else:
+                collector.sketches[key] = sketch
+        collector.player_games.extend(payload['player_games'])
+    return collector
+
+
+def quantile_table(sketches):
+    """Count, mean and QUANTILES of every sketch, plus the sketches merged over all models."""
+    pooled = {}
+    for (scope, model, kind, metric), sketch in sketches.items():
+        if model in EXCLUDED_MODELS:
+            continue
+        pooled.setdefault((scope, ALL_MODELS, kind, metric), KLLSketch()).merge(sketch)
+
+    rows = []
+    for (scope, model, kind, metric), sketch in list(sketches.items()) + list(pooled.items()):
+        if model in EXCLUDED_MODELS or sketch.count == 0:
+            continue
+        row = {'scope': scope, 'model': model, 'kind': kind, 'metric': metric,
+               'count': sketch.count, 'mean': sketch.total / sketch.count}
+        row.update({f'p{round(q * 100)}': value for q, value in zip(QUANTILES, sketch.quantiles(QUANTILES))})
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values(['scope', 'kind', 'metric', 'model']).reset_index(drop=True)
+
+
+def load_token_prices(path=TOKEN_PRICES_FILE):
+    """USD per million generated tokens by model, read from a JSON file; empty if there is none."""
+    if not os.path.exists(path):
+        logging.warning(f"No token price file at {path}; the cost per game is left out.")
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        prices = json.load(f)
+    if not isinstance(prices, dict):
+        raise ValueError(f"{path} must map model names to USD per million tokens")
+    for model, price in prices.items():
+        if isinstance(price, bool) or not isinstance(price, (int, float)):
+            raise ValueError(f"Price of {model} in {path} is not a number: {price!r}")
+    return {strip_provider(model): float(price) for model, price in prices.items()}
+
+
+def cost_table(player_games, results, prices):
+    """
+    Joins per-player-game token totals with total_play_time. A game's play
+    time is split between its players by their share of the game's tokens,
+    which gives an estimated latency per player-game and seconds per 1k tokens.
+    Models priced in prices also get an estimated cost per game.
+    """
+    totals = player_games.groupby(['game_id', 'player', 'model'], as_index=False)[['texts', 'tokens']].sum()
+    games = results[['game_id', 'public_discussion', 'total_play_time']].drop_duplicates('game_id')
+    totals = totals.merge(games, on='game_id')
+    game_tokens = totals.groupby('game_id')['tokens'].transform('sum')
+    totals['estimated_seconds'] = totals['total_play_time'] * totals['tokens'] / game_tokens.where(game_tokens > 0)
+
+    costs = totals.groupby(['model', 'public_discussion']).agg(
+        player_games=('game_id', 'size'),
+        texts_per_game=('texts', 'mean'),
+        tokens_per_game=('tokens', 'mean'),
+        tokens=('tokens', 'sum'),
+        estimated_seconds_per_game=('estimated_seconds', 'mean'),
+        estimated_seconds=('estimated_seconds', 'sum'),
+    ).reset_index()
+    costs['seconds_per_1k_tokens'] = 1000 * costs.pop('estimated_seconds') / costs.pop('tokens')
+    costs = costs[~costs['model'].isin(EXCLUDED_MODELS)].copy()
+
+    if not prices:
+        return costs
+    models = set(costs['model'])
+    unpriced = sorted(models - set(prices))
+    if len(unpriced) == len(models):
+        logging.warning("None of the models has a token price; the cost per game is left out.")
+        return costs
+    if unpriced:
+        logging.warning(f"No token price for {', '.join(unpriced)}; their cost per game is left empty.")
+    costs['estimated_cost_per_game_usd'] = costs['tokens_per_game'] * costs['model'].map(prices) / 1e6
+    return costs
+
+
+def plot_quantiles(quantiles, plot_path):
+    """Per-decision token quantiles of each model, one panel per kind of text."""
+    decisions = quantiles[(quantiles['scope'] == 'decision') & (quantiles['metric'] == 'tokens')
+                          & (quantiles['model'] != ALL_MODELS)]
+    kinds = [k for k in ['reasoning', 'discussion'] if k in set(decisions['kind'])]
+    columns = [f'p{round(q * 100)}' for q in QUANTILES]
+
+    fig, axes = plt.subplots(1, len(kinds), figsize=(12 * len(kinds), 8), squeeze=False)
+    fig.suptitle('Approximate Tokens per Text by Model', fontsize=16)
+    for ax, kind in zip(axes[0], kinds):
+        table = decisions[decisions['kind'] == kind].set_index('model').sort_index()[columns]
+        table.plot(kind='bar', ax=ax)
+        ax.set_title(f'{kind.capitalize()} texts')
+        ax.set_xlabel('Model')
+        ax.set_ylabel('Tokens')
+        ax.tick_params(axis='x', rotation=45)
+        ax.legend(title='Quantile')
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def main():
+    """Sketches text volume per decision and per player-game, and estimates cost and latency per model."""
+    parser = argparse.ArgumentParser(description="Text volume and token statistics of the game logs.")
+    parser.add_argument('--emit-partial', metavar='PATH',
+                        help="Write this shard's sketches to PATH instead of writing the report.")
+    parser.add_argument('--combine', nargs='+', metavar='PATH',
+                        help="Write the report from the merged sketches of several shards.")
+    parser.add_argument('--prices', default=TOKEN_PRICES_FILE, metavar='PATH',
+                        help="JSON file of USD per million generated tokens by model "
+                             f"(default: {TOKEN_PRICES_FILE}).")
+    args = parser.parse_args()
+
+    try:
+        results = pd.read_csv(RESULTS_FILE, usecols=['game_id', 'public_discussion', 'total_play_time'])
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    if args.combine:
+        collector = load_partials(args.combine)
+        logging.info(f"Merged {len(args.combine)} partial states.")
+    else:
+        if not os.path.isdir(LOG_DIR):
+            logging.error(f"Log directory '{LOG_DIR}' not found.")
+            return
+        game_index = load_game_index(RESULTS_FILE)
+        log_files = list_log_files(game_index, LOG_DIR)
+        if not log_files:
+            logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+            return
+        collector = TextVolumeCollector()
+        replay_logs(log_files, game_index, [collector])
+
+    if args.emit_partial:
+        save_partial(collector, args.emit_partial)
+        logging.info(f"Partial sketches written to {args.emit_partial}")
+        return
+
+    quantiles = quantile_table(collector.sketches)
+    costs = cost_table(pd.DataFrame(collector.player_games), results, load_token_prices(args.prices))
+
+    os.makedirs(TEXT_OUTPUT_DIR, exist_ok=True)
+    quantiles.to_csv(os.path.join(TEXT_OUTPUT_DIR, "text_quantiles.csv"), index=False)
+    costs.to_csv(os.path.join(TEXT_OUTPUT_DIR, "model_cost.csv"), index=False)
+
+    print("--- Approximate Tokens per Decision ---")
+    decision_tokens = quantiles[(quantiles['scope'] == 'decision') & (quantiles['metric'] == 'tokens')]
+    print(decision_tokens.drop(columns=['scope', 'metric']).to_string(index=False))
+    print("\n--- Estimated Cost and Latency per Player-Game ---")
+    print(costs.to_string(index=False))
+
+    plot_quantiles(quantiles, os.path.join(TEXT_OUTPUT_DIR, "tokens_per_text.png"))
+    logging.info("Finished text volume statistics.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+import os
+import logging
+from collections import Counter
+from multiprocessing import Pool
+
+import pandas as pd
+
+from log_events import RESULTS_FILE, LOG_DIR, load_game_index, list_log_files, iter_events
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+VIOLATIONS_FILE = 'log_violations.csv'  # Output in the same directory as the script
+INVALID_GAMES_FILE = 'invalid_games.csv'  # Games with at least one violation, read by main.py
+WORKERS = None  # Worker processes; None uses every CPU
+
+# Rules of the game engine (src/game/GameEngine.ts)
+CARDS_PER_CHARACTER = 3
+CHARACTERS = ['Duke', 'Assassin', 'Captain', 'Ambassador', 'Contessa']
+DECK_TOTAL = CARDS_PER_CHARACTER * len(CHARACTERS)
+STARTING_COINS = 2
+STARTING_CARDS = 2
+FORCED_COUP_COINS = 10
+ACTION_COSTS = {'COUP': 7, 'ASSASSINATE': 3}
+TARGETED_ACTIONS = {'COUP', 'ASSASSINATE', 'STEAL'}
+REQUIRED_CHARACTER = {'TAX': 'Duke', 'ASSASSINATE': 'Assassin', 'STEAL': 'Captain', 'EXCHANGE': 'Ambassador'}
+BLOCKING_CHARACTERS = {'FOREIGN_AID': {'Duke'}, 'ASSASSINATE': {'Contessa'}, 'STEAL': {'Captain', 'Ambassador'}}
+INCOME = {'INCOME': 1, 'FOREIGN_AID': 2, 'TAX': 3}
+
+
+class GameVerifier:
+    """
+    Replays one game's events against a reconstructed state and records every
+    broken rule. Coins, alive players and lost cards are tracked exactly; a
+    hand is tracked until a card is shuffled back or exchanged, after which it
+    is unknown until the next '--- Game State ---' snapshot. Every snapshot is
+    compared with the reconstructed state and then becomes the new state, so
+    one discrepancy is reported once instead of at every later turn.
+    """
+
+    def __init__(self, game_id, players):
+        self.game_id = game_id
+        self.order = sorted(players, key=lambda p: int(p.split()[-1]))
+        self.coins = {p: STARTING_COINS for p in self.order}
+        self.hands = {p: None for p in self.order}  # None while unknown
+        self.hand_sizes = {p: STARTING_CARDS for p in self.order}
+        self.lost = {p: [] for p in self.order}
+        self.alive = set(self.order)
+        self.deck_offset = 0
+        self.previous_turn = None
+        self.pending = None
+        self.round = 0
+        self.winner = None
+        self.violations = []
+        self.reported = set()
+
+    def violation(self, rule, player=None, detail=''):
+        self.violations.append({'game_id': self.game_id, 'round': self.round, 'rule': rule,
+                                'player': player, 'detail': detail})
+
+    def violation_once(self, rule, player=None, detail=''):
+        """Records a violation of a lasting condition only the first time it is seen."""
+        if (rule, player) not in self.reported:
+            self.reported.add((rule, player))
+            self.violation(rule, player, detail)
+
+    def handle(self, event):
+        self.round = event['round']
+        handler = getattr(self, '_on_' + event['kind'], None)
+        if handler is not None:
+            handler(event)
+
+    def _on_turn(self, event):
+        player = event['player']
+        self._resolve_pending()
+        if player not in self.alive:
+            self.violation('dead_player_acts', player)
+        if self.previous_turn is not None:
+            expected = self._next_alive(self.previous_turn)
+            if expected is not None and player != expected:
+                self.violation('turn_order', player, f"expected {expected}")
+        self.previous_turn = player
+        if event['coins'] != self.coins[player]:
+            self.violation('turn_coins_mismatch', player, f"logged {event['coins']}, replayed {self.coins[player]}")
+            self.coins[player] = event['coins']
+        self._check_hand(player, event['cards'], 'turn_hand_mismatch')
+
+    def _on_action(self, event):
+        player, action, target = event['player'], event['action'], event['target']
+        coins = self.coins[player]
+        if coins >= FORCED_COUP_COINS and not (event['forced'] and action == 'COUP'):
+            self.violation('missed_forced_coup', player, f"{coins} coins but chose {action}")
+        if event['forced'] and coins < FORCED_COUP_COINS:
+            self.violation('unwarranted_forced_coup', player, f"{coins} coins")
+        if action in ACTION_COSTS and coins < ACTION_COSTS[action]:
+            self.violation('insufficient_coins', player, f"{action} with {coins} coins")
+        if action in TARGETED_ACTIONS:
+            if target is None:
+                self.violation('missing_target', player, action)
+            elif target == player or target not in self.alive:
+                self.violation('invalid_target', player, f"{action} -> {target}")
+        self.pending = {'player': player, 'action': action, 'target': target,
+                        'failed': False, 'blocked': False, 'blocker': None, 'phase': 'claim'}
+
+    def _on_challenge_resolution(self, event):
+        pending = self.pending
+        if pending is None:
+            self.violation('challenge_without_claim', event['player'])
+            return
+        if pending['phase'] == 'claim':
+            if event['target'] != pending['player']:
+                self.violation('challenge_wrong_player', event['player'], f"challenged {event['target']}")
+            if REQUIRED_CHARACTER.get(pending['action']) != event['card']:
+                self.violation('challenge_wrong_card', event['player'], f"{pending['action']} over {event['card']}")
+        elif event['target'] != pending['blocker']:
+            self.violation('challenge_wrong_player', event['player'], f"challenged {event['target']}")
+
+    def _on_has_cards(self, event):
+        self._check_hand(event['player'], event['cards'], 'challenge_hand_mismatch')
+
+    def _on_reveal(self, event):
+        player, card = event['player'], event['card']
+        hand = self.hands[player]
+        if hand is not None and (card in hand) != event['has_card']:
+            self.violation('challenge_outcome_mismatch', player, f"{card} in {hand}")
+        pending = self.pending
+        if pending is None:
+            return
+        if pending['phase'] == 'claim' and not event['has_card']:
+            pending['failed'] = True
+        if event['has_card']:
+            # The revealed card is shuffled back and a new one drawn
+            self.hands[player] = None
+
+    def _on_block(self, event):
+        pending = self.pending
+        player = event['player']
+        if pending is None:
+            self.violation('block_without_action', player)
+            return
+        allowed = BLOCKING_CHARACTERS.get(pending['action'])
+        if allowed is None:
+            self.violation('unblockable_action_blocked', player, pending['action'])
+        elif event['card'] not in allowed:
+            self.violation('invalid_block_card', player, f"{pending['action']} with {event['card']}")
+        if pending['target'] is not None and player != pending['target']:
+            self.violation('block_by_non_target', player, f"target was {pending['target']}")
+        if pending['failed']:
+            self.violation('block_after_failed_claim', player)
+        # An unchallenged block succeeds without a result line
+        pending.update(phase='block', blocked=True, blocker=player)
+
+    def _on_block_result(self, event):
+        if self.pending is not None:
+            self.pending['blocked'] = event['success']
+
+    def _on_lose_card(self, event):
+        player, card = event['player'], event['card']
+        hand = self.hands[player]
+        if player not in self.alive:
+            self.violation('dead_player_loses_card', player)
+        if hand is not None:
+            if card in hand:
+                hand.remove(card)
+            else:
+                self.violation('lost_card_not_in_hand', player, f"{card} not in {hand}")
+        self.hand_sizes[player] -= 1
+        self.lost[player].append(card)
+        if self.hand_sizes[player] < 0:
+            self.violation('negative_hand_size', player)
+
+    def _on_elimination(self, event):
+        player = event['player']
+        if self.hand_sizes[player] != 0:
+            self.violation('elimination_with_cards', player, f"{self.hand_sizes[player]} cards left")
+        self.alive.discard(player)
+
+    def _on_game_over(self, event):
+        self._resolve_pending()
+        self.winner = event['player']
+
+    def _on_state(self, event):
+        self._resolve_pending()
+        for player in self.order:
+            self._check_eliminated(player)
+        players = event['players']
+        for player in self.order:
+            row = players.get(player)
+            if row is None:
+                self.violation('player_missing_from_state', player)
+                continue
+            if row['coins'] != self.coins[player]:
+                self.violation('state_coins_mismatch', player, f"logged {row['coins']}, replayed {self.coins[player]}")
+            if row['coins'] < 0 <= self.coins[player]:
+                self.violation('negative_coins', player, str(row['coins']))
+            if (row['status'] == 'Alive') != (player in self.alive):
+                self.violation('state_status_mismatch', player, row['status'])
+            if Counter(row['lost']) != Counter(self.lost[player]):
+                self.violation('state_lost_cards_mismatch', player, f"logged {row['lost']}, replayed {self.lost[player]}")
+            if len(row['hand']) + len(row['lost']) != STARTING_CARDS:
+                self.violation_once('card_count', player, f"{len(row['hand'])} in hand, {len(row['lost'])} lost")
+            self._check_hand(player, row['hand'], 'state_hand_mismatch')
+
+            # Resynchronize with the snapshot
+            self.coins[player] = row['coins']
+            self.hands[player] = list(row['hand'])
+            self.hand_sizes[player] = len(row['hand'])
+            self.lost[player] = list(row['lost'])
+            if row['status'] == 'Alive':
+                self.alive.add(player)
+            else:
+                self.alive.discard(player)
+
+        # A card missing from (or added to) the deck stays missing; report only changes
+        cards_in_play = sum(len(row['hand']) + len(row['lost']) for row in players.values())
+        if event['deck_size'] is not None:
+            deck_offset = event['deck_size'] - (DECK_TOTAL - cards_in_play)
+            if deck_offset != self.deck_offset:
+                self.violation('deck_size_mismatch', None,
+                               f"logged {event['deck_size']}, expected {DECK_TOTAL - cards_in_play + self.deck_offset}")
+                self.deck_offset = deck_offset
+        all_cards = Counter(card for row in players.values() for card in row['hand'] + row['lost'])
+        for card, count in all_cards.items():
+            if count > CARDS_PER_CHARACTER:
+                self.violation('too_many_copies', None, f"{count} x {card}")
+
+    def finish(self):
+        self._resolve_pending()
+        if self.winner is None:
+            self.violation('no_game_over')
+        elif len(self.alive) != 1 or self.winner not in self.alive:
+            self.violation('winner_mismatch', self.winner, f"alive: {sorted(self.alive)}")
+        return self.violations
+
+    def _resolve_pending(self):
+        """Applies the coin effects of the pending action, unless its claim was challenged or it was blocked."""
+        pending, self.pending = self.pending, None
+        if pending is None or pending['failed'] or pending['blocked']:
+            return
+        player, action, target = pending['player'], pending['action'], pending['target']
+        self.coins[player] -= ACTION_COSTS.get(action, 0)
+        self.coins[player] += INCOME.get(action, 0)
+        if action == 'STEAL' and target in self.coins:
+            amount = min(2, self.coins[target])
+            self.coins[player] += amount
+            self.coins[target] -= amount
+        if action == 'EXCHANGE':
+            self.hands[player] = None
+        if self.coins[player] < 0:
+            self.violation('negative_coins', player, f"{self.coins[player]} after {action}")
+
+    def _check_hand(self, player, cards, rule):
+        hand = self.hands[player]
+        if hand is not None and Counter(hand) != Counter(cards):
+            self.violation(rule, player, f"logged {cards}, replayed {hand}")
+        if len(cards) != self.hand_sizes[player]:
+            self.violation(rule, player, f"logged {len(cards)} cards, replayed {self.hand_sizes[player]}")
+        self.hands[player] = list(cards)
+        self.hand_sizes[player] = len(cards)
+
+    def _check_eliminated(self, player):
+        if self.hand_sizes[player] == 0 and player in self.alive:
+            self.violation_once('missing_elimination', player)
+
+    def _next_alive(self, player):
+        index = self.order.index(player)
+        for offset in range(1, len(self.order) + 1):
+            candidate = self.order[(index + offset) % len(self.order)]
+            if candidate in self.alive:
+                return candidate
+        return None
+
+
+def verify_log(args):
+    """Replays one log file and returns its violations."""
+    filepath, players = args
+    game_id = os.path.basename(filepath).replace('.txt', '')
+    verifier = GameVerifier(game_id, players)
+    try:
+        for event in iter_events(filepath):
+            verifier.handle(event)
+    except Exception as e:
+        verifier.violation('unreadable_log', None, repr(e))
+    return verifier.finish()
+
+
+def main():
+    """Replays every log in parallel and reports the games that break a rule."""
+    logging.info("Starting log verification...")
+
+    try:
+        game_index = load_game_index(RESULTS_FILE)
+        logging.info(f"Loaded {len(game_index)} unique game IDs from {RESULTS_FILE}.")
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    if not os.path.isdir(LOG_DIR):
+        logging.error(f"Log directory '{LOG_DIR}' not found.")
+        return
+
+    log_files = list_log_files(game_index, LOG_DIR)
+    if not log_files:
+        logging.warning(f"No relevant log files found in '{LOG_DIR}' based on game IDs in {RESULTS_FILE}.")
+        return
+
+    tasks = [(f, list(game_index[os.path.basename(f).replace('.txt', '')]['models'])) for f in log_files]
+    with Pool(WORKERS) as pool:
+        results = pool.map(verify_log, tasks, chunksize=max(1, len(tasks) // 64))
+
+    columns = ['game_id', 'round', 'rule', 'player', 'detail']
+    violations = pd.DataFrame([v for game_violations in results for v in game_violations], columns=columns)
+    violations.to_csv(VIOLATIONS_FILE, index=False)
+
+    invalid = violations.groupby('game_id').agg(
+        violations=('rule', 'size'),
+        rules=('rule', lambda rules: ';'.join(sorted(set(rules)))),
+    ).reset_index()
+    invalid.to_csv(INVALID_GAMES_FILE, index=False)
+
+    print("--- Log Verification ---")
+    print(f"Games verified: {len(log_files)}")
+    print(f"Games with violations: {len(invalid)}")
+    if not violations.empty:
+        print("\nViolations by rule:")
+        print(violations.groupby('rule').agg(violations=('game_id', 'size'), games=('game_id', 'nunique')).to_string())
+    logging.info(f"Violations written to '{VIOLATIONS_FILE}', flagged games to '{INVALID_GAMES_FILE}'.")
+
+
+if __name__ == '__main__':
+    main()
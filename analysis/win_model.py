@@ -0,0 +1,320 @@
+import os
+import re
+import json
+import logging
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import matplotlib.pyplot as plt
+from scipy.stats import norm
+
+from main import EXCLUDED_MODELS, OUTPUT_DIR, RESULTS_FILE, get_color_map, save_plot
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Configuration ---
+FIT_FILE = "win_model_fit.json"  # Last fitted coefficients, used to warm-start the next fit
+# Model the others are compared against; None uses the first reported model by name. It is
+# fixed so model effects keep their meaning (and the warm start stays valid) as games are added.
+REFERENCE_MODEL = None
+RIDGE_PENALTY = 0.1  # L2 penalty on every coefficient; keeps models that never win finite
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-8
+# Game-level settings whose effect on each model is estimated. They are constant
+# within a game, so they only enter the conditional likelihood through the model.
+INTERACTIONS = ['public_discussion', 'personalities']
+
+SEAT_PATTERN = re.compile(r'(\d+)$')
+
+
+def prepare_games(df):
+    """Keeps games with exactly one winner, sorted by game so each game is a contiguous block of rows."""
+    df = df.copy()
+    df['winner'] = df['winner'].astype(bool)
+    winners = df.groupby('game_id')['winner'].transform('sum')
+    invalid_games = df.loc[winners != 1, 'game_id'].nunique()
+    if invalid_games:
+        logging.warning(f"Skipping {invalid_games} games without exactly one winner.")
+    df = df[winners == 1]
+
+    df['seat'] = df['player_id'].str.extract(SEAT_PATTERN, expand=False).astype(int)
+    df['players'] = df.groupby('game_id')['player_id'].transform('size')
+    for column in INTERACTIONS:
+        df[column] = df[column].astype(bool)
+    return df.sort_values(['game_id', 'seat']).reset_index(drop=True)
+
+
+def game_membership(group_starts, n_rows):
+    """Returns the sparse games x rows matrix that sums rows into their game."""
+    group_sizes = np.diff(np.r_[group_starts, n_rows])
+    game_of_row = np.repeat(np.arange(len(group_starts)), group_sizes)
+    return sp.csr_matrix((np.ones(n_rows), (game_of_row, np.arange(n_rows))), shape=(len(group_starts), n_rows))
+
+
+def build_design(df, reference_model):
+    """
+    Builds the sparse design matrix of the conditional logit.
+
+    Model effects are relative to reference_model, seat effects are relative to
+    seat 1 of a table of the same size (so player count enters through the seat
+    terms), and each interaction is a model's shift under a game-level setting.
+    Columns that never vary within a game carry no information and are dropped.
+    """
+    models = sorted(m for m in df['model'].unique() if m != reference_model)
+    seats = sorted({(p, s) for p, s in zip(df['players'], df['seat']) if s > 1})
+
+    terms = [f'model[{m}]' for m in models]
+    terms += [f'seat[{s}/{p}]' for p, s in seats]
+    terms += [f'model[{m}]:{c}' for c in INTERACTIONS for m in models]
+    term_index = {term: i for i, term in enumerate(terms)}
+
+    row_terms = [f'model[{m}]' for m in df['model']]
+    row_seats = [f'seat[{s}/{p}]' for p, s in zip(df['players'], df['seat'])]
+    rows, cols = [], []
+    for i, term in enumerate(row_terms):
+        if term in term_index:
+            rows.append(i)
+            cols.append(term_index[term])
+    for i, term in enumerate(row_seats):
+        if term in term_index:
+            rows.append(i)
+            cols.append(term_index[term])
+    for column in INTERACTIONS:
+        for i in np.flatnonzero(df[column].to_numpy()):
+            term = f'{row_terms[i]}:{column}'
+            if term in term_index:
+                rows.append(i)
+                cols.append(term_index[term])
+
+    X = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(df), len(terms)))
+
+    # Drop columns without within-game variation. Columns are binary, so a column
+    # varies within a game when its game sum is neither 0 nor the game size.
+    game_ids = df['game_id'].to_numpy()
+    group_starts = np.flatnonzero(np.r_[True, game_ids[1:] != game_ids[:-1]])
+    group_sizes = np.diff(np.r_[group_starts, len(df)])
+    game_sums = (game_membership(group_starts, len(df)) @ X).toarray()
+    varies = ((game_sums > 0) & (game_sums < group_sizes[:, None])).any(axis=0)
+    # A model seen under only one value of a setting has its interaction equal to its main effect
+    column_counts = np.asarray(X.sum(axis=0)).ravel()
+    for j, term in enumerate(terms):
+        model_term = term.split(':')[0]
+        if ':' in term and column_counts[j] == column_counts[term_index[model_term]]:
+            varies[j] = False
+    keep = np.flatnonzero(varies)
+    return X[:, keep].tocsr(), [terms[j] for j in keep], group_starts
+
+
+def information_matrix(X, p, G):
+    """X' diag(p) X - M'M for a sparse or dense X, where M = G diag(p) X holds each game's probability-weighted mean row."""
+    if sp.issparse(X):
+        weighted = X.multiply(p[:, None])
+        weighted_means = G @ weighted
+        return (X.T @ weighted).toarray() - (weighted_means.T @ weighted_means).toarray()
+    weighted = X * p[:, None]
+    weighted_means = G @ weighted
+    return X.T @ weighted - weighted_means.T @ weighted_means
+
+
+def fit_conditional_logit(X, y, group_starts, beta=None, penalty=RIDGE_PENALTY):
+    """
+    Fits P(player i wins game g) = exp(x_i b) / sum_{j in g} exp(x_j b) by Newton-Raphson.
+
+    Every step is vectorized over all rows: per-game softmax via reduceat, the
+    gradient X'(y - p) and the Hessian X' diag(p) X - M'M, where M holds each
+    game's probability-weighted mean row. X may be sparse or dense. Returns the
+    coefficients and their covariance (the inverse of the penalized information matrix).
+    """
+    n_rows, n_terms = X.shape
+    group_sizes = np.diff(np.r_[group_starts, n_rows])
+    G = game_membership(group_starts, n_rows)
+    beta = np.zeros(n_terms) if beta is None else beta.copy()
+
+    def evaluate(b):
+        eta = X @ b
+        eta = eta - np.repeat(np.maximum.reduceat(eta, group_starts), group_sizes)
+        exp_eta = np.exp(eta)
+        denominators = np.add.reduceat(exp_eta, group_starts)
+        p = exp_eta / np.repeat(denominators, group_sizes)
+        log_likelihood = eta[y].sum() - np.log(denominators).sum() - 0.5 * penalty * b @ b
+        return p, log_likelihood
+
+    p, log_likelihood = evaluate(beta)
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        gradient = X.T @ (y - p) - penalty * beta
+        hessian = information_matrix(X, p, G) + penalty * np.eye(n_terms)
+        step = np.linalg.solve(hessian, gradient)
+
+        # Halve the step until the penalized likelihood improves
+        step_size = 1.0
+        while True:
+            new_p, new_log_likelihood = evaluate(beta + step_size * step)
+            if new_log_likelihood >= log_likelihood - 1e-12 or step_size < 1e-4:
+                break
+            step_size /= 2
+        beta = beta + step_size * step
+        p, log_likelihood = new_p, new_log_likelihood
+        if np.max(np.abs(step_size * step)) < TOLERANCE:
+            break
+    logging.info(f"Converged after {iteration} Newton steps (penalized log-likelihood {log_likelihood:.3f}).")
+
+    covariance = np.linalg.inv(information_matrix(X, p, G) + penalty * np.eye(n_terms))
+    return beta, covariance, log_likelihood
+
+
+def choose_reference_model(df, reference_model=REFERENCE_MODEL):
+    """The configured reference model, or the first model by name outside EXCLUDED_MODELS if it is unset or did not play."""
+    models = sorted(set(df['model']) - set(EXCLUDED_MODELS)) or sorted(df['model'].unique())
+    if reference_model in models:
+        return reference_model
+    if reference_model is not None:
+        logging.warning(f"Reference model {reference_model} not found in the results; using {models[0]}.")
+    return models[0]
+
+
+def load_warm_start(terms, reference_model, fit_file=FIT_FILE):
+    """
+    Returns starting coefficients from the previous fit for the terms it shares
+    with this one, or None if it used another reference model (its model terms
+    would then mean something else).
+    """
+    if not os.path.exists(fit_file):
+        return None
+    with open(fit_file, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    if previous.get('reference_model') != reference_model:
+        logging.info(f"Ignoring {fit_file}: it was fitted against reference model {previous.get('reference_model')}.")
+        return None
+    coefficients = dict(zip(previous['terms'], previous['coefficients']))
+    shared = sum(term in coefficients for term in terms)
+    logging.info(f"Warm-starting from {fit_file} ({previous['games']} games, {shared}/{len(terms)} shared terms).")
+    return np.array([coefficients.get(term, 0.0) for term in terms])
+
+
+def save_fit(terms, beta, games, reference_model, fit_file=FIT_FILE):
+    """Stores the fitted coefficients and their reference model for the next warm start."""
+    with open(fit_file, 'w', encoding='utf-8') as f:
+        json.dump({'games': games, 'reference_model': reference_model, 'terms': terms, 'coefficients': beta.tolist()},
+                  f, indent=2)
+
+
+def model_effects(df, terms, beta, covariance, reference_model):
+    """
+    Combines the model and interaction terms into each model's adjusted effect
+    (log-odds of winning relative to reference_model) for every observed setting.
+    """
+    term_index = {term: i for i, term in enumerate(terms)}
+    settings = df.groupby(['model'] + INTERACTIONS)['game_id'].nunique().reset_index(name='games')
+
+    rows = []
+    for _, setting in settings.iterrows():
+        contrast = np.zeros(len(terms))
+        if setting['model'] != reference_model:
+            model_term = f"model[{setting['model']}]"
+            if model_term in term_index:
+                contrast[term_index[model_term]] = 1
+            for column in INTERACTIONS:
+                if setting[column] and f'{model_term}:{column}' in term_index:
+                    contrast[term_index[f'{model_term}:{column}']] = 1
+        rows.append({
+            **setting.to_dict(),
+            'log_odds': contrast @ beta,
+            'std_error': np.sqrt(contrast @ covariance @ contrast),
+        })
+
+    effects = pd.DataFrame(rows)
+    effects['odds_ratio'] = np.exp(effects['log_odds'])
+    return effects
+
+
+def plot_model_effects(effects, reference_model, plot_path):
+    """Plots adjusted model effects with 95% confidence intervals, grouped by discussion setting."""
+    discussion_map = {True: 'With Discussion', False: 'Without Discussion'}
+    effects = effects.copy()
+    effects['discussion'] = effects['public_discussion'].map(discussion_map)
+    # Personality settings are shown as separate bars of the same model
+    effects['label'] = effects['model'] + np.where(effects['personalities'], ' (personalities)', '')
+
+    models = sorted(effects['model'].unique())
+    color_map = get_color_map(models)
+    discussion_types = [d for d in ['With Discussion', 'Without Discussion'] if d in set(effects['discussion'])]
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    bar_width = 0.8 / effects.groupby('discussion').size().max()
+    x_pos = 0
+    x_ticks = []
+
+    for discussion in discussion_types:
+        group_data = effects[effects['discussion'] == discussion].sort_values('log_odds', ascending=True)
+        bar_positions = [x_pos + i * bar_width for i in range(len(group_data))]
+        bars = ax.bar(bar_positions, group_data['log_odds'], width=bar_width,
+                      yerr=1.96 * group_data['std_error'], capsize=3,
+                      color=[color_map[m] for m in group_data['model']])
+        for bar, has_personalities in zip(bars, group_data['personalities']):
+            if has_personalities:
+                bar.set_hatch('//')
+        for bar, games in zip(bars, group_data['games']):
+            ax.text(bar.get_x() + bar.get_width() / 2, 0, f'n={int(games)}', ha='center', va='bottom', fontsize=9)
+
+        x_ticks.append(x_pos + (len(group_data) - 1) * bar_width / 2)
+        x_pos += len(group_data) * bar_width + 0.4
+
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.set_ylabel(f'Log-Odds of Winning vs. {reference_model}')
+    ax.set_title('Adjusted Model Strength (Controlling for Seat, Table Size and Opponents)')
+    ax.set_xticks(x_ticks)
+    ax.set_xticklabels(discussion_types, rotation=0, ha="center")
+
+    legend_handles = [plt.Rectangle((0,0),1,1, color=color_map[model]) for model in models]
+    ax.legend(legend_handles, models, title='Model', loc='best')
+    fig.tight_layout()
+    save_plot(fig, plot_path)
+    logging.info(f"Saved plot to {plot_path}")
+
+
+def main():
+    """Fits a conditional logit of who wins each game and reports adjusted model effects."""
+    try:
+        df = pd.read_csv(RESULTS_FILE)
+    except FileNotFoundError:
+        logging.error(f"Results file not found at {RESULTS_FILE}. Aborting.")
+        return
+
+    # Excluded models stay in the fit as opponents and are only left out of the report
+    df = prepare_games(df)
+    games = df['game_id'].nunique()
+    reference_model = choose_reference_model(df)
+    X, terms, group_starts = build_design(df, reference_model)
+    logging.info(f"Fitting {len(terms)} terms on {games} games ({len(df)} players), reference model {reference_model}.")
+
+    beta, covariance, _ = fit_conditional_logit(X, df['winner'].to_numpy(), group_starts,
+                                                beta=load_warm_start(terms, reference_model))
+    save_fit(terms, beta, games, reference_model)
+
+    std_errors = np.sqrt(np.diag(covariance))
+    coefficients = pd.DataFrame({
+        'term': terms,
+        'estimate': beta,
+        'std_error': std_errors,
+        'z': beta / std_errors,
+    })
+    coefficients['p_value'] = 2 * norm.sf(np.abs(coefficients['z']))
+    coefficients['odds_ratio'] = np.exp(coefficients['estimate'])
+
+    effects = model_effects(df, terms, beta, covariance, reference_model)
+    effects = effects[~effects['model'].isin(EXCLUDED_MODELS)].sort_values('log_odds', ascending=False)
+
+    print(f"--- Win Model Coefficients (reference: {reference_model}, seat 1) ---")
+    print(coefficients.to_string(index=False))
+    print("\n--- Adjusted Model Effects ---")
+    print(effects.to_string(index=False))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    coefficients.to_csv(os.path.join(OUTPUT_DIR, "win_model_coefficients.csv"), index=False)
+    effects.to_csv(os.path.join(OUTPUT_DIR, "win_model_effects.csv"), index=False)
+    plot_model_effects(effects, reference_model, os.path.join(OUTPUT_DIR, "adjusted_model_strength.png"))
+
+
+if __name__ == '__main__':
+    main()